@@ -0,0 +1,14 @@
+#!/usr/bin/env python3
+# vim: fileencoding=utf-8 expandtab ts=4 nospell
+
+# SPDX-FileCopyrightText: 2020-2021 Benedict Harcourt <ben.harcourt@harcourtprogramming.co.uk>
+#
+# SPDX-License-Identifier: BSD-2-Clause
+
+"""
+Performance measurements for the "orm" module.
+
+Each benchmark module can be run as a script, for example:
+
+    python -m benchmarks.store_many --rows 100000
+"""
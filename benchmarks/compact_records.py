@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# vim: fileencoding=utf-8 expandtab ts=4 nospell
+
+# SPDX-FileCopyrightText: 2020-2021 Benedict Harcourt <ben.harcourt@harcourtprogramming.co.uk>
+#
+# SPDX-License-Identifier: BSD-2-Clause
+
+"""Benchmark: memory used per record by compact records, against normal records"""
+
+from __future__ import annotations
+
+from typing import Any, Callable, List, Optional, Tuple, Type
+
+import argparse
+import dataclasses
+import sqlite3
+import time
+import tracemalloc
+
+import orm
+
+from benchmarks.store_many import Reading, _records
+
+
+@dataclasses.dataclass
+class Wide(orm.Table["Wide"]):  # pylint: disable=too-many-instance-attributes
+    """A wider table, of the kind which is cached in bulk"""
+
+    name: str
+    code: str
+    group: str
+    count: int
+    total: int
+    minimum: float
+    maximum: float
+    mean: float
+    created: int
+    updated: int
+    wide_id: Optional[int] = None
+
+
+def _wide(rows: int) -> List[Wide]:
+    return [
+        Wide(f"name-{i}", f"c{i}", f"g{i % 10}", i, i * 2, i / 3, i / 2, i / 5, i, i + 1)
+        for i in range(rows)
+    ]
+
+
+def measure(conn: sqlite3.Connection, table: Type[Any], compact: bool) -> Tuple[float, float]:
+    """Loads every record, returning the bytes held per record and the time taken"""
+
+    model = table.model(conn.cursor(), compact=compact)
+
+    tracemalloc.start()
+    start = time.perf_counter()
+
+    try:
+        records = model.all()
+        taken = time.perf_counter() - start
+        held, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return held / len(records), taken
+
+
+def main() -> None:
+    """Run the benchmark"""
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100000)
+    args = parser.parse_args()
+
+    with sqlite3.connect(":memory:") as conn:
+        tables: List[Tuple[Type[Any], Callable[[int], List[Any]]]] = [
+            (Reading, _records),
+            (Wide, _wide),
+        ]
+
+        for table, records in tables:
+            orm.table._get_model(table).created = False  # pylint: disable=protected-access
+            table.create_table(conn.cursor())
+            table.model(conn.cursor()).store_many(records(args.rows))
+
+            for compact in (False, True):
+                size, taken = measure(conn, table, compact)
+                mode = "compact" if compact else "normal"
+
+                print(
+                    f"{table.__name__:>8} {mode:>8}: {size:8.1f} bytes/record {taken:8.3f}s"
+                )
+
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
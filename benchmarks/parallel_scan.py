@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# vim: fileencoding=utf-8 expandtab ts=4 nospell
+
+# SPDX-FileCopyrightText: 2020-2021 Benedict Harcourt <ben.harcourt@harcourtprogramming.co.uk>
+#
+# SPDX-License-Identifier: BSD-2-Clause
+
+"""Benchmark: ParallelScan against TableModel.iter_all on one core"""
+
+from __future__ import annotations
+
+from typing import Iterator
+
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+import orm
+
+from orm.parallel import ParallelScan
+from benchmarks.store_many import Reading, _records
+
+
+def total(readings: Iterator[Reading]) -> float:
+    """Reduce function: sums the values of the readings"""
+
+    return sum(reading.value for reading in readings)
+
+
+def build(path: str, rows: int) -> None:
+    """Fill a database file with the given number of readings"""
+
+    with sqlite3.connect(path) as conn:
+        orm.table._get_model(Reading).created = False  # pylint: disable=protected-access
+        Reading.create_table(conn.cursor())
+        Reading.model(conn.cursor()).store_many(_records(rows))
+
+    conn.close()
+
+
+def serial(path: str) -> float:
+    """Sum the table in this process, returning the time taken"""
+
+    with sqlite3.connect(path) as conn:
+        start = time.perf_counter()
+        total(Reading.model(conn.cursor()).iter_all())
+        taken = time.perf_counter() - start
+
+    conn.close()
+
+    return taken
+
+
+def parallel(path: str, workers: int) -> float:
+    """Sum the table with worker processes, returning the time taken"""
+
+    with ParallelScan(path, workers) as scan:
+        start = time.perf_counter()
+        sum(scan.reduce(Reading, total))
+
+        return time.perf_counter() - start
+
+
+def main() -> None:
+    """Run the benchmark"""
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    handle, path = tempfile.mkstemp(suffix=".db")
+    os.close(handle)
+
+    try:
+        build(path, args.rows)
+
+        for name, taken in (
+            ("iter_all", serial(path)),
+            (f"{args.workers} workers", parallel(path, args.workers)),
+        ):
+            print(f"{name:>12}: {taken:8.3f}s {args.rows / taken:12.0f} rows/s")
+    finally:
+        os.unlink(path)
+
+
+if __name__ == "__main__":
+    main()
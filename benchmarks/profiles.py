@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# vim: fileencoding=utf-8 expandtab ts=4 nospell
+
+# SPDX-FileCopyrightText: 2020-2021 Benedict Harcourt <ben.harcourt@harcourtprogramming.co.uk>
+#
+# SPDX-License-Identifier: BSD-2-Clause
+
+"""Benchmark: each connection profile against SQLite's defaults, per workload"""
+
+from __future__ import annotations
+
+from typing import Callable, Dict, Optional
+
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from orm import profiles
+from benchmarks.parallel_scan import build
+from benchmarks.store_many import Reading, _records
+
+
+def bulk_load(conn: sqlite3.Connection, rows: int) -> None:
+    """Import rows with store_many, committing every thousand"""
+
+    model = Reading.model(conn.cursor())
+    records = _records(rows)
+
+    for offset in range(0, rows, 1000):
+        end = offset + 1000
+        model.store_many(records[offset:end])
+        conn.commit()
+
+
+def oltp(conn: sqlite3.Connection, rows: int) -> None:
+    """Store rows one at a time, each in its own transaction"""
+
+    model = Reading.model(conn.cursor())
+
+    for record in _records(rows):
+        model.store(record)
+        conn.commit()
+
+
+def serving(conn: sqlite3.Connection, rows: int) -> None:
+    """Get rows by random ID"""
+
+    model = Reading.model(conn.cursor())
+    count = conn.execute("SELECT COUNT(*) FROM [Reading]").fetchone()[0]
+
+    for _ in range(rows):
+        model.get(random.randint(1, count))
+
+
+WORKLOADS: Dict[str, Callable[[sqlite3.Connection, int], None]] = {
+    "bulk-load": bulk_load,
+    "oltp": oltp,
+    "serving": serving,
+}
+
+# Workloads which can not be run on a read-only connection.
+WRITES = {"bulk-load", "oltp"}
+
+
+def measure(
+    path: str,
+    profile: Optional[str],
+    workload: Callable[[sqlite3.Connection, int], None],
+    rows: int,
+) -> float:
+    """Time one workload on a connection with the given profile, in seconds"""
+
+    conn = profiles.connect(path, profile) if profile else sqlite3.connect(path)
+
+    try:
+        start = time.perf_counter()
+        workload(conn, rows)
+
+        return time.perf_counter() - start
+    finally:
+        conn.close()
+
+
+def run(profile: Optional[str], rows: int) -> Dict[str, float]:
+    """Run every possible workload against a new database, with one profile"""
+
+    handle, path = tempfile.mkstemp(suffix=".db")
+    os.close(handle)
+
+    try:
+        build(path, rows)
+
+        read_only = bool(profile and profiles.PROFILES[profile].get("query_only"))
+
+        return {
+            name: measure(path, profile, workload, rows)
+            for name, workload in WORKLOADS.items()
+            if not (read_only and name in WRITES)
+        }
+    finally:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.unlink(path + suffix)
+
+
+def main() -> None:
+    """Run the benchmark"""
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=10000)
+    args = parser.parse_args()
+
+    print(f"{'profile':>18} " + " ".join(f"{name:>12}" for name in WORKLOADS))
+
+    for profile in [None, *profiles.PROFILES]:
+        times = run(profile, args.rows)
+        rates = [
+            f"{args.rows / times[name]:10.0f}/s" if name in times else f"{'-':>12}"
+            for name in WORKLOADS
+        ]
+
+        print(f"{profile or 'defaults':>18} " + " ".join(rates))
+
+
+if __name__ == "__main__":
+    main()
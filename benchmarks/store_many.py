@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# vim: fileencoding=utf-8 expandtab ts=4 nospell
+
+# SPDX-FileCopyrightText: 2020-2021 Benedict Harcourt <ben.harcourt@harcourtprogramming.co.uk>
+#
+# SPDX-License-Identifier: BSD-2-Clause
+
+"""Benchmark: TableModel.store_many against a loop of TableModel.store"""
+
+from __future__ import annotations
+
+from typing import Callable, List, Optional
+
+import argparse
+import dataclasses
+import sqlite3
+import time
+
+import orm
+
+
+@dataclasses.dataclass
+class Reading(orm.Table["Reading"]):
+    """A narrow table, typical of bulk loaded data"""
+
+    sensor: str
+    value: float
+    taken: int
+    reading_id: Optional[int] = None
+
+
+def _records(rows: int) -> List[Reading]:
+    return [Reading(f"sensor-{i % 100}", i / 7, 1600000000 + i) for i in range(rows)]
+
+
+def _loop(model: orm.TableModel[Reading], records: List[Reading]) -> None:
+    for record in records:
+        model.store(record)
+
+
+def _bulk(model: orm.TableModel[Reading], records: List[Reading]) -> None:
+    model.store_many(records)
+
+
+def measure(
+    rows: int, method: Callable[[orm.TableModel[Reading], List[Reading]], None]
+) -> float:
+    """Time one method of storing the given number of new rows, in seconds"""
+
+    with sqlite3.connect(":memory:") as conn:
+        orm.table._get_model(Reading).created = False  # pylint: disable=protected-access
+        Reading.create_table(conn.cursor())
+
+        model = Reading.model(conn.cursor())
+        records = _records(rows)
+
+        start = time.perf_counter()
+        method(model, records)
+        conn.commit()
+
+        return time.perf_counter() - start
+
+
+def main() -> None:
+    """Run the benchmark"""
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100000)
+    args = parser.parse_args()
+
+    for name, method in (("store loop", _loop), ("store_many", _bulk)):
+        taken = measure(args.rows, method)
+        print(f"{name:>12}: {taken:8.3f}s {args.rows / taken:12.0f} rows/s")
+
+
+if __name__ == "__main__":
+    main()
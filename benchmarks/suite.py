@@ -0,0 +1,462 @@
+#!/usr/bin/env python3
+# vim: fileencoding=utf-8 expandtab ts=4 nospell
+
+# SPDX-FileCopyrightText: 2020-2021 Benedict Harcourt <ben.harcourt@harcourtprogramming.co.uk>
+#
+# SPDX-License-Identifier: BSD-2-Clause
+
+"""
+Benchmark: the ORM's hot paths, against hand-written sqlite3 queries.
+
+Each case is run against in-memory and on-disk databases of each size, and
+reports throughput, latency percentiles and peak memory. Where there is a
+hand-written equivalent (the same statements, with the rows left as tuples)
+the ratio of the ORM's mean latency to it is reported as the overhead.
+
+Results can be saved as JSON, and compared with those from another commit:
+
+    python -m benchmarks.suite --sizes 1000 100000 --output before.json
+    python -m benchmarks.suite --sizes 1000 100000 --baseline before.json
+"""
+
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, List, Optional
+
+import argparse
+import dataclasses
+import datetime
+import json
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+import orm
+
+from orm.table import _get_model, _make_model
+
+
+@dataclasses.dataclass
+class Author(orm.Table["Author"]):
+    """The target of the foreign keys"""
+
+    name: str
+    author_id: Optional[int] = None
+
+
+@orm.index("score")
+@dataclasses.dataclass
+class Post(orm.Table["Post"]):
+    """A table with a foreign key, which is searched by a scalar column"""
+
+    author: Author
+    title: str
+    score: int
+    post_id: Optional[int] = None
+
+
+class Tag(orm.Table["Tag"]):
+    """The values of a sub-table"""
+
+    tag_id: int
+    thread_id: int
+    tag: str
+
+
+@orm.subtable("tags", Tag, "tag")
+class Thread(orm.Table["Thread"]):
+    """A table with a list sub-table"""
+
+    thread_id: int
+    tags: List[str]
+
+
+class Reading(orm.JoinTable[Author, Post]):
+    """Which Authors have read which Posts"""
+
+    author: Author
+    post: Post
+
+
+# A case takes the iteration number, and performs one operation.
+Operation = Callable[[int], Any]
+
+TABLES = (Author, Post, Tag, Thread)
+SCORES = 1000
+TAGS = 10
+BACKENDS = ("memory", "disk")
+
+
+@dataclasses.dataclass
+class Case:
+    """One operation, through the ORM and (optionally) by hand"""
+
+    name: str
+    orm: Operation
+    raw: Optional[Operation]
+    iterations: int
+
+
+def populate(conn: sqlite3.Connection, rows: int) -> None:
+    """Creates the tables, with `rows` Posts, Readings and Tags"""
+
+    cursor = conn.cursor()
+    authors = max(1, rows // 10)
+
+    for table in TABLES:
+        _get_model(table).created = False
+
+    Reading.create_table(cursor)
+    Thread.create_table(cursor)
+
+    people = [Author(f"author-{i}") for i in range(authors)]
+    Author.model(cursor).store_many(people)
+    Post.model(cursor).store_many(
+        Post(people[i % authors], f"post-{i}", i % SCORES) for i in range(rows)
+    )
+
+    cursor.executemany(
+        "INSERT INTO [Reading] ([author_id], [post_id]) VALUES (?, ?)",
+        [((i * 7) % authors + 1, i + 1) for i in range(rows)],
+    )
+    cursor.executemany(
+        "INSERT INTO [Thread] ([thread_id]) VALUES (?)", [(i + 1,) for i in range(authors)]
+    )
+    cursor.executemany(
+        "INSERT INTO [Tag] ([thread_id], [tag]) VALUES (?, ?)",
+        [(i // TAGS + 1, f"tag-{i % TAGS}") for i in range(authors * TAGS)],
+    )
+
+    conn.commit()
+
+
+def _fetch(cursor: sqlite3.Cursor, sql: str, params: Any = ()) -> List[Any]:
+    """Hand-written query: runs a statement and fetches its rows"""
+
+    return cursor.execute(sql, params).fetchall()
+
+
+def _posts_by_id(cursor: sqlite3.Cursor, ids: List[int]) -> List[Any]:
+    """Hand-written equivalent of loading Posts by ID, and their Authors"""
+
+    marks = ", ".join("?" * len(ids))
+    posts = _fetch(
+        cursor,
+        "SELECT [author_id], [title], [score], [post_id] FROM [Post] "
+        f"WHERE [post_id] IN ({marks})",
+        ids,
+    )
+    authors = list({row[0] for row in posts})
+    marks = ", ".join("?" * len(authors))
+
+    _fetch(
+        cursor,
+        f"SELECT [name], [author_id] FROM [Author] WHERE [author_id] IN ({marks})",
+        authors,
+    )
+
+    return posts
+
+
+def _posts_where(cursor: sqlite3.Cursor, where: str, params: Any = ()) -> List[Any]:
+    """Hand-written equivalent of searching Posts: their IDs, then the records"""
+
+    ids = [row[0] for row in _fetch(cursor, f"SELECT [post_id] FROM [Post] {where}", params)]
+
+    return _posts_by_id(cursor, ids) if ids else []
+
+
+def table_cases(cursor: sqlite3.Cursor, rows: int, iterations: int) -> List[Case]:
+    """Cases for the TableModel functions"""
+
+    rng = random.Random(rows)
+    authors = max(1, rows // 10)
+    ids = [rng.randint(1, rows) for _ in range(iterations)]
+    batches = [rng.sample(range(1, rows + 1), min(rows, 100)) for _ in range(iterations)]
+    scores = [[rng.randrange(SCORES) for _ in range(10)] for _ in range(iterations)]
+    people = [Author(f"author-{i}", i + 1) for i in range(authors)]
+    owners = [people[rng.randrange(authors)] for _ in range(iterations)]
+    posts = Post.model(cursor)
+
+    return [
+        Case(
+            "get",
+            lambda i: posts.get(ids[i]),
+            lambda i: _posts_by_id(cursor, [ids[i]]),
+            iterations,
+        ),
+        Case(
+            "get_many",
+            lambda i: posts.get_many(*batches[i]),
+            lambda i: _posts_by_id(cursor, batches[i]),
+            iterations,
+        ),
+        Case(
+            "all",
+            lambda i: posts.all(),
+            lambda i: _posts_where(cursor, ""),
+            max(1, min(iterations, 10000 // rows)),
+        ),
+        Case(
+            "search scalar",
+            lambda i: posts.search(score=scores[i][0]),
+            lambda i: _posts_where(cursor, "WHERE [score] = ?", scores[i][:1]),
+            iterations,
+        ),
+        Case(
+            "search IN list",
+            lambda i: posts.search(score=scores[i]),
+            lambda i: _posts_where(
+                cursor, f"WHERE [score] IN ({', '.join('?' * len(scores[i]))})", scores[i]
+            ),
+            iterations,
+        ),
+        Case(
+            "search foreign",
+            lambda i: posts.search(author=owners[i]),
+            lambda i: _posts_where(cursor, "WHERE [author_id] = ?", (owners[i].author_id,)),
+            iterations,
+        ),
+        Case(
+            "store",
+            lambda i: posts.store(Post(owners[i], "new", i)),
+            lambda i: cursor.execute(
+                "INSERT OR REPLACE INTO [Post] ([author_id], [title], [score]) VALUES (?, ?, ?)",
+                (owners[i].author_id, "new", i),
+            ),
+            iterations,
+        ),
+    ]
+
+
+def other_cases(cursor: sqlite3.Cursor, rows: int, iterations: int) -> List[Case]:
+    """Cases for the JoinModel and SubTable functions, and model construction"""
+
+    rng = random.Random(-rows)
+    authors = max(1, rows // 10)
+    people = [Author(f"author-{i}", i + 1) for i in range(authors)]
+    owners = [people[rng.randrange(authors)] for _ in range(iterations)]
+    targets = [Post(owners[i], "", 0, rng.randint(1, rows)) for i in range(iterations)]
+    threads = [rng.sample(range(1, authors + 1), min(authors, 10)) for _ in range(iterations)]
+    readings = Reading.model(cursor)
+    tags = _get_model(Thread).submodels["tags"]
+
+    def of_left(i: int) -> List[Any]:
+        ids = _fetch(
+            cursor,
+            "SELECT [post_id] FROM [Reading] WHERE [author_id] = ?",
+            (owners[i].author_id,),
+        )
+
+        return _posts_by_id(cursor, [row[0] for row in ids]) if ids else []
+
+    return [
+        Case("join of_left", lambda i: readings.of_left(owners[i]), of_left, iterations),
+        Case(
+            "join from_left",
+            lambda i: readings.from_left(name=owners[i].name),
+            lambda i: _posts_where(
+                cursor,
+                "WHERE [post_id] IN (SELECT [post_id] FROM [Author] JOIN [Reading] "
+                "USING ([author_id]) WHERE [name] = ?)",
+                (owners[i].name,),
+            ),
+            iterations,
+        ),
+        Case(
+            "join store",
+            lambda i: readings.store(owners[i], targets[i]),
+            lambda i: cursor.execute(
+                "INSERT OR IGNORE INTO [Reading] ([author_id], [post_id]) VALUES (?, ?)",
+                (owners[i].author_id, targets[i].post_id),
+            ),
+            iterations,
+        ),
+        Case(
+            "subtable select",
+            lambda i: tags.select(cursor, *threads[i]),
+            lambda i: _fetch(
+                cursor,
+                "SELECT [thread_id], [tag] FROM [Tag] "
+                f"WHERE [thread_id] IN ({', '.join('?' * len(threads[i]))})",
+                threads[i],
+            ),
+            iterations,
+        ),
+        Case("_make_model", lambda i: _make_model(Post), None, iterations),
+    ]
+
+
+def latencies(operation: Operation, iterations: int) -> List[float]:
+    """Times each iteration of an operation, in seconds"""
+
+    times = []
+
+    for i in range(iterations):
+        start = time.perf_counter()
+        operation(i)
+        times.append(time.perf_counter() - start)
+
+    return times
+
+
+def peak_memory(operation: Operation) -> int:
+    """The peak memory allocated by one iteration of an operation, in bytes"""
+
+    tracemalloc.start()
+
+    try:
+        operation(0)
+
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def summarise(operation: Operation, iterations: int) -> Dict[str, float]:
+    """Measures the throughput, latency and memory use of an operation"""
+
+    times = sorted(latencies(operation, iterations))
+    total = sum(times)
+
+    def percentile(fraction: float) -> float:
+        return times[min(len(times) - 1, int(fraction * len(times)))]
+
+    return {
+        "throughput": iterations / total if total else 0.0,
+        "mean": total / iterations,
+        "p50": percentile(0.5),
+        "p90": percentile(0.9),
+        "p99": percentile(0.99),
+        "peak_memory": peak_memory(operation),
+    }
+
+
+def measure(conn: sqlite3.Connection, case: Case) -> Dict[str, Any]:
+    """Runs one case, discarding any changes it made"""
+
+    result = summarise(case.orm, case.iterations)
+    conn.rollback()
+
+    raw = summarise(case.raw, case.iterations) if case.raw else None
+    conn.rollback()
+
+    return {
+        "case": case.name,
+        "iterations": case.iterations,
+        "orm": result,
+        "raw": raw,
+        "overhead": result["mean"] / raw["mean"] if raw and raw["mean"] else None,
+    }
+
+
+def run(backend: str, rows: int, iterations: int) -> List[Dict[str, Any]]:
+    """Runs every case against a new database of the given size"""
+
+    path = ":memory:"
+
+    if backend == "disk":
+        handle, path = tempfile.mkstemp(suffix=".db")
+        os.close(handle)
+
+    conn = sqlite3.connect(path)
+
+    try:
+        populate(conn, rows)
+        cursor = conn.cursor()
+        cases = table_cases(cursor, rows, iterations) + other_cases(cursor, rows, iterations)
+
+        return [{"backend": backend, "rows": rows, **measure(conn, case)} for case in cases]
+    finally:
+        conn.close()
+
+        if path != ":memory:":
+            os.unlink(path)
+
+
+def environment() -> Dict[str, str]:
+    """Where the results came from, to go alongside them"""
+
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = "unknown"
+
+    return {
+        "commit": commit,
+        "date": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "machine": platform.machine(),
+    }
+
+
+def key(result: Dict[str, Any]) -> str:
+    """Identifies the same result in two runs"""
+
+    return f"{result['backend']:>6} {result['rows']:>8} {result['case']:<16}"
+
+
+def report(results: List[Dict[str, Any]], baseline: Dict[str, Dict[str, Any]]) -> None:
+    """Prints a table of results, with the change from a baseline run if given"""
+
+    print(
+        f"{'backend':>6} {'rows':>8} {'case':<16} {'ops/s':>10} {'p50 us':>9} "
+        f"{'p99 us':>9} {'peak KiB':>9} {'overhead':>8} {'change':>7}"
+    )
+
+    for result in results:
+        stats = result["orm"]
+        overhead = f"{result['overhead']:7.2f}x" if result["overhead"] else f"{'-':>8}"
+        change = f"{'-':>7}"
+
+        if key(result) in baseline:
+            before = baseline[key(result)]["orm"]["mean"]
+            change = f"{(stats['mean'] / before - 1) * 100:+6.0f}%"
+
+        print(
+            f"{key(result)} {stats['throughput']:10.0f} {stats['p50'] * 1e6:9.1f} "
+            f"{stats['p99'] * 1e6:9.1f} {stats['peak_memory'] / 1024:9.1f} {overhead} {change}"
+        )
+
+
+def main() -> None:
+    """Run the benchmark"""
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--output", help="file to save the results to, as JSON")
+    parser.add_argument("--baseline", help="results file from an earlier run to compare to")
+    args = parser.parse_args()
+
+    baseline: Dict[str, Dict[str, Any]] = {}
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as handle:
+            baseline = {key(result): result for result in json.load(handle)["results"]}
+
+    results = [
+        result
+        for backend in args.backends
+        for rows in args.sizes
+        for result in run(backend, rows, args.iterations)
+    ]
+
+    report(results, baseline)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump({**environment(), "results": results}, handle, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,7 +5,7 @@
 # SPDX-License-Identifier: BSD-2-Clause
 
 reuse lint
-black orm tests examples setup.py
-flake8 orm tests examples setup.py
-mypy --strict orm tests examples setup.py
-pylint orm tests examples setup.py
+black orm tests examples benchmarks setup.py
+flake8 orm tests examples benchmarks setup.py
+mypy --strict orm tests examples benchmarks setup.py
+pylint orm tests examples benchmarks setup.py
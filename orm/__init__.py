@@ -18,8 +18,29 @@ Find this project at:
 
 from __future__ import annotations
 
-from .table import Table, ModelWrapper as TableModel, subtable, unique
+from .aio import AsyncDatabase
+from .identity import IdentityMap
+from .pool import ConnectionPool, wal_mode
+from .table import Table, ModelWrapper as TableModel, index
+from .table import compact_table as compact, defer_fields as defer, subtable, unique
 from .join import JoinTable, JoinWrapper as JoinModel
-
-
-__all__ = ["Table", "TableModel", "JoinTable", "JoinModel", "subtable", "unique"]
+from .pagination import Page, pages
+
+
+__all__ = [
+    "AsyncDatabase",
+    "compact",
+    "defer",
+    "ConnectionPool",
+    "IdentityMap",
+    "index",
+    "Table",
+    "TableModel",
+    "JoinTable",
+    "JoinModel",
+    "Page",
+    "pages",
+    "subtable",
+    "unique",
+    "wal_mode",
+]
@@ -11,30 +11,283 @@ Base support for SQL tables and WHERE clauses
 
 from __future__ import annotations
 
-from typing import Any, Dict, Generator, Iterable, List, Mapping, Tuple, Union
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    FrozenSet,
+    Generator,
+    Generic,
+    Hashable,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    Type,
+    TypeVar,
+    Union,
+)
 
 import abc
-import orm  # pylint: disable=unused-import
+import json
+import math
+import sqlite3
 
+from orm import codegen, hooks, slots
+from orm.deferred import record_class as deferred_class
+
+if TYPE_CHECKING:
+    from orm.model import TableModel
+    from orm.table import SubTable, Table
+
+
+ModelledTable = TypeVar("ModelledTable", bound="Table[Any]")
 
 OurField = str
 TheirField = str
-ForeignerMap = Dict[OurField, Tuple[TheirField, "orm.table.TableModel[Any]"]]
+ForeignerMap = Dict[OurField, Tuple[TheirField, "TableModel[Any]"]]
 
-PrimitiveTypes = Union[str, int, float, bool, None]
+PrimitiveTypes = Union[str, bytes, int, float, bool, None]
 FilterTypes = Union[
     PrimitiveTypes,
-    "orm.table.Table[Any]",
+    "Table[Any]",
     Iterable[PrimitiveTypes],
-    Iterable["orm.table.Table[Any]"],
+    Iterable["Table[Any]"],
 ]
 Filters = Mapping[str, FilterTypes]
 MutableFilters = Dict[str, FilterTypes]
 
+Compiled = TypeVar("Compiled")
+
+# IN lists up to this length get a statement of their own; longer lists are
+# padded out to the next power of two so that only a handful of statement
+# shapes are ever compiled for a model.
+_EXACT_ARITY = 8
+
+# IN lists longer than this are bound as a single JSON array, and expanded
+# with json_each() inside SQLite. This avoids both the cost of parsing very
+# long statements, and the SQLITE_MAX_VARIABLE_NUMBER limit. BLOBs can not
+# be held in JSON, so are packed into a second parameter (see pack_set).
+LARGE_SET = 64
+
+# Special arities used in the shape of a filter.
+SCALAR = -1
+JSON_SET = -2
+PACKED_SET = -3
+
+# Types of value which pack_set can bind.
+_BLOBS = (bytes, bytearray, memoryview)
+_PACKABLE = (int, float, str, *_BLOBS)
+
+# Operators which can be given as a suffix of a filter's field, such as
+# `score__gt=10`. The equality operators take a value or a list of values
+# (as a plain filter does), and are negated by "ne" and "not_in".
+EQUALITY = ("eq", "in")
+NEGATED = ("ne", "not_in")
+COMPARISONS = {"gt": ">", "gte": ">=", "lt": "<", "lte": "<=", "like": "LIKE", "glob": "GLOB"}
+RANGES = ("between", "startswith")
+OPERATORS = (*EQUALITY, *NEGATED, *COMPARISONS, *RANGES)
+
+# The shape of a filter: the column, the operator, the arity of the values
+# which are bound (see bind_set), and whether NULL is also accepted.
+Shape = Tuple[str, str, int, bool]
+
+
+def arity_bucket(count: int) -> int:
+    """Rounds the length of an IN list up to the size we compile statements for"""
+
+    if count <= _EXACT_ARITY:
+        return count
+
+    return 1 << (count - 1).bit_length()
+
+
+def _json_text(value: Any) -> str:
+    """A number or string as JSON. Infinities are written as numbers too
+    large for SQLite to read as anything else, and NaN as null, which is
+    what SQLite makes of NaN when it is bound."""
+
+    if isinstance(value, float) and not math.isfinite(value):
+        return "null" if math.isnan(value) else ("-1e999" if value < 0 else "1e999")
+
+    return json.dumps(value)
+
+
+def pack_set(values: Sequence[Any]) -> Tuple[int, List[Any]]:
+    """Binds a large list of numbers, strings and BLOBs as a JSON array.
+
+    BLOBs are concatenated into one BLOB parameter, which comes first, and
+    appear in the array as the [start, length] of their bytes within it."""
+
+    if not any(isinstance(x, _BLOBS) for x in values):
+        return JSON_SET, [f"[{','.join(map(_json_text, values))}]"]
+
+    blobs = bytearray()
+    items = []
+
+    for value in values:
+        if isinstance(value, _BLOBS):
+            data = bytes(value)
+            items.append(f"[{len(blobs) + 1},{len(data)}]")
+            blobs += data
+        else:
+            items.append(_json_text(value))
+
+    return PACKED_SET, [bytes(blobs), f"[{','.join(items)}]"]
+
+
+def bind_set(values: Sequence[Any]) -> Tuple[int, List[Any]]:
+    """Chooses how a list of (non-NULL) values for an IN clause will be bound.
+
+    Returns the arity to compile the statement for, and the list of
+    parameters to bind to it. Large lists are packed into one or two
+    parameters (see pack_set), unless they hold other types of value."""
+
+    if len(values) > LARGE_SET and all(isinstance(x, _PACKABLE) for x in values):
+        return pack_set(values)
+
+    arity = arity_bucket(len(values))
+    params = list(values)
+
+    if params:
+        params.extend([params[-1]] * (arity - len(params)))
+
+    return arity, params
+
+
+def positional(_: int) -> str:
+    """Placeholder for a value of an IN list which is bound by position"""
+
+    return "?"
+
+
+def split_operator(key: str) -> Tuple[str, str]:
+    """Splits a filter into its field and operator, which is "" for a plain filter"""
+
+    field, _, operator = key.rpartition("__")
+
+    if field and operator in OPERATORS:
+        return field, operator
+
+    return key, ""
+
+
+def prefix_end(prefix: str) -> Optional[str]:
+    """
+    The first string after every string which starts with `prefix`, or None
+    if there is not one. SQLite compares TEXT by its UTF-8 bytes, which sorts
+    in the same order as the code points.
+    """
+
+    prefix = prefix.rstrip(chr(0x10FFFF))
+
+    if not prefix:
+        return None
+
+    following = ord(prefix[-1]) + 1
+
+    # Surrogates can not be encoded, so skip past them.
+    if 0xD800 <= following <= 0xDFFF:
+        following = 0xE000
+
+    return prefix[:-1] + chr(following)
+
+
+def in_list(arity: int, placeholder: Callable[[int], str]) -> str:
+    """Creates the contents of an "IN (...)" clause for bind_set()'s arity"""
+
+    # The unary + strips json_each's affinity, so that the values are
+    # compared using the column's affinity, as bound parameters are.
+    if arity == JSON_SET:
+        return f"SELECT +value FROM json_each({placeholder(0)})"
+
+    # Arrays in a packed set are the [start, length] of a BLOB.
+    if arity == PACKED_SET:
+        return (
+            f"SELECT CASE [type] WHEN 'array' THEN substr({placeholder(0)},"
+            " json_extract(value, '$[0]'), json_extract(value, '$[1]'))"
+            f" ELSE +value END FROM json_each({placeholder(1)})"
+        )
+
+    return ", ".join(placeholder(i) for i in range(arity))
+
 
 class BaseModel(abc.ABC):
     """Common functionality for different types of ORM model"""
 
+    _compiled: Dict[Hashable, Any]
+
+    def __init__(self) -> None:
+        self._compiled = {}
+
+    @property
+    def label(self) -> str:
+        """The name of this model, as used in diagnostics"""
+
+        return type(self).__name__
+
+    def execute(
+        self, cursor: sqlite3.Cursor, method: str, sql: str, params: Any = ()
+    ) -> sqlite3.Cursor:
+        """Runs a statement on behalf of one of this model's methods.
+
+        Every statement the ORM generates is run through here (or through
+        `executemany`), so that it can be logged and instrumented."""
+
+        if not hooks.observed():
+            return cursor.execute(sql, params)
+
+        statement = hooks.Statement(self.label, method, sql, params)
+
+        return hooks.run(cursor.execute, cursor, statement, params)
+
+    def executemany(
+        self, cursor: sqlite3.Cursor, method: str, sql: str, rows: Sequence[Any]
+    ) -> sqlite3.Cursor:
+        """Runs a statement for each set of parameters; see `execute`"""
+
+        if not hooks.observed() or not rows:
+            return cursor.executemany(sql, rows)
+
+        statement = hooks.Statement(self.label, method, sql, rows[0])
+
+        return hooks.run(cursor.executemany, cursor, statement, rows)
+
+    def fetch(
+        self, cursor: sqlite3.Cursor, method: str, sql: str, params: Any = ()
+    ) -> List[Any]:
+        """Runs a statement (see `execute`), and returns all of its rows"""
+
+        rows = self.execute(cursor, method, sql, params).fetchall()
+
+        if hooks.INSTALLED:
+            hooks.rows_fetched(self.label, method, len(rows))
+
+        return rows
+
+    def compiled(self, key: Hashable, build: Callable[[], Compiled]) -> Compiled:
+        """Returns the compiled value for the given key.
+
+        SQL statements, and the column layouts they work against, only depend
+        on the model. They are built the first time the key is seen and then
+        cached against this model, so the hot query paths only have to bind
+        parameters."""
+
+        value: Optional[Compiled] = self._compiled.get(key)
+
+        if value is None:
+            value = self._compiled[key] = build()
+
+        return value
+
+    def statement(self, key: Hashable, build: Callable[[], str]) -> str:
+        """Returns the compiled SQL statement for the given key"""
+
+        return self.compiled(key, build)
+
     def where(
         self, foreigners: ForeignerMap, conditions: Filters
     ) -> Tuple[str, Dict[str, Any]]:
@@ -65,9 +318,14 @@ class BaseModel(abc.ABC):
           `[some_id] IN (:some_id__0, :some_id__1, :some_id__2))`
           `{some_id__0: 1, some_id__1: 3, some_id__2: 5}`
 
+        Lists of more than LARGE_SET values are bound as one JSON array
+        (with any BLOBs packed into a second parameter; see pack_set):
+
+          `[some_id] IN (SELECT +value FROM json_each(:some_id__0)))`
+
         In order to facilitiate the mapping of other objects, we can also provider
-        foreign key information to the `where` function. This maps the column ID
-        of the object to the local field name.
+        foreign key information to the `where` function. This maps the local
+        field name to the column holding the ID of the foreign object.
 
           `where({cat: (cat_id, Cat)}, {cat: Cat(1)})`
 
@@ -75,80 +333,317 @@ class BaseModel(abc.ABC):
 
           `[cat_id] = :cat_id`
           `{cat_id: 1}`
+
+        A field can have an operator suffix (see OPERATORS) to compare it in
+        other ways. These compile to comparisons which SQLite can answer with
+        a range of an index on the column:
+
+          `where({}, {score__gte: 10, name__startswith: "Ca"})`
+
+        yields
+
+          `[score] >= :score__gte AND [name] >= :name__startswith__0
+           AND [name] < :name__startswith__1`
+          `{score__gte: 10, name__startswith__0: "Ca", name__startswith__1: "Cb"}`
+
+        The SQL is compiled once per shape of filter (the keys, and the size of
+        any lists of values), and cached against the model.
         """
-        keys = list(conditions.keys())
-        values = dict(conditions)
-        clauses = []
+        values: Dict[str, Any] = dict(conditions)
+        shape: List[Shape] = []
 
-        for key in keys:
-            if key in foreigners:
-                their_field, model = foreigners[key]
+        for key, value in conditions.items():
+            field, operator = split_operator(key)
 
-                subvalues: List["orm.table.Table[Any]"]
-                if isinstance(values[key], (set, tuple, list)):
-                    subvalues = list(values[key])  # type: ignore
+            if field in foreigners:
+                column, model = foreigners[field]
+
+                subvalues: List["Table[Any]"]
+                if isinstance(value, (set, tuple, list)):
+                    subvalues = list(value)
                 else:
-                    subvalues = [values[key]]  # type: ignore
+                    subvalues = [value]  # type: ignore
 
                 if not all(isinstance(x, model.record) for x in subvalues):
                     raise Exception("Passed incorrect object to foreign key")
 
-                values[their_field] = set(self.map_foreign_objects(their_field, subvalues))
-                key = their_field
+                ids = list(self.map_foreign_objects(model.id_field, subvalues))
+                value = ids if isinstance(value, (set, tuple, list)) else ids[0]
+                field = column
+
+            shape.append(self.bind_clause(field, value, values, operator))
+
+        sql = self.statement(("where", tuple(shape)), lambda: self.compile_where(shape))
+
+        return (sql, values)
+
+    @staticmethod
+    def bind_clause(
+        field: str, value: Any, params: Dict[str, Any], operator: str = ""
+    ) -> Shape:
+        """Binds the value(s) for one filter into the parameter mapping.
+
+        Returns the "shape" of the filter: the field, the operator, the arity
+        of the values that are bound (see bind_set, with SCALAR meaning a
+        single value), and whether NULL is also accepted."""
+
+        name = f"{field}__{operator}" if operator else field
+
+        if operator in COMPARISONS:
+            if value is None or isinstance(value, (list, set, tuple)):
+                raise ValueError(f"{name} must be compared with a single value")
+
+            params[name] = value
+            return (field, operator, SCALAR, False)
+
+        if operator in RANGES:
+            bounds = BaseModel.bind_range(name, operator, value)
+            params.update((f"{name}__{i}", bound) for i, bound in enumerate(bounds))
+            return (field, operator, len(bounds), False)
 
-            clauses.append(self.where_clause(key, values))
+        if not isinstance(value, (list, set, tuple)):
+            params[name] = value
+            return (field, operator, SCALAR, value is None)
 
-        return (" AND ".join(clauses), values)
+        items = [x for x in value if x is not None]
+        null = len(items) != len(value)
+
+        if len(items) == 1 and not null:
+            params[name] = items[0]
+            return (field, operator, SCALAR, False)
+
+        if not items and null:
+            params[name] = None
+            return (field, operator, SCALAR, True)
+
+        arity, items = bind_set(items)
+
+        for i, item in enumerate(items):
+            params[name + "__" + str(i)] = item
+
+        return (field, operator, arity, null)
+
+    @staticmethod
+    def bind_range(name: str, operator: str, value: Any) -> List[Any]:
+        """The bounds of a "between" or "startswith" filter"""
+
+        if operator == "startswith":
+            if not isinstance(value, str):
+                raise ValueError(f"{name} must be given a string")
+
+            end = prefix_end(value)
+
+            return [value] if end is None else [value, end]
+
+        if not isinstance(value, (list, tuple)) or len(value) != 2 or None in value:
+            raise ValueError(f"{name} must be given a (low, high) pair")
+
+        return list(value)
+
+    @staticmethod
+    def compile_where(shape: Iterable[Shape]) -> str:
+        """Compiles the SQL for a WHERE clause of the given shape"""
+
+        return " AND ".join(BaseModel.compile_clause(*clause) for clause in shape)
+
+    @staticmethod
+    def compile_clause(field: str, operator: str, arity: int, null: bool) -> str:
+        """Compiles the SQL for one filter of a WHERE clause; see bind_clause"""
+
+        name = f"{field}__{operator}" if operator else field
+
+        if operator in COMPARISONS or operator in RANGES:
+            return BaseModel._compile_comparison(field, operator, arity, name)
+
+        negated = operator in NEGATED
+
+        if arity == SCALAR:
+            if null:
+                return f"[{field}] IS NOT NULL" if negated else f"[{field}] IS NULL"
+
+            return f"[{field}] IS NOT :{name}" if negated else f"[{field}] = :{name}"
+
+        values = in_list(arity, f":{name}__{{}}".format)
+
+        if negated:
+            # The opposite of "IN (...) OR IS NULL", with NULL rows kept unless
+            # NULL is one of the values, as for "ne".
+            nulls = f" AND [{field}] IS NOT NULL" if null else f" OR [{field}] IS NULL"
+            return f"([{field}] NOT IN ({values}){nulls})"
+
+        return f"([{field}] IN ({values})" + (f" OR [{field}] IS NULL" if null else "") + ")"
+
+    @staticmethod
+    def _compile_comparison(field: str, operator: str, arity: int, name: str) -> str:
+        """Compiles a comparison or range filter, whose parameters are prefixed `name`"""
+
+        if operator in COMPARISONS:
+            return f"[{field}] {COMPARISONS[operator]} :{name}"
+
+        if operator == "between":
+            return f"[{field}] BETWEEN :{name}__0 AND :{name}__1"
+
+        lower = f"[{field}] >= :{name}__0"
+
+        # startswith has no upper bound when no string follows the prefix.
+        return f"{lower} AND [{field}] < :{name}__1" if arity == 2 else lower
 
     @staticmethod
     def map_foreign_objects(
-        field: TheirField, objects: List["orm.table.Table[Any]"]
+        field: TheirField, objects: List["Table[Any]"]
     ) -> Generator[PrimitiveTypes, None, None]:
         """Converts a list of Table[Any] to a List of their IDs"""
         for obj in objects:
             yield getattr(obj, field) if obj else None
 
-    @staticmethod
-    def where_clause(field: str, filters: Dict[str, Any]) -> str:
+    @classmethod
+    def where_clause(cls, field: str, filters: Dict[str, Any]) -> str:
         """Creates a specific sub-clause for a WHERE query.
 
         This will by representing some number of values a specific
         column must match at least one of"""
-        if not isinstance(filters[field], (list, set, tuple)):
-            return (
-                f"[{field}] = :{field}"
-                if filters[field] is not None
-                else f"[{field}] IS NULL"
-            )
 
-        if len(filters[field]) == 1:
-            filters[field] = list(filters[field]).pop()
+        column, operator = split_operator(field)
+
+        return cls.compile_clause(*cls.bind_clause(column, filters[field], filters, operator))
+
+
+class TableBase(Generic[ModelledTable], BaseModel):
+    """The fields of a Table, and the columns they are stored in.
+
+    `table_fields` is keyed by column name, whilst `foreigners` maps the
+    field of the record to the column and model of the foreign object."""
+
+    record: Type[ModelledTable]
+
+    table: str
+    id_field: str
+
+    table_fields: Dict[str, str]
+    foreigners: ForeignerMap
+    submodels: Dict[str, "SubTable[Any]"]
+
+    def __init__(self, record: Type[ModelledTable], table: str, id_field: str):
+        super().__init__()
+
+        self.record = record
+        self.table = table
+        self.id_field = id_field
+
+        self.table_fields = {}
+        self.foreigners = {}
+        self.submodels = {}
+
+    @property
+    def label(self) -> str:
+        """The name of this model, as used in diagnostics"""
+
+        return self.table
+
+    def reset(self) -> None:
+        """Discards the compiled statements and column lists of this model.
+
+        This must be called if the fields of the model are changed after
+        it has been used."""
+
+        self._compiled.clear()
+
+    @property
+    def columns(self) -> Tuple[str, ...]:
+        """The columns of this table, in the order they are selected"""
+
+        return self.compiled("columns", lambda: tuple(self.table_fields))
+
+    @property
+    def scalars(self) -> Tuple[str, ...]:
+        """The columns of this table which are not foreign keys"""
+
+        def build() -> Tuple[str, ...]:
+            foreign = {column for column, _ in self.foreigners.values()}
+
+            return tuple(x for x in self.columns if x not in foreign)
+
+        return self.compiled("scalars", build)
 
-            return (
-                f"[{field}] = :{field}"
-                if filters[field] is not None
-                else f"[{field}] IS NULL"
+    def filtered_sql(self, columns: str, where: str) -> str:
+        """SELECT statement over the rows matching a WHERE clause, which may be empty"""
+
+        sql = f"SELECT {columns} FROM [{self.table}]"
+
+        return f"{sql} WHERE {where}" if where else sql
+
+    def column(self, field: str) -> str:
+        """The column holding a field; foreign objects are held as their ID"""
+
+        column = self.foreigners[field][0] if field in self.foreigners else field
+
+        if column not in self.table_fields:
+            raise ValueError(f"{self.record.__name__} has no field {field}")
+
+        return column
+
+    @property
+    def id_position(self) -> int:
+        """The position of the ID in the selected columns"""
+
+        return self.compiled("id_position", lambda: self.columns.index(self.id_field))
+
+    @property
+    def foreign_positions(self) -> Tuple[Tuple[str, int, TableModel[Any]], ...]:
+        """The field, position in the selected columns, and model of each foreign key"""
+
+        def build() -> Tuple[Tuple[str, int, TableModel[Any]], ...]:
+            return tuple(
+                (field, self.columns.index(column), model)
+                for field, (column, model) in self.foreigners.items()
             )
 
-        fields = []
-        i = 0
-        null = False
+        return self.compiled("foreign_positions", build)
 
-        for value in filters[field]:
-            if value is None:
-                null = True
-                continue
+    @property
+    def hydrator(self) -> codegen.Hydrator:
+        """
+        Generated function which constructs a record from a selected row.
 
-            subfield = field + "__" + str(i)
-            filters[subfield] = value
-            fields.append(":" + subfield)
-            i += 1
+        It is called as `hydrator(row, values)`, where `values` are the
+        foreign objects (in the order of `foreigners`) followed by the
+        sub-table values (in the order of `submodels`).
+        """
 
-        if not fields and null:
-            return f"[{field}] IS NULL"
+        return self.hydrator_for(False, frozenset())
 
-        return (
-            f"([{field}] IN ({', '.join(fields)})"
-            + (f" OR [{field}] IS NULL" if null else "")
-            + ")"
+    def hydrator_for(self, compact: bool, deferred: FrozenSet[str]) -> codegen.Hydrator:
+        """The hydrator for compact or normal records, with the given fields deferred"""
+
+        return self.compiled(
+            ("hydrator", compact, deferred), lambda: self._make_hydrator(compact, deferred)
         )
+
+    def _make_hydrator(self, compact: bool, deferred: FrozenSet[str]) -> codegen.Hydrator:
+        if deferred:
+            record = deferred_class(self, compact, deferred)
+        else:
+            record = slots.record_class(self.record) if compact else self.record
+
+        positions = {
+            field: self.columns.index(field)
+            for field in self.scalars
+            if field not in deferred
+        }
+        extra = [*self.foreigners, *self.submodels]
+
+        return codegen.hydrator(record, positions, extra, sorted(deferred))
+
+    @property
+    def extractor(self) -> codegen.Extractor:
+        """Generated function which reads the column values out of a record"""
+
+        def build() -> codegen.Extractor:
+            foreign = [
+                (field, column, model.record, model.id_field)
+                for field, (column, model) in self.foreigners.items()
+            ]
+
+            return codegen.extractor(self.scalars, foreign)
+
+        return self.compiled("extractor", build)
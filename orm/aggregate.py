@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# vim: fileencoding=utf-8 expandtab ts=4 nospell
+
+# SPDX-FileCopyrightText: 2020-2021 Benedict Harcourt <ben.harcourt@harcourtprogramming.co.uk>
+#
+# SPDX-License-Identifier: BSD-2-Clause
+
+"""
+Counts, existence checks and aggregates, computed in SQLite.
+
+These take the same filters as `TableModel.search`, and return scalars
+without loading any records. AggregateMixin adds them to TableModel.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict
+
+import sqlite3
+
+from orm.abc import FilterTypes, ModelledTable, TableBase
+
+
+# SQL aggregate functions which can be applied to a field (see AggregateMixin.aggregate).
+AGGREGATES = ("avg", "count", "max", "min", "sum", "total")
+
+
+class AggregateMixin(TableBase[ModelledTable]):
+    """The queries of a TableModel which load no records: counts and aggregates"""
+
+    def count(self, cursor: sqlite3.Cursor, **kwargs: FilterTypes) -> int:
+        """
+        The number of records which match the given filters (as for `search`).
+
+        The rows are counted in SQLite; no records are loaded.
+        """
+
+        where, params = self.where(self.foreigners, kwargs)
+        sql = self.statement(("count", where), lambda: self.filtered_sql("COUNT(*)", where))
+
+        result: int = self.fetch(cursor, "count", sql, params)[0][0]
+
+        return result
+
+    def exists(self, cursor: sqlite3.Cursor, **kwargs: FilterTypes) -> bool:
+        """
+        Whether any record matches the given filters (as for `search`).
+
+        SQLite stops at the first matching row.
+        """
+
+        where, params = self.where(self.foreigners, kwargs)
+        sql = self.statement(
+            ("exists", where),
+            lambda: f"SELECT EXISTS ({self.filtered_sql('1', where)})",
+        )
+
+        return bool(self.fetch(cursor, "exists", sql, params)[0][0])
+
+    def aggregate(
+        self, cursor: sqlite3.Cursor, function: str, field: str, **kwargs: FilterTypes
+    ) -> Any:
+        """
+        Applies an SQL aggregate function (one of AGGREGATES) to a field over
+        the records which match the given filters (as for `search`).
+
+        Foreign objects are aggregated by their ID. As in SQL, the result of
+        every function but "count" and "total" is None when nothing matches.
+        """
+
+        if function.lower() not in AGGREGATES:
+            raise ValueError(f"Unknown aggregate function {function}")
+
+        column = self.column(field)
+        where, params = self.where(self.foreigners, kwargs)
+        sql = self.statement(
+            ("aggregate", function.lower(), column, where),
+            lambda: self.filtered_sql(f"{function.upper()}([{column}])", where),
+        )
+
+        return self.fetch(cursor, "aggregate", sql, params)[0][0]
+
+    def sum(self, cursor: sqlite3.Cursor, field: str, **kwargs: FilterTypes) -> Any:
+        """The sum of a field over the matching records (0 if there are none)"""
+
+        result = self.aggregate(cursor, "sum", field, **kwargs)
+
+        return 0 if result is None else result
+
+    def min(self, cursor: sqlite3.Cursor, field: str, **kwargs: FilterTypes) -> Any:
+        """The lowest value of a field in the matching records (or None)"""
+
+        return self.aggregate(cursor, "min", field, **kwargs)
+
+    def max(self, cursor: sqlite3.Cursor, field: str, **kwargs: FilterTypes) -> Any:
+        """The highest value of a field in the matching records (or None)"""
+
+        return self.aggregate(cursor, "max", field, **kwargs)
+
+    def count_by(
+        self, cursor: sqlite3.Cursor, field: str, **kwargs: FilterTypes
+    ) -> Dict[Any, int]:
+        """
+        The number of matching records for each value of a field.
+
+        Foreign objects are grouped by their ID, so the keys are the IDs.
+        """
+
+        column = self.column(field)
+        where, params = self.where(self.foreigners, kwargs)
+        sql = self.statement(
+            ("count_by", column, where),
+            lambda: self.filtered_sql(f"[{column}], COUNT(*)", where)
+            + f" GROUP BY [{column}]",
+        )
+
+        return dict(self.fetch(cursor, "count_by", sql, params))
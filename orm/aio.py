@@ -0,0 +1,555 @@
+#!/usr/bin/env python3
+# vim: fileencoding=utf-8 expandtab ts=4 nospell
+
+# SPDX-FileCopyrightText: 2020-2021 Benedict Harcourt <ben.harcourt@harcourtprogramming.co.uk>
+#
+# SPDX-License-Identifier: BSD-2-Clause
+
+"""
+Asyncio interface to the ORM.
+
+Queries are run on dedicated database threads, each of which owns its own
+connection, so that disk I/O (and slow queries) never block the event loop.
+"""
+
+from __future__ import annotations
+
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncIterator,
+    Callable,
+    Dict,
+    Generic,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Type,
+    TypeVar,
+)
+
+import asyncio
+import concurrent.futures
+import contextlib
+import functools
+import itertools
+import sqlite3
+import threading
+
+from .abc import FilterTypes, ModelledTable
+from .join import Left, Right, _get_join
+from .loading import Loading
+from .model import STREAM_WINDOW
+from .pagination import Page
+from .pool import SetupHook, open_connection
+from .table import _get_model
+
+if TYPE_CHECKING:
+    from .identity import IdentityMap
+    from .join import JoinModel, JoinTable
+    from .model import TableModel
+
+
+Result = TypeVar("Result")
+
+
+class AsyncDatabase:
+    """
+    A set of database threads for one SQLite database.
+
+    Each of the `threads` opens its own connection when started, and runs
+    each of the `setup` hooks on it once. Work submitted with `run` is
+    executed by the next free thread; while it runs, the event loop is free
+    to serve other coroutines.
+
+        database = AsyncDatabase("app.db", threads=4, setup=[wal_mode])
+
+        users = database.model(User)
+        user = await users.get(1)
+
+        async for comment in database.model(Comment).iter_all():
+            ...
+
+    Any other arguments are passed on to `sqlite3.connect`.
+    """
+
+    database: str
+    setup: Sequence[SetupHook]
+
+    def __init__(
+        self,
+        database: str,
+        threads: int = 1,
+        setup: Sequence[SetupHook] = (),
+        **kwargs: Any,
+    ) -> None:
+        self.database = database
+        self.setup = setup
+
+        self._kwargs = kwargs
+        self._local = threading.local()
+        self._opened: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            threads, "tiny-orm", initializer=self._connect
+        )
+
+    def _connect(self) -> None:
+        """Opens the connection for the current database thread"""
+
+        connection = open_connection(self.database, self.setup, self._kwargs)
+
+        with self._lock:
+            self._opened.append(connection)
+
+        self._local.cursor = connection.cursor()
+
+    def _call(self, work: Callable[[sqlite3.Cursor], Result]) -> Result:
+        """Runs some work on the current thread's connection, as one transaction"""
+
+        return self._transaction(self._local.cursor, work)
+
+    @staticmethod
+    def _transaction(
+        cursor: sqlite3.Cursor, work: Callable[[sqlite3.Cursor], Result]
+    ) -> Result:
+        """Runs some work on a cursor, and commits it (or rolls back if it raises)"""
+
+        try:
+            result = work(cursor)
+        except BaseException:
+            cursor.connection.rollback()
+            raise
+
+        cursor.connection.commit()
+
+        return result
+
+    async def run(self, work: Callable[[sqlite3.Cursor], Result]) -> Result:
+        """
+        Runs a function on a database thread, passing it a cursor.
+
+        The function's changes are committed once it returns, or rolled back
+        if it raises, so it can be used for a unit of work:
+
+            def transfer(cursor: sqlite3.Cursor) -> None:
+                accounts = Account.model(cursor)
+                ...
+
+            await database.run(transfer)
+        """
+
+        loop = asyncio.get_running_loop()
+
+        return await loop.run_in_executor(self._executor, self._call, work)
+
+    async def stream(
+        self, items: Callable[[sqlite3.Cursor], Iterator[Result]], window: int
+    ) -> AsyncIterator[Result]:
+        """
+        Yields the items of an iterator which is run on a database thread.
+
+        Items are passed to the event loop `window` at a time, and the
+        thread waits for each window to be taken before reading the next.
+
+        Each stream has a thread and connection of its own, rather than one
+        of the database threads, so that the loop of an `async for` can
+        still await other work on the database while the stream is open.
+        """
+
+        stream: _Stream[Result] = _Stream(asyncio.get_running_loop(), items, window)
+        thread = threading.Thread(
+            target=stream.produce, args=(self._stream,), name="tiny-orm-stream", daemon=True
+        )
+        thread.start()
+
+        try:
+            while True:
+                batch = await stream.windows.get()
+
+                if batch is None:
+                    break
+
+                for item in batch:
+                    yield item
+        finally:
+            stream.stop.set()
+
+            # Free the producer if it is waiting to send another window.
+            if not stream.windows.empty():
+                stream.windows.get_nowait()
+
+            await stream.done
+
+    def _stream(self, work: Callable[[sqlite3.Cursor], Result]) -> Result:
+        """Runs the work of a stream on a new connection, which is closed afterwards"""
+
+        connection = open_connection(self.database, self.setup, self._kwargs)
+
+        try:
+            return self._transaction(connection.cursor(), work)
+        finally:
+            connection.close()
+
+    def model(
+        self,
+        table: Type[ModelledTable],
+        identity: Optional[IdentityMap] = None,
+        strategy: Optional[str] = None,
+        compact: Optional[bool] = None,
+    ) -> AsyncModelWrapper[ModelledTable]:
+        """Get the asynchronous model for a Table.
+
+        An IdentityMap is not thread safe, so should only be used by one
+        database thread."""
+
+        loading = Loading(identity, strategy, compact)
+
+        return AsyncModelWrapper(_get_model(table), self, loading)
+
+    def join(self, table: Type[JoinTable[Left, Right]]) -> AsyncJoinWrapper[Left, Right]:
+        """Get the asynchronous model for a JoinTable"""
+
+        return AsyncJoinWrapper(_get_join(table), self)
+
+    def close(self) -> None:
+        """Waits for all submitted work to finish, then closes the connections"""
+
+        self._executor.shutdown()
+
+        with self._lock:
+            for connection in self._opened:
+                connection.close()
+
+            self._opened = []
+
+
+class _Stream(Generic[Result]):
+    """Passes the items of an iterator from a database thread to the event loop"""
+
+    loop: asyncio.AbstractEventLoop
+    items: Callable[[sqlite3.Cursor], Iterator[Result]]
+    window: int
+    windows: asyncio.Queue[Optional[List[Result]]]
+    stop: threading.Event
+    done: asyncio.Future[None]
+
+    def __init__(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        items: Callable[[sqlite3.Cursor], Iterator[Result]],
+        window: int,
+    ) -> None:
+        self.loop = loop
+        self.items = items
+        self.window = window
+        self.windows = asyncio.Queue(1)
+        self.stop = threading.Event()
+        self.done = loop.create_future()
+
+    def send(self, batch: Optional[List[Result]]) -> None:
+        """Waits until the event loop has room for the next window, then sends it"""
+
+        asyncio.run_coroutine_threadsafe(self.windows.put(batch), self.loop).result()
+
+    def produce(self, run: Callable[[Callable[[sqlite3.Cursor], None]], None]) -> None:
+        """
+        Thread: reads the items (on a cursor provided by `run`), and then
+        reports the outcome to the event loop.
+        """
+
+        error: Optional[BaseException] = None
+
+        try:
+            run(self.read)
+        except BaseException as exception:  # pylint: disable=broad-except
+            error = exception
+
+        # The loop may already be closed, if the stream was abandoned.
+        with contextlib.suppress(RuntimeError):
+            self.loop.call_soon_threadsafe(self.finish, error)
+
+    def finish(self, error: Optional[BaseException]) -> None:
+        """Loop: records the outcome of the stream, unless it is no longer awaited"""
+
+        if self.done.done():
+            return
+
+        if error is None:
+            self.done.set_result(None)
+        else:
+            self.done.set_exception(error)
+
+    def read(self, cursor: sqlite3.Cursor) -> None:
+        """Reads the items in windows, until the end or until stopped"""
+
+        iterator = self.items(cursor)
+
+        try:
+            while not self.stop.is_set():
+                batch = list(itertools.islice(iterator, self.window))
+
+                if not batch:
+                    break
+
+                self.send(batch)
+        finally:
+            if not self.stop.is_set():
+                self.send(None)
+
+
+class AsyncModelWrapper(Generic[ModelledTable]):
+    """
+    Binding class between a Table, it's Model, and an AsyncDatabase.
+
+    Each function is the awaitable counterpart of the one on ModelWrapper,
+    and runs on one of the database's threads. Lazy loading is not
+    available, as the proxies would be loaded from the event loop; for the
+    same reason, no fields are deferred.
+    """
+
+    model: TableModel[ModelledTable]
+    database: AsyncDatabase
+    loading: Loading
+
+    def __init__(
+        self,
+        model: TableModel[ModelledTable],
+        database: AsyncDatabase,
+        loading: Loading = Loading(),
+    ):
+        self.model = model
+        self.database = database
+        self.loading = loading
+
+    def _loading(self) -> Loading:
+        """The loading options for a call, which can not be lazy or defer fields"""
+
+        return self.model.eager_loading(self.loading, "asyncio")
+
+    async def all(self, *, page: Optional[Page] = None) -> List[ModelledTable]:
+        """Returns all records on the current table; see ModelWrapper.all"""
+
+        return await self.database.run(
+            functools.partial(self.model.all, loading=self._loading(), page=page)
+        )
+
+    async def get(self, unique_id: int) -> Optional[ModelledTable]:
+        """Gets a record by ID, or None if no record with that ID exists"""
+
+        loading = self._loading()
+
+        return await self.database.run(
+            lambda cursor: self.model.get(cursor, unique_id, loading=loading)
+        )
+
+    async def get_many(self, *ids: int) -> Dict[int, ModelledTable]:
+        """Gets all records that exist with ID in the supplied list"""
+
+        loading = self._loading()
+
+        return await self.database.run(
+            lambda cursor: self.model.get_many(cursor, *ids, loading=loading)
+        )
+
+    async def search(
+        self, *, page: Optional[Page] = None, **kwargs: FilterTypes
+    ) -> List[ModelledTable]:
+        """Gets records which match the given filters; see ModelWrapper.search"""
+
+        loading = self._loading()
+
+        return await self.database.run(
+            lambda cursor: self.model.search(cursor, loading=loading, page=page, **kwargs)
+        )
+
+    async def search_ids(
+        self, *, page: Optional[Page] = None, **kwargs: FilterTypes
+    ) -> List[int]:
+        """Gets the IDs of the records which match the given filters"""
+
+        return await self.database.run(
+            lambda cursor: self.model.search_ids(cursor, page=page, **kwargs)
+        )
+
+    def iter_all(self, window: int = STREAM_WINDOW) -> AsyncIterator[ModelledTable]:
+        """
+        Yields all records on the current table, for use with `async for`.
+
+        Records are read and passed back `window` at a time; see
+        ModelWrapper.iter_all and AsyncDatabase.stream.
+        """
+
+        loading = self._loading()
+
+        return self.database.stream(
+            lambda cursor: self.model.iter_all(cursor, window, loading=loading), window
+        )
+
+    def iter_search(
+        self, window: int = STREAM_WINDOW, **kwargs: FilterTypes
+    ) -> AsyncIterator[ModelledTable]:
+        """
+        Yields records which match the given filters, for use with `async for`.
+
+        Records are read and passed back `window` at a time; see
+        ModelWrapper.iter_search and AsyncDatabase.stream.
+        """
+
+        loading = self._loading()
+
+        return self.database.stream(
+            lambda cursor: self.model.iter_search(cursor, window, loading=loading, **kwargs),
+            window,
+        )
+
+    async def count(self, **kwargs: FilterTypes) -> int:
+        """The number of records which match the given filters; see TableModel.count"""
+
+        # The filters may not be passed with functools.partial, as they
+        # could (as far as the types go) include "cursor".
+        def count(cursor: sqlite3.Cursor) -> int:
+            return self.model.count(cursor, **kwargs)
+
+        return await self.database.run(count)
+
+    async def exists(self, **kwargs: FilterTypes) -> bool:
+        """Whether any record matches the given filters"""
+
+        def exists(cursor: sqlite3.Cursor) -> bool:
+            return self.model.exists(cursor, **kwargs)
+
+        return await self.database.run(exists)
+
+    async def aggregate(self, function: str, field: str, **kwargs: FilterTypes) -> Any:
+        """Applies an SQL aggregate function to a field; see TableModel.aggregate"""
+
+        return await self.database.run(
+            lambda cursor: self.model.aggregate(cursor, function, field, **kwargs)
+        )
+
+    async def sum(self, field: str, **kwargs: FilterTypes) -> Any:
+        """The sum of a field over the matching records (0 if there are none)"""
+
+        return await self.database.run(lambda cursor: self.model.sum(cursor, field, **kwargs))
+
+    async def min(self, field: str, **kwargs: FilterTypes) -> Any:
+        """The lowest value of a field in the matching records (or None)"""
+
+        return await self.database.run(lambda cursor: self.model.min(cursor, field, **kwargs))
+
+    async def max(self, field: str, **kwargs: FilterTypes) -> Any:
+        """The highest value of a field in the matching records (or None)"""
+
+        return await self.database.run(lambda cursor: self.model.max(cursor, field, **kwargs))
+
+    async def count_by(self, field: str, **kwargs: FilterTypes) -> Dict[Any, int]:
+        """The number of matching records for each value of a field"""
+
+        return await self.database.run(
+            lambda cursor: self.model.count_by(cursor, field, **kwargs)
+        )
+
+    async def store(self, record: ModelledTable) -> bool:
+        """Writes a record to the database; see ModelWrapper.store"""
+
+        return await self.database.run(
+            lambda cursor: self.model.store(cursor, record, identity=self.loading.identity)
+        )
+
+    async def store_many(self, records: Iterable[ModelledTable]) -> int:
+        """Writes a number of records to the database; see ModelWrapper.store_many"""
+
+        records = list(records)
+
+        return await self.database.run(
+            lambda cursor: self.model.store_many(
+                cursor, records, identity=self.loading.identity
+            )
+        )
+
+
+class AsyncJoinWrapper(Generic[Left, Right]):
+    """
+    Binding class between a JoinTable, it's Model, and an AsyncDatabase.
+
+    Each function is the awaitable counterpart of the one on JoinWrapper,
+    and runs on one of the database's threads.
+    """
+
+    model: JoinModel[Left, Right]
+    database: AsyncDatabase
+
+    def __init__(self, model: JoinModel[Left, Right], database: AsyncDatabase):
+        self.model = model
+        self.database = database
+
+    async def ids_for_left(self, left: Left) -> List[int]:
+        """Returns all right_ids present for a given Left record"""
+
+        return await self.database.run(lambda cursor: self.model.ids_for_left(cursor, left))
+
+    async def of_left(self, left: Left, *, page: Optional[Page] = None) -> List[Right]:
+        """Returns all Right records which map to a given Left"""
+
+        return await self.database.run(
+            lambda cursor: self.model.of_left(cursor, left, page=page)
+        )
+
+    async def from_left(self, **kwargs: Any) -> List[Right]:
+        """Returns all unique Right records which map to matching Left records"""
+
+        return await self.database.run(functools.partial(self.model.from_left, **kwargs))
+
+    async def count_left(self, left: Left, **kwargs: FilterTypes) -> int:
+        """The number of Right records which map to a given Left, and match the filters"""
+
+        return await self.database.run(
+            lambda cursor: self.model.count_left(cursor, left, **kwargs)
+        )
+
+    async def clear_left(self, left: Left) -> None:
+        """Deletes all records in the join table that feature the given Left record"""
+
+        await self.database.run(lambda cursor: self.model.clear_left(cursor, left))
+
+    async def ids_for_right(self, right: Right) -> List[int]:
+        """Returns all left_ids present for a given Right record"""
+
+        return await self.database.run(lambda cursor: self.model.ids_for_right(cursor, right))
+
+    async def of_right(self, right: Right, *, page: Optional[Page] = None) -> List[Left]:
+        """Returns all Left records which map to a given Right"""
+
+        return await self.database.run(
+            lambda cursor: self.model.of_right(cursor, right, page=page)
+        )
+
+    async def from_right(self, **kwargs: Any) -> List[Left]:
+        """Returns all unique Left records which map to matching Right records"""
+
+        return await self.database.run(functools.partial(self.model.from_right, **kwargs))
+
+    async def count_right(self, right: Right, **kwargs: FilterTypes) -> int:
+        """The number of Left records which map to a given Right, and match the filters"""
+
+        return await self.database.run(
+            lambda cursor: self.model.count_right(cursor, right, **kwargs)
+        )
+
+    async def clear_right(self, right: Right) -> None:
+        """Deletes all records in the join table that feature the given Right record"""
+
+        await self.database.run(lambda cursor: self.model.clear_right(cursor, right))
+
+    async def store(self, left: Left, right: Right) -> bool:
+        """Adds a mapping between the supplied Left and Right"""
+
+        return await self.database.run(lambda cursor: self.model.store(cursor, left, right))
+
+    async def remove(self, left: Left, right: Right) -> bool:
+        """Removes a mapping between the supplied Left and Right"""
+
+        return await self.database.run(lambda cursor: self.model.remove(cursor, left, right))
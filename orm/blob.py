@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+# vim: fileencoding=utf-8 expandtab ts=4 nospell
+
+# SPDX-FileCopyrightText: 2020-2021 Benedict Harcourt <ben.harcourt@harcourtprogramming.co.uk>
+#
+# SPDX-License-Identifier: BSD-2-Clause
+
+"""
+Incremental reads and writes of BLOB (`bytes`) fields.
+
+Loading a record reads each `bytes` field whole, and storing it writes
+the whole value again, copying large payloads several times on the way.
+A BlobStream instead reads and writes the column of one row in place
+(with `Connection.blobopen`, from Python 3.11), a chunk at a time, so the
+payload never has to be held in Python as a whole.
+
+    with Attachment.model(cursor).blob(attachment_id, "data") as blob:
+        blob.copy_to(response)
+
+The field can be deferred (see orm.defer) so that loading the records
+does not read the payloads either.
+
+BlobMixin adds these functions to TableModel.
+"""
+
+from __future__ import annotations
+
+from typing import Any, BinaryIO, Iterable, Iterator, Optional, Union
+
+import dataclasses
+import sqlite3
+
+from orm.abc import ModelledTable, TableBase
+
+
+# Size of the chunks read and written, in bytes.
+CHUNK_SIZE = 1 << 16
+
+Source = Union[BinaryIO, Iterable[bytes]]
+
+
+@dataclasses.dataclass(frozen=True)
+class Payload:
+    """A new value for a `bytes` field: `size` bytes, read from `source`.
+
+    The source is a file object, read a chunk at a time into one buffer,
+    or an iterable of chunks."""
+
+    source: Source
+    size: int
+
+
+def open_blob(
+    connection: sqlite3.Connection, table: str, column: str, row: int, readonly: bool = True
+) -> BlobStream:
+    """Opens the BLOB in a column of a row, by its rowid"""
+
+    if not hasattr(connection, "blobopen"):
+        raise Exception("Incremental BLOB I/O needs Python 3.11 or newer")
+
+    return BlobStream(connection.blobopen(table, column, row, readonly=readonly))
+
+
+class BlobStream:
+    """
+    An open BLOB column of one row.
+
+    The size of a BLOB can not be changed while it is open, so writes can
+    only replace bytes within it; see `TableModel.store_blob` to replace a
+    whole value with one of a different size.
+    """
+
+    blob: Any
+
+    def __init__(self, blob: Any) -> None:
+        self.blob = blob
+
+    def __enter__(self) -> BlobStream:
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self.blob)
+
+    def close(self) -> None:
+        """Closes the BLOB; it can not be used afterwards"""
+
+        self.blob.close()
+
+    def chunks(self, size: int = CHUNK_SIZE, offset: int = 0) -> Iterator[bytes]:
+        """
+        Yields the contents from `offset` onwards, `size` bytes at a time.
+        Each chunk is a new `bytes` object, copied out of SQLite.
+        """
+
+        self.blob.seek(offset)
+
+        while True:
+            data = self.blob.read(size)
+
+            if not data:
+                return
+
+            yield data
+
+    def read_into(self, buffer: Any, offset: int = 0) -> int:
+        """
+        Reads from `offset` into a writable buffer, such as a `bytearray`
+        or `mmap`, until either is full. Returns the number of bytes read.
+
+        The sqlite3 module can not read into a buffer, so each chunk is
+        read as `bytes` and then copied in; this bounds the memory used,
+        not the number of copies.
+        """
+
+        view = memoryview(buffer).cast("B")
+        count = min(len(view), max(len(self) - offset, 0))
+        start = 0
+
+        while start < count:
+            end = min(start + CHUNK_SIZE, count)
+            low, high = offset + start, offset + end
+            view[start:end] = self.blob[low:high]
+            start = end
+
+        return count
+
+    def copy_to(self, target: BinaryIO, size: int = CHUNK_SIZE) -> int:
+        """Writes the contents to a file object, returning the number of bytes written"""
+
+        written = 0
+
+        for chunk in self.chunks(size):
+            target.write(chunk)
+            written += len(chunk)
+
+        return written
+
+    def write(self, data: Any, offset: int = 0) -> None:
+        """Replaces the bytes starting at `offset` with `data`"""
+
+        self.blob.seek(offset)
+        self.blob.write(data)
+
+    def write_from(self, source: Source, offset: int = 0) -> int:
+        """
+        Writes the contents of a file object (read a chunk at a time into
+        one buffer) or an iterable of chunks, starting at `offset`.
+
+        Returns the number of bytes written; writing past the end of the
+        BLOB raises ValueError.
+        """
+
+        self.blob.seek(offset)
+
+        if hasattr(source, "readinto"):
+            return self._write_file(source)  # type: ignore
+
+        written = 0
+
+        for chunk in source:
+            self.blob.write(chunk)
+            written += len(chunk)
+
+        return written
+
+    def _write_file(self, source: BinaryIO) -> int:
+        buffer = bytearray(CHUNK_SIZE)
+        view = memoryview(buffer)
+        written = 0
+
+        while True:
+            count: Optional[int] = source.readinto(view)  # type: ignore
+
+            if not count:
+                return written
+
+            self.blob.write(view[:count])
+            written += count
+
+
+class BlobMixin(TableBase[ModelledTable]):
+    """Incremental reads and writes of the `bytes` fields of a TableModel"""
+
+    def _blob_column(self, field: str) -> str:
+        """The column of a `bytes` field"""
+
+        if self.table_fields.get(field, "").split(" ")[0] != "BLOB":
+            raise ValueError(f"{self.record.__name__} does not have bytes field {field}")
+
+        return field
+
+    def blob(
+        self, cursor: sqlite3.Cursor, unique_id: int, field: str, *, readonly: bool = True
+    ) -> BlobStream:
+        """
+        Opens a `bytes` field of a row for incremental reads (and, if not
+        `readonly`, writes). The field must not be NULL.
+        """
+
+        column = self._blob_column(field)
+
+        return open_blob(cursor.connection, self.table, column, unique_id, readonly)
+
+    def store_blob(
+        self, cursor: sqlite3.Cursor, unique_id: int, field: str, payload: Payload
+    ) -> int:
+        """
+        Replaces a `bytes` field of an existing row with a payload, which
+        is written a chunk at a time.
+
+        The column is first resized to `payload.size` zero bytes, so the
+        source must supply exactly that many: ValueError is raised if it
+        supplies more or fewer, once the bytes it did supply are written
+        (roll back the transaction to discard them). Records already
+        loaded (including those in identity maps) are not updated.
+        Returns the number of bytes written.
+        """
+
+        column = self._blob_column(field)
+        sql = self.statement(
+            ("store_blob", column),
+            lambda: (
+                f"UPDATE [{self.table}] SET [{column}] = zeroblob(:size)"
+                f" WHERE [{self.id_field}] = :id"
+            ),
+        )
+        params = {"size": payload.size, "id": unique_id}
+
+        if self.execute(cursor, "store_blob", sql, params).rowcount != 1:
+            raise LookupError(f"{self.record.__name__} {unique_id} does not exist")
+
+        with self.blob(cursor, unique_id, field, readonly=False) as blob:
+            written = blob.write_from(payload.source)
+
+        if written != payload.size:
+            raise ValueError(f"Expected {payload.size} bytes, but the source had {written}")
+
+        return written
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# vim: fileencoding=utf-8 expandtab ts=4 nospell
+
+# SPDX-FileCopyrightText: 2020-2021 Benedict Harcourt <ben.harcourt@harcourtprogramming.co.uk>
+#
+# SPDX-License-Identifier: BSD-2-Clause
+
+"""
+Generated functions for converting between rows and records.
+
+Building a dict for each row, and then calling the record's constructor
+with it as keyword arguments, is where most of the time goes when loading
+wide tables. Instead, each model generates (once) a function which reads
+the row's tuple positions straight into the constructor's arguments, and
+another which reads a record's attributes straight into the parameters of
+its INSERT statement.
+
+Field names come from the type hints of the record, so are identifiers.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, Iterable, Mapping, Sequence, Tuple, Type
+
+from orm.deferred import DEFERRED
+
+
+Hydrator = Callable[[Sequence[Any], Sequence[Any]], Any]
+Extractor = Callable[[Any], Dict[str, Any]]
+
+# A foreign key to write: the field, its column, the foreign record type, and its ID field.
+ForeignKey = Tuple[str, str, Type[Any], str]
+
+
+def _define(name: str, source: str, namespace: Dict[str, Any]) -> Any:
+    """Compiles the source of a function, and returns the function"""
+
+    exec(compile(source, f"<orm {name}>", "exec"), namespace)  # pylint: disable=exec-used
+
+    return namespace[name]
+
+
+def hydrator(
+    record: Type[Any],
+    positions: Mapping[str, int],
+    extra: Sequence[str],
+    deferred: Iterable[str] = (),
+) -> Hydrator:
+    """
+    Generates a function `hydrate(row, values)` which constructs a record.
+
+    Fields in `positions` are read from that position in the row; the
+    fields in `extra` (foreign objects and sub-table values) are taken
+    from `values`, in the same order. Fields in `deferred` are given the
+    `orm.deferred.DEFERRED` marker.
+    """
+
+    arguments = [f"{field}=row[{position}]" for field, position in positions.items()]
+    arguments += [f"{field}=values[{index}]" for index, field in enumerate(extra)]
+    arguments += [f"{field}=DEFERRED" for field in deferred]
+
+    name = f"hydrate_{record.__name__}"
+    source = f"def {name}(row, values):\n    return record({', '.join(arguments)})\n"
+
+    return _define(name, source, {"record": record, "DEFERRED": DEFERRED})  # type: ignore
+
+
+def extractor(scalars: Iterable[str], foreign: Sequence[ForeignKey]) -> Extractor:
+    """
+    Generates a function `extract(record)` which reads the column values
+    out of a record, as the parameters for a statement.
+
+    Foreign objects are replaced with their ID; any other value (such as
+    an ID set directly, or None) is written as-is.
+    """
+
+    namespace: Dict[str, Any] = {}
+    lines = ["def extract(record):"]
+    items = [f"{field!r}: record.{field}" for field in scalars]
+
+    for index, (field, column, record, id_field) in enumerate(foreign):
+        namespace[f"Foreign{index}"] = record
+        lines.append(f"    foreign{index} = record.{field}")
+        items.append(
+            f"{column!r}: foreign{index}.{id_field} "
+            f"if isinstance(foreign{index}, Foreign{index}) else foreign{index}"
+        )
+
+    lines.append(f"    return {{{', '.join(items)}}}")
+
+    return _define("extract", "\n".join(lines) + "\n", namespace)  # type: ignore
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# vim: fileencoding=utf-8 expandtab ts=4 nospell
+
+# SPDX-FileCopyrightText: 2020-2021 Benedict Harcourt <ben.harcourt@harcourtprogramming.co.uk>
+#
+# SPDX-License-Identifier: BSD-2-Clause
+
+"""
+Deferred loading of (wide) columns.
+
+When records are loaded with some of their columns deferred, those columns
+are not selected, and the records are of a generated subclass of the table
+class in which each deferred field is a descriptor. The first time one of
+those fields is read on any record, the deferred columns are loaded for
+every record from the same query (its batch) with a single `SELECT`.
+
+Records with deferred fields report the table class as their `__class__`,
+in the same way as lazy proxies and compact records, so `isinstance`,
+dataclass equality and `store` treat them as normal records; `store` and
+`==` read (and so load) the deferred fields.
+"""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any, Callable, Dict, FrozenSet, Optional, Tuple, Type
+
+import enum
+import sqlite3
+import types
+
+from orm import slots
+
+if TYPE_CHECKING:
+    from orm.abc import TableBase
+    from orm.model import TableModel
+
+
+class _Marker(enum.Enum):
+    """Marker passed to a record's constructor in place of a deferred value"""
+
+    DEFERRED = "DEFERRED"
+
+    def __repr__(self) -> str:
+        return self.value
+
+
+DEFERRED: Any = _Marker.DEFERRED
+
+# The generated class for each record class and set of deferred fields.
+_CLASSES: Dict[Tuple[Type[Any], FrozenSet[str]], Type[Any]] = {}
+
+
+class DeferredBatch:
+    """The records with deferred fields that were loaded by one query"""
+
+    model: TableModel[Any]
+    cursor: sqlite3.Cursor
+    fields: Tuple[str, ...]
+    records: Dict[int, Any]
+
+    def __init__(
+        self, model: TableModel[Any], cursor: sqlite3.Cursor, fields: FrozenSet[str]
+    ) -> None:
+        self.model = model
+        self.cursor = cursor
+        self.fields = tuple(sorted(fields))
+        self.records = {}
+
+    def add(self, unique_id: int, record: Any) -> None:
+        """Adds a record to the batch"""
+
+        object.__setattr__(record, "_orm_batch", self)
+        self.records[unique_id] = record
+
+    def load(self) -> None:
+        """Loads the deferred fields of every record in the batch"""
+
+        records, self.records = self.records, {}
+        rows = self.model.select_columns(self.cursor, self.fields, list(records))
+
+        for unique_id, *values in rows:
+            record = records[unique_id]
+
+            for field, value in zip(self.fields, values):
+                getattr(type(record), field).fill(record, value)
+
+
+class DeferredField:
+    """Descriptor for a deferred field, which loads its batch on first read"""
+
+    __slots__ = ("name", "read", "write")
+
+    name: str
+    read: Callable[[Any], Any]
+    write: Callable[[Any, Any], None]
+
+    def __init__(self, name: str, slot: Optional[Any]) -> None:
+        self.name = name
+
+        # The slot is the member descriptor of a compact record class;
+        # otherwise, values are kept in the instance dict.
+        if slot is not None:
+            self.read = slot.__get__
+            self.write = slot.__set__
+        else:
+            self.read = self._read_dict
+            self.write = self._write_dict
+
+    def _read_dict(self, record: Any) -> Any:
+        try:
+            return record.__dict__[self.name]
+        except KeyError:
+            raise AttributeError(self.name) from None
+
+    def _write_dict(self, record: Any, value: Any) -> None:
+        record.__dict__[self.name] = value
+
+    def __get__(self, record: Any, owner: Optional[Type[Any]] = None) -> Any:
+        if record is None:
+            return self
+
+        try:
+            return self.read(record)
+        except AttributeError:
+            record._orm_batch.load()
+
+        try:
+            return self.read(record)
+        except AttributeError:
+            table = record.__class__.__name__
+            raise LookupError(f"{table} no longer exists to load `{self.name}` for") from None
+
+    def __set__(self, record: Any, value: Any) -> None:
+        if value is not DEFERRED:
+            self.write(record, value)
+
+    def fill(self, record: Any, value: Any) -> None:
+        """Sets the loaded value, unless the field has been set since"""
+
+        try:
+            self.read(record)
+        except AttributeError:
+            self.write(record, value)
+
+
+def record_class(model: TableBase[Any], compact: bool, fields: FrozenSet[str]) -> Type[Any]:
+    """Gets the record class for a table with the given fields deferred"""
+
+    base = slots.record_class(model.record) if compact else model.record
+
+    if (base, fields) not in _CLASSES:
+        _CLASSES[(base, fields)] = _make_class(model, base, fields)
+
+    return _CLASSES[(base, fields)]
+
+
+def _make_class(model: TableBase[Any], base: Type[Any], fields: FrozenSet[str]) -> Type[Any]:
+    """Creates a subclass of a record class, with descriptors for the deferred fields"""
+
+    table = model.record
+    compact = base is not table
+    names = (*model.scalars, *model.foreigners, *model.submodels)
+    namespace: Dict[str, Any] = {}
+
+    for field in fields:
+        slot = base.__dict__.get(field)
+        slot = slot if isinstance(slot, types.MemberDescriptorType) else None
+        namespace[field] = DeferredField(field, slot)
+
+    namespace["__slots__"] = ("_orm_batch",)
+    namespace["__class__"] = property(lambda _: table)
+    namespace["__reduce__"] = lambda record: (
+        _restore,
+        (table, compact, {field: getattr(record, field) for field in names}),
+    )
+    namespace["__module__"] = table.__module__
+    namespace["__qualname__"] = table.__qualname__
+
+    return type(table.__name__, (base,), namespace)
+
+
+def _restore(table: Type[Any], compact: bool, values: Dict[str, Any]) -> Any:
+    """Unpickles a record that had deferred fields, as a normal (or compact) record"""
+
+    record_type = slots.record_class(table) if compact else table
+    record = object.__new__(record_type)
+
+    for field, value in values.items():
+        object.__setattr__(record, field, value)
+
+    return record
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# vim: fileencoding=utf-8 expandtab ts=4 nospell
+
+# SPDX-FileCopyrightText: 2020-2021 Benedict Harcourt <ben.harcourt@harcourtprogramming.co.uk>
+#
+# SPDX-License-Identifier: BSD-2-Clause
+
+"""
+Query plan diagnostics for the statements the ORM generates.
+
+While a PlanRecorder is capturing, each distinct statement run by a model
+is passed to `EXPLAIN QUERY PLAN` once, and the plan kept along with the
+model and method that ran it. Plans which scan a whole table, or build a
+temporary B-tree (for sorting, grouping or DISTINCT), are flagged, so that
+missing indexes can be found in tests rather than in production.
+
+    with diagnostics.capture() as plans:
+        run_the_test_suite()
+
+    assert not plans.problems(), plans.report()
+"""
+
+from __future__ import annotations
+
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import contextlib
+import dataclasses
+import sqlite3
+import threading
+
+from orm import hooks
+
+
+# Statements which have a query plan worth recording.
+_EXPLAINABLE = ("SELECT", "INSERT", "REPLACE", "UPDATE", "DELETE", "WITH")
+
+
+@dataclasses.dataclass
+class QueryPlan:
+    """The query plan of one statement, and where the statement came from"""
+
+    model: str
+    method: str
+    sql: str
+    steps: List[str]
+
+    @property
+    def scans(self) -> List[str]:
+        """The steps which read every row of a table or index"""
+
+        return [
+            step
+            for step in self.steps
+            if step.startswith("SCAN ")
+            and "VIRTUAL TABLE" not in step
+            and "CONSTANT ROW" not in step
+        ]
+
+    @property
+    def temp_btrees(self) -> List[str]:
+        """The steps which build a temporary B-tree"""
+
+        return [step for step in self.steps if "TEMP B-TREE" in step]
+
+    @property
+    def flagged(self) -> bool:
+        """Whether the plan contains any full scans or temporary B-trees"""
+
+        return bool(self.scans or self.temp_btrees)
+
+    def __str__(self) -> str:
+        steps = "\n".join(f"    {step}" for step in self.steps)
+
+        return f"{self.model}.{self.method}: {self.sql}\n{steps}"
+
+
+class PlanRecorder(hooks.Hook):
+    """Collects the query plans of the statements run while it is installed"""
+
+    plans: Dict[Tuple[str, str, str], QueryPlan]
+
+    def __init__(self) -> None:
+        self.plans = {}
+        self._lock = threading.Lock()
+
+    def statement_start(self, cursor: sqlite3.Cursor, statement: hooks.Statement) -> None:
+        """Records the plan for a statement, if it has not been seen before"""
+
+        sql = statement.sql
+        key = (statement.model, statement.method, sql)
+
+        if key in self.plans or not sql.lstrip().upper().startswith(_EXPLAINABLE):
+            return
+
+        rows = cursor.connection.execute(f"EXPLAIN QUERY PLAN {sql}", statement.params)
+        plan = QueryPlan(*key, [row[-1] for row in rows.fetchall()])
+
+        with self._lock:
+            self.plans.setdefault(key, plan)
+
+    def problems(self) -> List[QueryPlan]:
+        """The plans which contain full scans or temporary B-trees"""
+
+        return [plan for plan in self.plans.values() if plan.flagged]
+
+    def report(self, everything: bool = False) -> str:
+        """A readable list of the flagged plans (or all plans)"""
+
+        plans = self.plans.values() if everything else self.problems()
+
+        return "\n\n".join(map(str, plans))
+
+
+def active() -> Optional[PlanRecorder]:
+    """The (most recently installed) recorder which is capturing, if any"""
+
+    recorders = [hook for hook in hooks.INSTALLED if isinstance(hook, PlanRecorder)]
+
+    return recorders[-1] if recorders else None
+
+
+@contextlib.contextmanager
+def capture(recorder: Optional[PlanRecorder] = None) -> Iterator[PlanRecorder]:
+    """Records the plans of statements run (by any thread) within the block"""
+
+    recorder = recorder or PlanRecorder()
+
+    with hooks.installed(recorder):
+        yield recorder
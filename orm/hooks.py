@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+# vim: fileencoding=utf-8 expandtab ts=4 nospell
+
+# SPDX-FileCopyrightText: 2020-2021 Benedict Harcourt <ben.harcourt@harcourtprogramming.co.uk>
+#
+# SPDX-License-Identifier: BSD-2-Clause
+
+"""
+Instrumentation hooks for the statements the ORM runs.
+
+A Hook receives an event when each statement starts and ends, when rows
+are fetched, and when records are hydrated, tagged with the model and
+method responsible. When no hooks are installed (and debug logging is
+off), statements are run directly, with no events built at all.
+
+    metrics = hooks.Metrics()
+    hooks.install(metrics)
+    hooks.install(hooks.SlowQueryLog(threshold=0.1))
+
+    ...
+
+    print(metrics.report())
+"""
+
+from __future__ import annotations
+
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+)
+
+import bisect
+import contextlib
+import dataclasses
+import logging
+import sqlite3
+import threading
+import time
+
+
+Result = TypeVar("Result")
+
+_LOGGER = logging.getLogger("tiny-orm")
+
+# The installed hooks. This is only ever replaced as a whole (by slice
+# assignment under the lock), and copied before being iterated, so that it
+# can be read without a lock.
+INSTALLED: List[Hook] = []
+
+_INSTALL_LOCK = threading.Lock()
+
+
+@dataclasses.dataclass(frozen=True)
+class Statement:
+    """
+    A statement run by the ORM.
+
+    `model` is the name of the model's table, and `method` the name of the
+    model function which ran the statement. For statements run with
+    `executemany`, `params` are those of the first row.
+    """
+
+    model: str
+    method: str
+    sql: str
+    params: Any = ()
+
+
+class Hook:
+    """Base class for instrumentation hooks; override the events you need"""
+
+    def statement_start(self, cursor: sqlite3.Cursor, statement: Statement) -> None:
+        """Called before a statement is run"""
+
+    def statement_end(
+        self, statement: Statement, elapsed: float, error: Optional[BaseException]
+    ) -> None:
+        """Called after a statement has run (or failed), with the time taken in seconds"""
+
+    def rows_fetched(self, model: str, method: str, rows: int) -> None:
+        """Called when rows have been read from a statement's results"""
+
+    def records_hydrated(self, model: str, records: int, elapsed: float) -> None:
+        """Called when rows have been converted into records, with the time taken"""
+
+
+def install(hook: Hook) -> None:
+    """Starts sending events to a hook"""
+
+    with _INSTALL_LOCK:
+        INSTALLED[:] = [*INSTALLED, hook]
+
+
+def uninstall(hook: Hook) -> None:
+    """Stops sending events to a hook"""
+
+    with _INSTALL_LOCK:
+        INSTALLED[:] = [installed for installed in INSTALLED if installed is not hook]
+
+
+@contextlib.contextmanager
+def installed(hook: Hook) -> Iterator[Hook]:
+    """Sends events to a hook for the duration of a block"""
+
+    install(hook)
+
+    try:
+        yield hook
+    finally:
+        uninstall(hook)
+
+
+def observed() -> bool:
+    """Whether statements need to be reported to hooks or the debug log"""
+
+    return bool(INSTALLED) or _LOGGER.isEnabledFor(logging.DEBUG)
+
+
+def run(
+    execute: Callable[[str, Any], Result],
+    cursor: sqlite3.Cursor,
+    statement: Statement,
+    params: Any,
+) -> Result:
+    """
+    Runs a statement, reporting it to the installed hooks and debug log.
+
+    `params` are those passed to `execute`, which may differ from those of
+    the statement reported to the hooks (see `Statement`).
+    """
+
+    _LOGGER.debug(
+        "%s.%s: %s %r", statement.model, statement.method, statement.sql, statement.params
+    )
+
+    hooks = tuple(INSTALLED)
+
+    for hook in hooks:
+        hook.statement_start(cursor, statement)
+
+    error: Optional[BaseException] = None
+    start = time.perf_counter()
+
+    try:
+        return execute(statement.sql, params)
+    except BaseException as exception:
+        error = exception
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+
+        for hook in hooks:
+            hook.statement_end(statement, elapsed, error)
+
+
+def rows_fetched(model: str, method: str, rows: int) -> None:
+    """Reports fetched rows to the installed hooks"""
+
+    for hook in tuple(INSTALLED):
+        hook.rows_fetched(model, method, rows)
+
+
+def records_hydrated(model: str, records: int, elapsed: float) -> None:
+    """Reports hydrated records to the installed hooks"""
+
+    for hook in tuple(INSTALLED):
+        hook.records_hydrated(model, records, elapsed)
+
+
+# Upper bounds, in seconds, of the buckets in Metrics histograms.
+BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+
+@dataclasses.dataclass
+class MethodMetrics:
+    """The counters and statement time histogram for one model method"""
+
+    statements: int = 0
+    errors: int = 0
+    rows: int = 0
+    time: float = 0.0
+    slowest: float = 0.0
+
+    # Statement counts for each bucket in BUCKETS, with one more for the rest.
+    histogram: List[int] = dataclasses.field(default_factory=lambda: [0] * (len(BUCKETS) + 1))
+
+
+class Metrics(Hook):
+    """
+    Aggregates statement counts, times and rows per model method, and the
+    number of records hydrated and time spent doing so per model.
+    """
+
+    methods: Dict[Tuple[str, str], MethodMetrics]
+    hydrated: Dict[str, Tuple[int, float]]
+
+    def __init__(self) -> None:
+        self.methods = {}
+        self.hydrated = {}
+        self._lock = threading.Lock()
+
+    def _method(self, model: str, method: str) -> MethodMetrics:
+        key = (model, method)
+
+        if key not in self.methods:
+            self.methods[key] = MethodMetrics()
+
+        return self.methods[key]
+
+    def statement_end(
+        self, statement: Statement, elapsed: float, error: Optional[BaseException]
+    ) -> None:
+        with self._lock:
+            metrics = self._method(statement.model, statement.method)
+            metrics.statements += 1
+            metrics.errors += error is not None
+            metrics.time += elapsed
+            metrics.slowest = max(metrics.slowest, elapsed)
+            metrics.histogram[bisect.bisect_left(BUCKETS, elapsed)] += 1
+
+    def rows_fetched(self, model: str, method: str, rows: int) -> None:
+        with self._lock:
+            self._method(model, method).rows += rows
+
+    def records_hydrated(self, model: str, records: int, elapsed: float) -> None:
+        with self._lock:
+            count, total = self.hydrated.get(model, (0, 0.0))
+            self.hydrated[model] = (count + records, total + elapsed)
+
+    def report(self) -> str:
+        """A readable table of the metrics collected so far"""
+
+        lines = [
+            f"{'method':<32} {'statements':>10} {'errors':>6} {'rows':>10} "
+            f"{'total ms':>10} {'max ms':>8}"
+        ]
+
+        for (model, method), metrics in sorted(self.methods.items()):
+            lines.append(
+                f"{model + '.' + method:<32} {metrics.statements:>10} {metrics.errors:>6} "
+                f"{metrics.rows:>10} {metrics.time * 1000:>10.2f} {metrics.slowest * 1000:>8.2f}"
+            )
+
+        for model, (records, elapsed) in sorted(self.hydrated.items()):
+            lines.append(
+                f"{model + ' hydration':<32} {records:>10} records {elapsed * 1000:.2f}ms"
+            )
+
+        return "\n".join(lines)
+
+
+class SlowQueryLog(Hook):
+    """Logs a warning for each statement which takes longer than `threshold` seconds"""
+
+    threshold: float
+    logger: logging.Logger
+
+    def __init__(self, threshold: float, logger: Optional[logging.Logger] = None) -> None:
+        self.threshold = threshold
+        self.logger = logger or logging.getLogger("tiny-orm.slow")
+
+    def statement_end(
+        self, statement: Statement, elapsed: float, error: Optional[BaseException]
+    ) -> None:
+        if elapsed >= self.threshold:
+            self.logger.warning(
+                "Slow query (%.1fms) in %s.%s: %s %r",
+                elapsed * 1000,
+                statement.model,
+                statement.method,
+                statement.sql,
+                statement.params,
+            )
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# vim: fileencoding=utf-8 expandtab ts=4 nospell
+
+# SPDX-FileCopyrightText: 2020-2021 Benedict Harcourt <ben.harcourt@harcourtprogramming.co.uk>
+#
+# SPDX-License-Identifier: BSD-2-Clause
+
+"""
+Session scoped cache of records, keyed by their model and ID.
+
+An IdentityMap can be passed to Table.model() so that each row is only
+loaded once, and the same object is returned for it every time.
+"""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any, Dict, Iterable, MutableMapping, Optional, Tuple
+
+import collections
+import weakref
+
+if TYPE_CHECKING:
+    from orm.abc import TableBase
+
+
+Key = Tuple["TableBase[Any]", int]
+
+
+class IdentityMap:
+    """
+    Cache of records, keyed by their model and ID.
+
+    By default, records are held with weak references, and so remain in the
+    map for as long as something else in the program is using them.
+    If a size is given, the map instead holds strong references to the
+    most recently used `size` records.
+
+        identity = IdentityMap()
+
+        users = User.model(cursor, identity)
+        comments = Comment.model(cursor, identity)
+
+        # Comments by the same User now share one User object.
+        comments.all()
+    """
+
+    size: Optional[int]
+    records: MutableMapping[Key, Any]
+    recent: Optional[collections.OrderedDict[Key, Any]]
+
+    def __init__(self, size: Optional[int] = None) -> None:
+        # With a size, the records are kept in order of use, oldest first.
+        self.size = size
+        self.recent = None if size is None else collections.OrderedDict()
+        self.records = weakref.WeakValueDictionary() if self.recent is None else self.recent
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def get(self, model: TableBase[Any], unique_id: int) -> Optional[Any]:
+        """Gets the record with the given ID, if it is in the map"""
+
+        record = self.records.get((model, unique_id))
+
+        if record is not None and self.recent is not None:
+            self.recent.move_to_end((model, unique_id))
+
+        return record
+
+    def get_many(self, model: TableBase[Any], ids: Iterable[int]) -> Dict[int, Any]:
+        """Gets all the records with the given IDs that are in the map"""
+
+        found = {}
+
+        for unique_id in ids:
+            record = self.get(model, unique_id)
+
+            if record is not None:
+                found[unique_id] = record
+
+        return found
+
+    def put(self, model: TableBase[Any], unique_id: int, record: Any) -> None:
+        """Adds or replaces the record with the given ID"""
+
+        self.records[(model, unique_id)] = record
+
+        if self.recent is not None and self.size is not None:
+            self.recent.move_to_end((model, unique_id))
+
+            while len(self.recent) > self.size:
+                self.recent.popitem(last=False)
+
+    def add(self, model: TableBase[Any], unique_id: int, record: Any) -> Any:
+        """Adds the record with the given ID, unless the map already has one.
+
+        Returns the record that is now in the map for that ID."""
+
+        existing = self.get(model, unique_id)
+
+        if existing is not None:
+            return existing
+
+        self.put(model, unique_id, record)
+
+        return record
+
+    def discard(self, model: TableBase[Any], unique_id: int) -> None:
+        """Removes the record with the given ID, if it is in the map"""
+
+        self.records.pop((model, unique_id), None)
+
+    def clear(self) -> None:
+        """Removes all records from the map"""
+
+        self.records.clear()
@@ -20,21 +20,26 @@ from typing import (
     Dict,
     Generic,
     List,
+    Mapping,
+    Optional,
+    Tuple,
     Type,
     TypeVar,
 )
 
 import inspect
-import logging
 import sqlite3
 
-from .table import TableModel, Table, _get_model
+from .abc import BaseModel, FilterTypes, split_operator
+from .model import TableModel
+from .pagination import Page, in_order, page_ids
+from .pool import ConnectionPool
+from .table import Table, _get_model
 
 
 Left = TypeVar("Left", bound=Table[Any])
 Right = TypeVar("Right", bound=Table[Any])
 
-_LOGGER = logging.getLogger("tiny-orm")
 _MODELS: Dict[Type[JoinTable[Left, Right]], JoinModel[Left, Right]] = {}  # type: ignore
 
 
@@ -60,10 +65,10 @@ def _make_join(data_class: Type[JoinTable[Left, Right]]) -> JoinModel[Left, Righ
 
     left, right = types.values()
 
-    if issubclass(left, Table):
+    if not issubclass(left, Table):
         raise Exception(f"{left.__name__} is not a Table")
 
-    if issubclass(right, Table):
+    if not issubclass(right, Table):
         raise Exception(f"{right.__name__} is not a Table")
 
     table = data_class.__name__
@@ -94,21 +99,28 @@ class JoinTable(Generic[Left, Right]):
         return JoinWrapper(_get_join(cls), cursor)
 
     @classmethod
-    def create_table(cls, cursor: sqlite3.Cursor) -> None:
+    def pooled(cls, pool: ConnectionPool) -> PooledJoinWrapper[Left, Right]:
+        """Get the model instance, borrowing connections from the supplied pool"""
+
+        return PooledJoinWrapper(_get_join(cls), pool)
+
+    @classmethod
+    def create_table(cls, cursor: sqlite3.Cursor, auto_index: bool = True) -> None:
         """
         Ensures that this table is created in the SQLite database backing
         the supplied cursor.
 
         It is recommended that you call this function as soon as you open the
         database, unless your program design guarantees the table will exist.
+        `auto_index` is passed on when creating the Left and Right tables.
 
         Note that py-tiny-orm does not support altering models.
         """
 
-        _get_join(cls).create_table(cursor)
+        _get_join(cls).create_table(cursor, auto_index)
 
 
-class JoinModel(Generic[Left, Right]):
+class JoinModel(Generic[Left, Right], BaseModel):
     """
     The generated model for a given JoinTable.
     """
@@ -120,33 +132,97 @@ class JoinModel(Generic[Left, Right]):
     right: TableModel[Right]
 
     def __init__(self, table: str, left: TableModel[Left], right: TableModel[Right]):
+        super().__init__()
+
         self.table = table
         self.left = left
         self.right = right
 
-    def create_table(self, cursor: sqlite3.Cursor) -> None:
+    @property
+    def label(self) -> str:
+        """The name of this model, as used in diagnostics"""
+
+        return self.table
+
+    def create_table(self, cursor: sqlite3.Cursor, auto_index: bool = True) -> None:
         """
         Creates the table in the SQLLite
+
+        The table is stored WITHOUT ROWID, so the primary key is the table,
+        and a reverse (right, left) index makes lookups in both directions
+        read only the index.
         """
 
-        self.left.create_table(cursor)
-        self.right.create_table(cursor)
+        self.left.create_table(cursor, auto_index)
+        self.right.create_table(cursor, auto_index)
+
+        for sql in self._create_table_sql():
+            self.execute(cursor, "create_table", sql)
+
+    def _create_table_sql(self) -> List[str]:
+        """CREATE statements for the join table and its reverse index"""
 
-        sql = f"""
+        left, right = self.left.id_field, self.right.id_field
+
+        table = f"""
             CREATE TABLE IF NOT EXISTS [{self.table}] (
-              [{self.left.id_field}] INTEGER NOT NULL,
-              [{self.right.id_field}] INTEGER NOT NULL,
-              PRIMARY KEY ([{self.left.id_field}], [{self.right.id_field}]),
-              FOREIGN KEY ([{self.left.id_field}])
-                REFERENCES [{self.left.table}] ([{self.left.id_field}]),
-              FOREIGN KEY ([{self.right.id_field}])
-                REFERENCES [{self.right.table}] ([{self.right.id_field}])
-            )
+              [{left}] INTEGER NOT NULL,
+              [{right}] INTEGER NOT NULL,
+              PRIMARY KEY ([{left}], [{right}]),
+              FOREIGN KEY ([{left}]) REFERENCES [{self.left.table}] ([{left}]),
+              FOREIGN KEY ([{right}]) REFERENCES [{self.right.table}] ([{right}])
+            ) WITHOUT ROWID
         """
 
-        _LOGGER.debug(sql)
+        index = (
+            f"CREATE INDEX IF NOT EXISTS [{self.table}__{right}__{left}] "
+            f"ON [{self.table}] ([{right}], [{left}])"
+        )
+
+        return [table, index]
+
+    def _matching(
+        self, model: TableModel[Any], other: TableModel[Any], kwargs: Dict[str, Any]
+    ) -> Tuple[str, Dict[str, Any]]:
+        """
+        SELECT statement for the IDs of `other` which map to the records of
+        `model` that match the filters (as for `search` on `model`).
+        """
+
+        for key in kwargs:
+            field, _ = split_operator(key)
 
-        cursor.execute(sql)
+            if field not in model.table_fields and field not in model.foreigners:
+                raise AttributeError(f"{model.record.__name__} has no attribute {field}")
+
+        where, params = model.where(model.foreigners, kwargs)
+        matches = model.filtered_sql(f"[{model.id_field}]", where)
+        sql = self.statement(
+            ("matching", model.table, where),
+            lambda: f"SELECT DISTINCT [{other.id_field}] FROM [{self.table}] "
+            f"WHERE [{model.id_field}] IN ({matches})",
+        )
+
+        return sql, params
+
+    @staticmethod
+    def _page(
+        cursor: sqlite3.Cursor,
+        method: str,
+        model: TableModel[Any],
+        where: Tuple[str, Mapping[str, Any]],
+        page: Page,
+    ) -> List[Any]:
+        """
+        Gets a page of the records of one side which match an SQL condition.
+
+        The ordering and paging is done in SQL (see `orm.pagination.page_ids`),
+        and the records are returned in that order.
+        """
+
+        ids = page_ids(model, cursor, method, page, where)
+
+        return in_order(model.get_many(cursor, *ids), ids)
 
     def ids_for_left(self, cursor: sqlite3.Cursor, left: Left) -> List[int]:
         """
@@ -157,23 +233,43 @@ class JoinModel(Generic[Left, Right]):
         foreign key lookups.
         """
 
-        sql = f"SELECT [{self.right.id_field}] FROM [{self.table}] WHERE [{self.left.id_field}] = ?"
+        sql = self.statement(
+            "ids_for_left",
+            lambda: f"SELECT [{self.right.id_field}] FROM [{self.table}] "
+            f"WHERE [{self.left.id_field}] = ?",
+        )
 
-        _LOGGER.debug(sql)
-        _LOGGER.debug(getattr(left, self.left.id_field))
+        rows = self.fetch(cursor, "ids_for_left", sql, (getattr(left, self.left.id_field),))
 
-        cursor.execute(sql, (getattr(left, self.left.id_field),))
+        return [x[0] for x in rows]
 
-        return [x[0] for x in cursor.fetchall()]
+    def of_left(
+        self, cursor: sqlite3.Cursor, left: Left, *, page: Optional[Page] = None
+    ) -> List[Right]:
+        """
+        Returns all Right records which map to a given Left.
 
-    def of_left(self, cursor: sqlite3.Cursor, left: Left) -> List[Right]:
-        """Returns all Right records which map to a given Left"""
+        With a `page`, one page of the records is returned in order,
+        as for `TableModel.search`.
+        """
+
+        if page is not None:
+            condition = self.statement(
+                "of_left_page",
+                lambda: f"[{self.right.id_field}] IN (SELECT [{self.right.id_field}] "
+                f"FROM [{self.table}] WHERE [{self.left.id_field}] = :__left)",
+            )
+            params = {"__left": getattr(left, self.left.id_field)}
+
+            return self._page(cursor, "of_left", self.right, (condition, params), page)
 
         ids = self.ids_for_left(cursor, left)
 
         return list(self.right.get_many(cursor, *ids).values())
 
-    def from_left(self, cursor: sqlite3.Cursor, **kwargs: Any) -> List[Right]:
+    def from_left(
+        self, cursor: sqlite3.Cursor, *, page: Optional[Page] = None, **kwargs: Any
+    ) -> List[Right]:
         """
         Returns all unique Right records which map to Left records that match
         the given search criteria. No information about which Left they
@@ -191,36 +287,48 @@ class JoinModel(Generic[Left, Right]):
             return lefts.values()
 
         but this function will be considerably more efficient.
+
+        With a `page`, one page of the Right records is returned in order,
+        as for `TableModel.search`.
         """
 
-        for key in kwargs:
-            if key not in self.left.table_fields:
-                raise AttributeError(f"{self.left.record.__name__} has no attribute {key}")
+        sql, params = self._matching(self.left, self.right, kwargs)
 
-        def field(_field: str) -> str:
-            return f"[{_field}] = :{_field}"
+        if page is not None:
+            condition = f"[{self.right.id_field}] IN ({sql})"
 
-        sql = (
-            f"SELECT DISTINCT [{self.right.id_field}] "
-            f"FROM [{self.left.table}] JOIN [{self.table}] USING ([{self.left.id_field}]) "
-            f"WHERE {' AND '.join(map(field, kwargs))}"
-        )
+            return self._page(cursor, "from_left", self.right, (condition, params), page)
 
-        _LOGGER.debug(sql)
-        _LOGGER.debug(kwargs)
+        ids = [x[0] for x in self.fetch(cursor, "from_left", sql, params)]
 
-        cursor.execute(sql, kwargs)
+        return list(self.right.get_many(cursor, *ids).values())
 
-        ids = [x[0] for x in cursor.fetchall()]
+    def count_left(self, cursor: sqlite3.Cursor, left: Left, **kwargs: FilterTypes) -> int:
+        """
+        The number of Right records which map to a given Left, and (optionally)
+        match the given filters, as for search on the Right model.
 
-        return list(self.right.get_many(cursor, *ids).values())
+        The rows are counted in SQLite; no records are loaded.
+        """
+
+        where, params = self._mapped_to(self.left, left, self.right, kwargs)
+        sql = self.statement(
+            ("count_left", where), lambda: self._count_sql(self.left, self.right, where)
+        )
+
+        result: int = self.fetch(cursor, "count_left", sql, params)[0][0]
+
+        return result
 
     def clear_left(self, cursor: sqlite3.Cursor, left: Left) -> None:
         """Deletes all records in the join table that feature the given Left record"""
 
-        sql = f"DELETE FROM [{self.table}] WHERE [{self.left.id_field}] = ?"
+        sql = self.statement(
+            "clear_left",
+            lambda: f"DELETE FROM [{self.table}] WHERE [{self.left.id_field}] = ?",
+        )
 
-        cursor.execute(sql, (getattr(left, self.left.id_field),))
+        self.execute(cursor, "clear_left", sql, (getattr(left, self.left.id_field),))
 
     def ids_for_right(self, cursor: sqlite3.Cursor, right: Right) -> List[int]:
         """
@@ -231,23 +339,45 @@ class JoinModel(Generic[Left, Right]):
         foreign key lookups.
         """
 
-        sql = f"""
-            SELECT [{self.left.id_field}]
-            FROM [{self.table}] WHERE [{self.right.id_field}] = ?
+        sql = self.statement(
+            "ids_for_right",
+            lambda: f"SELECT [{self.left.id_field}] FROM [{self.table}] "
+            f"WHERE [{self.right.id_field}] = ?",
+        )
+
+        rows = self.fetch(
+            cursor, "ids_for_right", sql, (getattr(right, self.right.id_field),)
+        )
+
+        return [x[0] for x in rows]
+
+    def of_right(
+        self, cursor: sqlite3.Cursor, right: Right, *, page: Optional[Page] = None
+    ) -> List[Left]:
         """
+        Returns all Left records which map to a given Right.
 
-        cursor.execute(sql, tuple(getattr(right, self.right.id_field)))
+        With a `page`, one page of the records is returned in order,
+        as for `TableModel.search`.
+        """
 
-        return [x[0] for x in cursor.fetchall()]
+        if page is not None:
+            condition = self.statement(
+                "of_right_page",
+                lambda: f"[{self.left.id_field}] IN (SELECT [{self.left.id_field}] "
+                f"FROM [{self.table}] WHERE [{self.right.id_field}] = :__right)",
+            )
+            params = {"__right": getattr(right, self.right.id_field)}
 
-    def of_right(self, cursor: sqlite3.Cursor, right: Right) -> List[Left]:
-        """Returns all Left records which map to a given Right"""
+            return self._page(cursor, "of_right", self.left, (condition, params), page)
 
         ids = self.ids_for_right(cursor, right)
 
         return list(self.left.get_many(cursor, *ids).values())
 
-    def from_right(self, cursor: sqlite3.Cursor, **kwargs: Any) -> List[Left]:
+    def from_right(
+        self, cursor: sqlite3.Cursor, *, page: Optional[Page] = None, **kwargs: Any
+    ) -> List[Left]:
         """
         Returns all unique Left records which map to Right records that match
         the given search criteria. No information about which Right they
@@ -265,36 +395,78 @@ class JoinModel(Generic[Left, Right]):
             return lefts.values()
 
         but this function will be considerably more efficient.
+
+        With a `page`, one page of the Left records is returned in order,
+        as for `TableModel.search`.
         """
 
-        for key in kwargs:
-            if key not in self.right.table_fields:
-                raise AttributeError(f"{self.right.record.__name__} has no attribute {key}")
+        sql, params = self._matching(self.right, self.left, kwargs)
 
-        def field(_field: str) -> str:
-            return f"[{_field}] = :{_field}"
+        if page is not None:
+            condition = f"[{self.left.id_field}] IN ({sql})"
 
-        sql = (
-            f"SELECT DISTINCT [{self.left.id_field}] "
-            f"FROM [{self.right.table}] JOIN [{self.table}] USING ([{self.right.id_field}]) "
-            f"WHERE {' AND '.join(map(field, kwargs))}"
-        )
+            return self._page(cursor, "from_right", self.left, (condition, params), page)
 
-        _LOGGER.debug(sql)
-        _LOGGER.debug(kwargs)
+        ids = [x[0] for x in self.fetch(cursor, "from_right", sql, params)]
 
-        cursor.execute(sql, kwargs)
+        return list(self.left.get_many(cursor, *ids).values())
 
-        ids = [x[0] for x in cursor.fetchall()]
+    def count_right(self, cursor: sqlite3.Cursor, right: Right, **kwargs: FilterTypes) -> int:
+        """
+        The number of Left records which map to a given Right, and (optionally)
+        match the given filters, as for search on the Left model.
 
-        return list(self.left.get_many(cursor, *ids).values())
+        The rows are counted in SQLite; no records are loaded.
+        """
+
+        where, params = self._mapped_to(self.right, right, self.left, kwargs)
+        sql = self.statement(
+            ("count_right", where), lambda: self._count_sql(self.right, self.left, where)
+        )
+
+        result: int = self.fetch(cursor, "count_right", sql, params)[0][0]
+
+        return result
 
     def clear_right(self, cursor: sqlite3.Cursor, right: Right) -> None:
         """Deletes all records in the join table that feature the given Right record"""
 
-        sql = f"DELETE FROM [{self.table}] WHERE [{self.right.id_field}] = ?"
+        sql = self.statement(
+            "clear_right",
+            lambda: f"DELETE FROM [{self.table}] WHERE [{self.right.id_field}] = ?",
+        )
+
+        self.execute(cursor, "clear_right", sql, (getattr(right, self.right.id_field),))
 
-        cursor.execute(sql, (getattr(right, self.right.id_field),))
+    @staticmethod
+    def _mapped_to(
+        model: TableModel[Any], record: Any, other: TableModel[Any], kwargs: Dict[str, Any]
+    ) -> Tuple[str, Dict[str, Any]]:
+        """
+        The WHERE clause (see BaseModel.where) for the records of `other`
+        which match the filters, with the ID of a record of `model` added to
+        the parameters as `__record`.
+        """
+
+        if not isinstance(record, model.record):
+            raise Exception("Wrong type")
+
+        where, params = other.where(other.foreigners, kwargs)
+        params["__record"] = getattr(record, model.id_field)
+
+        return where, params
+
+    def _count_sql(self, model: TableModel[Any], other: TableModel[Any], where: str) -> str:
+        """Statement counting the records of `other` which map to `:__record` of `model`"""
+
+        sql = f"SELECT COUNT(*) FROM [{self.table}] WHERE [{model.id_field}] = :__record"
+
+        if not where:
+            return sql
+
+        matches = other.filtered_sql(f"[{other.id_field}]", where)
+
+        return f"{sql} AND [{other.id_field}] IN ({matches})"
 
     def store(self, cursor: sqlite3.Cursor, left: Left, right: Right) -> bool:
         """
@@ -312,16 +484,14 @@ class JoinModel(Generic[Left, Right]):
         left_id = getattr(left, self.left.id_field)
         right_id = getattr(right, self.right.id_field)
 
-        sql = (
-            f"INSERT OR IGNORE INTO [{self.table}] "
+        sql = self.statement(
+            "store",
+            lambda: f"INSERT OR IGNORE INTO [{self.table}] "
             f"([{self.left.id_field}], [{self.right.id_field}]) "
-            f"VALUES (?, ?)"
+            f"VALUES (?, ?)",
         )
 
-        _LOGGER.debug(sql)
-        _LOGGER.debug(left_id, right_id)
-
-        cursor.execute(sql, (left_id, right_id))
+        self.execute(cursor, "store", sql, (left_id, right_id))
 
         return True
 
@@ -341,15 +511,13 @@ class JoinModel(Generic[Left, Right]):
         left_id = getattr(left, self.left.id_field)
         right_id = getattr(right, self.right.id_field)
 
-        sql = (
-            f"DELETE FROM [{self.table}] "
-            f"WHERE [{self.left.id_field}] = ? AND [{self.right.id_field}] = ?"
+        sql = self.statement(
+            "remove",
+            lambda: f"DELETE FROM [{self.table}] "
+            f"WHERE [{self.left.id_field}] = ? AND [{self.right.id_field}] = ?",
         )
 
-        _LOGGER.debug(sql)
-        _LOGGER.debug(left_id, right_id)
-
-        cursor.execute(sql, (left_id, right_id))
+        self.execute(cursor, "remove", sql, (left_id, right_id))
 
         return True
 
@@ -381,10 +549,14 @@ class JoinWrapper(Generic[Left, Right]):
 
         return self.model.ids_for_left(self.cursor, left)
 
-    def of_left(self, left: Left) -> List[Right]:
-        """Returns all Right records which map to a given Left"""
+    def of_left(self, left: Left, *, page: Optional[Page] = None) -> List[Right]:
+        """
+        Returns all Right records which map to a given Left.
+
+        A `page` returns one page of the records, in order; see orm.Page.
+        """
 
-        return self.model.of_left(self.cursor, left)
+        return self.model.of_left(self.cursor, left, page=page)
 
     def from_left(self, **kwargs: Any) -> List[Right]:
         """
@@ -404,10 +576,17 @@ class JoinWrapper(Generic[Left, Right]):
             return lefts.values()
 
         but this function will be considerably more efficient.
+
+        A `page` returns one page of the records, in order; see orm.Page.
         """
 
         return self.model.from_left(self.cursor, **kwargs)
 
+    def count_left(self, left: Left, **kwargs: FilterTypes) -> int:
+        """The number of Right records which map to a given Left, and match the filters"""
+
+        return self.model.count_left(self.cursor, left, **kwargs)
+
     def clear_left(self, left: Left) -> None:
         """Deletes all records in the join table that feature the given Left record"""
 
@@ -424,10 +603,14 @@ class JoinWrapper(Generic[Left, Right]):
 
         return self.model.ids_for_right(self.cursor, right)
 
-    def of_right(self, right: Right) -> List[Left]:
-        """Returns all Left records which map to a given Right"""
+    def of_right(self, right: Right, *, page: Optional[Page] = None) -> List[Left]:
+        """
+        Returns all Left records which map to a given Right.
+
+        A `page` returns one page of the records, in order; see orm.Page.
+        """
 
-        return self.model.of_right(self.cursor, right)
+        return self.model.of_right(self.cursor, right, page=page)
 
     def from_right(self, **kwargs: Any) -> List[Left]:
         """
@@ -447,10 +630,17 @@ class JoinWrapper(Generic[Left, Right]):
             return lefts.values()
 
         but this function will be considerably more efficient.
+
+        A `page` returns one page of the records, in order; see orm.Page.
         """
 
         return self.model.from_right(self.cursor, **kwargs)
 
+    def count_right(self, right: Right, **kwargs: FilterTypes) -> int:
+        """The number of Left records which map to a given Right, and match the filters"""
+
+        return self.model.count_right(self.cursor, right, **kwargs)
+
     def clear_right(self, right: Right) -> None:
         """Deletes all records in the join table that feature the given Right record"""
 
@@ -473,3 +663,92 @@ class JoinWrapper(Generic[Left, Right]):
         """
 
         return self.model.remove(self.cursor, left, right)
+
+
+class PooledJoinWrapper(Generic[Left, Right]):
+    """
+    Binding class between a JoinTable, it's Model, and a ConnectionPool.
+
+    Each call borrows a connection from the pool for the current thread,
+    or uses the connection of the thread's current `pool.unit_of_work()`.
+    See JoinWrapper for the details of each function.
+    """
+
+    model: JoinModel[Left, Right]
+    pool: ConnectionPool
+
+    def __init__(self, model: JoinModel[Left, Right], pool: ConnectionPool):
+        self.model = model
+        self.pool = pool
+
+    def ids_for_left(self, left: Left) -> List[int]:
+        """Returns all right_ids present for a given Left record"""
+
+        with self.pool.cursor() as cursor:
+            return self.model.ids_for_left(cursor, left)
+
+    def of_left(self, left: Left, *, page: Optional[Page] = None) -> List[Right]:
+        """Returns all Right records which map to a given Left"""
+
+        with self.pool.cursor() as cursor:
+            return self.model.of_left(cursor, left, page=page)
+
+    def from_left(self, **kwargs: Any) -> List[Right]:
+        """Returns all unique Right records which map to matching Left records"""
+
+        with self.pool.cursor() as cursor:
+            return self.model.from_left(cursor, **kwargs)
+
+    def count_left(self, left: Left, **kwargs: FilterTypes) -> int:
+        """The number of Right records which map to a given Left, and match the filters"""
+
+        with self.pool.cursor() as cursor:
+            return self.model.count_left(cursor, left, **kwargs)
+
+    def clear_left(self, left: Left) -> None:
+        """Deletes all records in the join table that feature the given Left record"""
+
+        with self.pool.cursor() as cursor:
+            self.model.clear_left(cursor, left)
+
+    def ids_for_right(self, right: Right) -> List[int]:
+        """Returns all left_ids present for a given Right record"""
+
+        with self.pool.cursor() as cursor:
+            return self.model.ids_for_right(cursor, right)
+
+    def of_right(self, right: Right, *, page: Optional[Page] = None) -> List[Left]:
+        """Returns all Left records which map to a given Right"""
+
+        with self.pool.cursor() as cursor:
+            return self.model.of_right(cursor, right, page=page)
+
+    def from_right(self, **kwargs: Any) -> List[Left]:
+        """Returns all unique Left records which map to matching Right records"""
+
+        with self.pool.cursor() as cursor:
+            return self.model.from_right(cursor, **kwargs)
+
+    def count_right(self, right: Right, **kwargs: FilterTypes) -> int:
+        """The number of Left records which map to a given Right, and match the filters"""
+
+        with self.pool.cursor() as cursor:
+            return self.model.count_right(cursor, right, **kwargs)
+
+    def clear_right(self, right: Right) -> None:
+        """Deletes all records in the join table that feature the given Right record"""
+
+        with self.pool.cursor() as cursor:
+            self.model.clear_right(cursor, right)
+
+    def store(self, left: Left, right: Right) -> bool:
+        """Adds a mapping between the supplied Left and Right"""
+
+        with self.pool.cursor() as cursor:
+            return self.model.store(cursor, left, right)
+
+    def remove(self, left: Left, right: Right) -> bool:
+        """Removes a mapping between the supplied Left and Right"""
+
+        with self.pool.cursor() as cursor:
+            return self.model.remove(cursor, left, right)
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# vim: fileencoding=utf-8 expandtab ts=4 nospell
+
+# SPDX-FileCopyrightText: 2020-2021 Benedict Harcourt <ben.harcourt@harcourtprogramming.co.uk>
+#
+# SPDX-License-Identifier: BSD-2-Clause
+
+"""
+Lazily loaded foreign objects.
+
+When records are loaded with the "lazy" strategy, their foreign fields
+are filled with LazyRecord proxies that hold only the ID. The first time
+a proxy is used, it and all of its siblings (the proxies for the same
+model created by the same query) are loaded together.
+"""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any, Dict
+
+import sqlite3
+
+if TYPE_CHECKING:
+    from orm.loading import Loading
+    from orm.model import TableModel
+
+
+class LazyBatch:
+    """The set of proxies for one model that were created by one query"""
+
+    model: TableModel[Any]
+    cursor: sqlite3.Cursor
+    loading: Loading
+    proxies: Dict[int, LazyRecord]
+
+    def __init__(
+        self, model: TableModel[Any], cursor: sqlite3.Cursor, loading: Loading
+    ) -> None:
+        self.model = model
+        self.cursor = cursor
+        self.loading = loading
+        self.proxies = {}
+
+    def proxy(self, unique_id: int) -> LazyRecord:
+        """Gets the proxy for the given ID in this batch"""
+
+        if unique_id not in self.proxies:
+            self.proxies[unique_id] = LazyRecord(self, unique_id)
+
+        return self.proxies[unique_id]
+
+    def bind(self, records: Dict[int, Any]) -> None:
+        """Points the proxies for any of the given records at them"""
+
+        for unique_id in list(self.proxies):
+            if unique_id in records:
+                self.proxies.pop(unique_id).bind(records[unique_id])
+
+    def load(self) -> None:
+        """Loads the records for every proxy in the batch"""
+
+        records = self.model.get_many(self.cursor, *self.proxies, loading=self.loading)
+
+        for unique_id, proxy in self.proxies.items():
+            proxy.bind(records.get(unique_id))
+
+        self.proxies = {}
+
+
+class LazyRecord:
+    """
+    Proxy for a foreign object which has not been loaded yet.
+
+    The ID of the record can be read without loading it; any other use
+    loads the record (along with the rest of its batch), and is passed on
+    to it. Proxies report the class of the record they stand in for, so
+    `isinstance` checks, `search` filters and `store` all accept them.
+    """
+
+    __slots__ = ("_orm_batch", "_orm_id", "_orm_target", "_orm_loaded")
+
+    _orm_batch: LazyBatch
+    _orm_id: int
+    _orm_target: Any
+    _orm_loaded: bool
+
+    def __init__(self, batch: LazyBatch, unique_id: int) -> None:
+        object.__setattr__(self, "_orm_batch", batch)
+        object.__setattr__(self, "_orm_id", unique_id)
+        object.__setattr__(self, "_orm_target", None)
+        object.__setattr__(self, "_orm_loaded", False)
+
+    def bind(self, record: Any) -> None:
+        """Sets the record this proxy stands in for"""
+
+        object.__setattr__(self, "_orm_target", record)
+        object.__setattr__(self, "_orm_loaded", True)
+
+    def resolve(self) -> Any:
+        """Returns the record this proxy stands in for, loading it if needed"""
+
+        if not self._orm_loaded:
+            self._orm_batch.load()
+
+        if self._orm_target is None:
+            model = self._orm_batch.model
+            raise LookupError(f"{model.table} with ID {self._orm_id} does not exist")
+
+        return self._orm_target
+
+    @property  # type: ignore
+    def __class__(self) -> type:
+        return self._orm_batch.model.record
+
+    def __getattr__(self, name: str) -> Any:
+        if name == self._orm_batch.model.id_field:
+            return self._orm_id
+
+        return getattr(self.resolve(), name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        setattr(self.resolve(), name, value)
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, LazyRecord):
+            other = other.resolve()
+
+        return bool(self.resolve() == other)
+
+    def __hash__(self) -> int:
+        return hash(self.resolve())
+
+    def __repr__(self) -> str:
+        if self._orm_loaded:
+            return repr(self._orm_target)
+
+        return f"<{self._orm_batch.model.table} {self._orm_id} (not loaded)>"
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+# vim: fileencoding=utf-8 expandtab ts=4 nospell
+
+# SPDX-FileCopyrightText: 2020-2021 Benedict Harcourt <ben.harcourt@harcourtprogramming.co.uk>
+#
+# SPDX-License-Identifier: BSD-2-Clause
+
+"""
+Options controlling how a TableModel loads records and their foreign objects.
+"""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Iterable, Optional, Union
+
+import dataclasses
+
+if TYPE_CHECKING:
+    from orm.identity import IdentityMap
+
+
+# Strategies for loading foreign objects (see TableModel.strategy).
+SELECT_LOADING = "select"
+JOIN_LOADING = "join"
+LAZY_LOADING = "lazy"
+
+
+@dataclasses.dataclass(frozen=True)
+class Loading:
+    """
+    How a call to a TableModel loads its records.
+
+    If an IdentityMap is given, records (including foreign objects) are
+    taken from it where possible, and added to it once loaded.
+
+    The strategy for loading foreign objects defaults to that of the
+    model; see `TableModel.strategy`. Whether records are compact
+    defaults to whether the table is; see `orm.compact`.
+
+    `only` and `defer` choose the fields which are not loaded until they
+    are first read (see `TableModel.deferred`); `defer=False` loads every
+    field of the records and their foreign objects.
+    """
+
+    identity: Optional[IdentityMap] = None
+    strategy: Optional[str] = None
+    compact: Optional[bool] = None
+    only: Optional[Iterable[str]] = None
+    defer: Union[Iterable[str], bool, None] = None
@@ -0,0 +1,699 @@
+#!/usr/bin/env python3
+# vim: fileencoding=utf-8 expandtab ts=4 nospell
+
+# SPDX-FileCopyrightText: 2020-2021 Benedict Harcourt <ben.harcourt@harcourtprogramming.co.uk>
+#
+# SPDX-License-Identifier: BSD-2-Clause
+
+"""
+The generated model for a Table, which creates, loads and searches its records.
+"""
+
+from __future__ import annotations
+
+from typing import (
+    Any,
+    Collection,
+    Dict,
+    FrozenSet,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    Type,
+)
+
+import dataclasses
+import sqlite3
+import zlib
+
+from orm import hooks
+from orm.abc import bind_set, in_list, positional, FilterTypes, ModelledTable
+from orm.aggregate import AggregateMixin
+from orm.blob import BlobMixin
+from orm.loading import JOIN_LOADING, LAZY_LOADING, SELECT_LOADING, Loading
+from orm.pagination import Page, in_order, page_ids
+from orm.resolver import Resolver
+from orm.store import StoreMixin
+
+
+# Number of rows read at a time by the streaming iter_* functions.
+STREAM_WINDOW = 1000
+
+_UNIQUES = "__orm_uniques__"
+_INDEXES = "__orm_indexes__"
+_COMPACT = "__orm_compact__"
+_DEFERRED = "__orm_deferred__"
+
+
+class TableModel(
+    StoreMixin[ModelledTable], BlobMixin[ModelledTable], AggregateMixin[ModelledTable]
+):
+    """The generated model for a given Table."""
+
+    created: bool
+
+    # Columns which sub-table lookups filter on, when this is a sub-table.
+    connectors: List[Tuple[str, ...]]
+
+    # How foreign objects are loaded, when not specified in a call:
+    #  - SELECT_LOADING runs one extra SELECT per foreign table
+    #  - JOIN_LOADING LEFT JOINs the foreign tables into the main query
+    #    (objects referenced by the foreign objects are then SELECTed)
+    #  - LAZY_LOADING uses proxies, loaded on first use (see orm.lazy)
+    strategy: str
+
+    def __init__(self, record: Type[ModelledTable], table: str, id_field: str):
+        super().__init__(record, table, id_field)
+
+        self.created = False
+        self.connectors = []
+        self.strategy = SELECT_LOADING
+
+    def create_table(self, cursor: sqlite3.Cursor, auto_index: bool = True) -> None:
+        """Creates the table(s) and their indexes in SQLite"""
+
+        if self.created:
+            return
+
+        # Preset this to true to work with Foreign key loops.
+        self.created = True
+
+        for _, model in self.foreigners.values():
+            model.create_table(cursor, auto_index)
+
+        for compiled_sql in [self._create_table_sql(), *self._create_index_sql(auto_index)]:
+            self.execute(cursor, "create_table", compiled_sql)
+
+        for smodel in self.submodels.values():
+            smodel.model.create_table(cursor, auto_index)
+
+    def _create_table_sql(self) -> str:
+        """CREATE TABLE Statement for this table"""
+
+        sql: List[str] = [f"CREATE TABLE IF NOT EXISTS `{self.table}` ("]
+
+        for _field, _type in self.table_fields.items():
+            sql.append(f"[{_field}] {_type}, ")
+
+        for _fields in getattr(self.record, _UNIQUES, []):
+            sql.append(f"UNIQUE ([{'], ['.join(_fields)}]), ")
+
+        for _column, _model in self.foreigners.values():
+            sql.append(
+                f"FOREIGN KEY ([{_column}]) REFERENCES [{_model.table}] ([{_model.id_field}]), "
+            )
+
+        return "\n".join(sql).strip(", ") + "\n);"
+
+    def _indexes(self, auto_index: bool) -> List[Tuple[Tuple[str, ...], Optional[str]]]:
+        """The indexes of this table, as columns and an optional WHERE clause.
+
+        Automatic indexes are skipped when an existing (full) index or unique
+        key starts with the same columns."""
+
+        indexes = [
+            (tuple(map(self._index_column, fields)), where)
+            for fields, where in getattr(self.record, _INDEXES, [])
+        ]
+
+        if not auto_index:
+            return indexes
+
+        covered = [columns for columns, where in indexes if not where]
+        covered += getattr(self.record, _UNIQUES, [])
+
+        wanted = [*self.connectors, *((column,) for column, _ in self.foreigners.values())]
+
+        for columns in wanted:
+            if not any(existing[: len(columns)] == columns for existing in covered):
+                indexes.append((columns, None))
+                covered.append(columns)
+
+        return indexes
+
+    def _index_column(self, field: str) -> str:
+        """The column for a field used in an index"""
+
+        if field in self.foreigners:
+            return self.foreigners[field][0]
+
+        if field not in self.table_fields:
+            raise Exception(f"{self.record.__name__} does not have field {field} for index")
+
+        return field
+
+    def _create_index_sql(self, auto_index: bool) -> List[str]:
+        """CREATE INDEX statements for this table"""
+
+        sql = []
+
+        for columns, where in self._indexes(auto_index):
+            name = "__".join([self.table, *columns])
+
+            if where:
+                name += f"__{zlib.crc32(where.encode()):08x}"
+
+            statement = (
+                f"CREATE INDEX IF NOT EXISTS [{name}] "
+                f"ON [{self.table}] ([{'], ['.join(columns)}])"
+            )
+
+            sql.append(f"{statement} WHERE {where}" if where else statement)
+
+        return sql
+
+    def _select_sql(self, condition: str = "", deferred: FrozenSet[str] = frozenset()) -> str:
+        """SELECT statement for all columns of this table.
+
+        Deferred columns are selected as NULL, so that the positions of the
+        other columns do not change."""
+
+        columns = ", ".join(_deferrable("", column, deferred) for column in self.columns)
+        sql = f"SELECT {columns} FROM [{self.table}]"
+
+        return f"{sql} WHERE {condition}" if condition else sql
+
+    def all(
+        self,
+        cursor: sqlite3.Cursor,
+        *,
+        loading: Loading = Loading(),
+        page: Optional[Page] = None,
+    ) -> List[ModelledTable]:
+        """
+        Returns all records on the current table.
+
+        Note: records will be loaded into memory before being returned,
+        in order to optimise the number of queries to realted tables.
+
+        With a `page`, one page of the records is returned in order;
+        see `orm.pagination.page_ids`.
+        """
+
+        if page is not None:
+            ids = page_ids(self, cursor, "all", page)
+        else:
+            sql = self.statement(
+                "all", lambda: f"SELECT [{self.id_field}] FROM [{self.table}]"
+            )
+            ids = [x[0] for x in self.fetch(cursor, "all", sql)]
+
+        return in_order(self.get_many(cursor, *ids, loading=loading), ids)
+
+    def get(
+        self,
+        cursor: sqlite3.Cursor,
+        unique_id: int,
+        *,
+        loading: Loading = Loading(),
+    ) -> Optional[ModelledTable]:
+        """Gets a record by ID, or None if no record with that ID exists"""
+
+        return self.get_many(cursor, unique_id, loading=loading).get(unique_id, None)
+
+    def get_many(
+        self, cursor: sqlite3.Cursor, *ids: int, loading: Loading = Loading()
+    ) -> Dict[int, ModelledTable]:
+        """
+        Gets all records that exist with ID in the supplied list.
+
+        Entries in the dict are not generated for records which do not exist.
+
+        Records already in the identity map (if one is given) are not read
+        from the database again.
+
+        The loading strategy (see `TableModel.strategy`) controls how the
+        foreign objects of the records are loaded, and `loading.compact`
+        whether they (and the records) are compact records (see `orm.compact`).
+
+        `loading.only` and `loading.defer` choose the fields which are not
+        loaded until they are first read (see `deferred`).
+        """
+
+        if loading.identity is not None:
+            found: Dict[int, ModelledTable] = loading.identity.get_many(self, ids)
+
+            if found:
+                missing = tuple(x for x in ids if x not in found)
+                found.update(self.get_many(cursor, *missing, loading=loading))
+
+                return found
+
+        deferred = self.deferred(loading)
+
+        if not self._joins(loading):
+            rows = self.select_rows(cursor, ids, deferred)
+
+            return self._hydrate(cursor, rows, loading, deferred)
+
+        if not ids:
+            return {}
+
+        arity, params = bind_set(list(ids))
+        deferring = loading.defer is not False
+        sql = self.statement(
+            ("get_many_joined", arity, deferred, deferring),
+            lambda: self._joined_sql(
+                f"t.[{self.id_field}] IN ({in_list(arity, positional)})", deferred, deferring
+            ),
+        )
+
+        rows = self.fetch(cursor, "get_many", sql, params)
+
+        return self._hydrate_joined(cursor, rows, loading, deferred)
+
+    def _strategy(self, loading: Loading) -> str:
+        """The loading strategy to use for a call"""
+
+        strategy = loading.strategy or self.strategy
+
+        if strategy not in (SELECT_LOADING, JOIN_LOADING, LAZY_LOADING):
+            raise ValueError(f"Unknown loading strategy {strategy}")
+
+        return strategy
+
+    def _compact(self, loading: Loading) -> bool:
+        """Whether a call loads compact records, defaulting to the table's setting"""
+
+        if loading.compact is None:
+            return bool(getattr(self.record, _COMPACT, False))
+
+        return loading.compact
+
+    def deferred(self, loading: Loading = Loading()) -> FrozenSet[str]:
+        """
+        The fields a call defers (see `orm.defer`).
+
+        By default, these are the fields the table marks as deferred. With
+        `loading.only`, every other field is deferred; `loading.defer` adds
+        more fields, or if False, stops the table's fields being deferred.
+        The ID and the foreign keys are always loaded.
+        """
+
+        only, defer = loading.only, loading.defer
+
+        if only is None and defer is None:
+            return self.compiled(
+                "deferred", lambda: self._check_deferred(getattr(self.record, _DEFERRED, ()))
+            )
+
+        if only is not None:
+            kept = {*only, self.id_field}
+            self._check_deferred(kept - {self.id_field, *self.foreigners, *self.submodels})
+            fields = {field for field in self.scalars if field not in kept}
+        else:
+            fields = set(getattr(self.record, _DEFERRED, ())) if defer is not False else set()
+
+        if not isinstance(defer, bool) and defer is not None:
+            fields.update(defer)
+
+        return self._check_deferred(fields)
+
+    def _check_deferred(self, fields: Collection[str]) -> FrozenSet[str]:
+        """Checks that fields can be deferred"""
+
+        invalid = [x for x in fields if x == self.id_field or x not in self.scalars]
+
+        if invalid:
+            raise ValueError(
+                f"{self.record.__name__} can not defer {', '.join(sorted(invalid))}"
+            )
+
+        return frozenset(fields)
+
+    def _resolver(self, cursor: sqlite3.Cursor, loading: Loading) -> Resolver:
+        """A Resolver for a call, with the loading options of the call resolved.
+
+        The options of this model are also used for the foreign objects,
+        apart from the fields to defer: foreign objects defer the fields
+        their table marks as deferred, unless `loading.defer` is False."""
+
+        return Resolver(
+            cursor,
+            dataclasses.replace(
+                loading,
+                strategy=self._strategy(loading),
+                compact=self._compact(loading),
+                only=None,
+                defer=False if loading.defer is False else None,
+            ),
+        )
+
+    def eager_loading(self, loading: Loading, source: str) -> Loading:
+        """
+        The loading options for a call where the cursor is only borrowed
+        for the duration of the call. Loading can not be lazy, and every
+        field is loaded, as the records outlive the cursor.
+        """
+
+        if self._strategy(loading) == LAZY_LOADING:
+            raise ValueError(f"Lazy loading can not be used with {source}")
+
+        return dataclasses.replace(loading, only=None, defer=False)
+
+    def _joins(self, loading: Loading) -> bool:
+        """Whether foreign objects should be loaded with a JOIN"""
+
+        return self._strategy(loading) == JOIN_LOADING and bool(self.foreigners)
+
+    def _joined_sql(
+        self, condition: str, deferred: FrozenSet[str] = frozenset(), deferring: bool = True
+    ) -> str:
+        """SELECT statement for this table, LEFT JOINed to each foreign table.
+
+        As with `_select_sql`, deferred columns are selected as NULL; the
+        foreign tables' own deferred fields are used if `deferring`."""
+
+        columns = [_deferrable("t.", column, deferred) for column in self.columns]
+        joins = []
+
+        for i, (column, model) in enumerate(self.foreigners.values()):
+            skipped = model.deferred() if deferring else frozenset()
+            columns.extend(_deferrable(f"f{i}.", field, skipped) for field in model.columns)
+            joins.append(
+                f"LEFT JOIN [{model.table}] AS f{i} ON f{i}.[{model.id_field}] = t.[{column}]"
+            )
+
+        return (
+            f"SELECT {', '.join(columns)} FROM [{self.table}] AS t "
+            f"{' '.join(joins)} WHERE {condition}"
+        )
+
+    def select_rows(
+        self,
+        cursor: sqlite3.Cursor,
+        ids: Collection[int],
+        deferred: FrozenSet[str] = frozenset(),
+    ) -> List[Any]:
+        """Selects the rows with the given IDs, without the deferred columns"""
+
+        if not ids:
+            return []
+
+        arity, params = bind_set(list(ids))
+        key = ("get_many", arity, deferred) if deferred else ("get_many", arity)
+        sql = self.statement(
+            key,
+            lambda: self._select_sql(
+                f"[{self.id_field}] IN ({in_list(arity, positional)})", deferred
+            ),
+        )
+
+        return self.fetch(cursor, "get_many", sql, params)
+
+    def select_columns(
+        self, cursor: sqlite3.Cursor, fields: Sequence[str], ids: Collection[int]
+    ) -> List[Any]:
+        """Selects the ID and the given columns of the rows with the given IDs"""
+
+        if not ids:
+            return []
+
+        arity, params = bind_set(list(ids))
+        sql = self.statement(
+            ("load_deferred", arity, tuple(fields)),
+            lambda: (
+                f"SELECT [{'], ['.join([self.id_field, *fields])}] FROM [{self.table}]"
+                f" WHERE [{self.id_field}] IN ({in_list(arity, positional)})"
+            ),
+        )
+
+        return self.fetch(cursor, "load_deferred", sql, params)
+
+    def _hydrate(
+        self,
+        cursor: sqlite3.Cursor,
+        rows: List[Any],
+        loading: Loading,
+        deferred: FrozenSet[str],
+    ) -> Dict[int, ModelledTable]:
+        """Converts selected rows into records, including foreign objects.
+
+        `deferred` are the fields not selected for these rows."""
+
+        if not rows:
+            return {}
+
+        resolver = self._resolver(cursor, loading)
+        output: Dict[int, ModelledTable] = resolver.add_rows(self, rows, deferred)
+        resolver.resolve()
+
+        return output
+
+    def _hydrate_joined(
+        self,
+        cursor: sqlite3.Cursor,
+        rows: List[Any],
+        loading: Loading,
+        deferred: FrozenSet[str],
+    ) -> Dict[int, ModelledTable]:
+        """Converts the rows from a _joined_sql() statement into records.
+
+        Each row is split into the record of this table and the foreign
+        records; the foreign records are de-duplicated by ID. The records
+        of this table are added first, so that (as with the other
+        strategies) a foreign object which is also one of them is the same
+        record, with the fields of the call deferred."""
+
+        if not rows:
+            return {}
+
+        resolver = self._resolver(cursor, loading)
+        output: Dict[int, ModelledTable] = resolver.add_rows(
+            self, [row[: len(self.columns)] for row in rows], deferred
+        )
+        offset = len(self.columns)
+
+        for _, model in self.foreigners.values():
+            end = offset + len(model.columns)
+            position = offset + model.id_position
+            children = {row[position]: row[offset:end] for row in rows}
+            children.pop(None, None)
+            offset = end
+
+            resolver.add_rows(model, list(children.values()))
+
+        resolver.resolve()
+
+        return output
+
+    def search(
+        self,
+        cursor: sqlite3.Cursor,
+        *,
+        loading: Loading = Loading(),
+        page: Optional[Page] = None,
+        **kwargs: FilterTypes,
+    ) -> List[ModelledTable]:
+        """
+        Gets records for this model which match the given filters.
+
+        You can filter using any field in the table, or by a foreign object.
+
+            class Foo(Table["Foo"]):
+                foo_id: int
+
+            class Bar(Table["Bar"]
+                bar_id: int
+                foo: Foo
+                name: str
+
+            # Search by standard field
+            Bar.model(cursor).search(name="Hello")
+
+            # Search by foreign ID
+            Bar.model(cursor).search(foo_id=1)
+
+            # Search by foreign object
+            Bar.model(cursor).search(foo=Foo(1))
+
+            # Search by local ID
+            # NOTE: This is valid, but using Model.get() is faster.
+            Bar.model(cursor).search(bar_id=123)
+
+            # The first page of 50 by name, and then the next page
+            page = orm.Page("-name", 50)
+            first = Bar.model(cursor).search(foo=foo, page=page)
+            Bar.model(cursor).search(foo=foo, page=page.following(first[-1]))
+
+        With a `page`, the ordering and paging are done in SQL; see `orm.pagination.page_ids`.
+        """
+
+        where, params = self.where(self.foreigners, kwargs)
+
+        if page is not None or not self._joins(loading):
+            ids = self._search_ids(cursor, "search", (where, params), page)
+
+            return in_order(self.get_many(cursor, *ids, loading=loading), ids)
+
+        deferred = self.deferred(loading)
+        deferring = loading.defer is not False
+        ids_sql = self.filtered_sql(f"[{self.id_field}]", where)
+        sql = self.statement(
+            ("search_joined", where, deferred, deferring),
+            lambda: self._joined_sql(
+                f"t.[{self.id_field}] IN ({ids_sql})", deferred, deferring
+            ),
+        )
+
+        rows = self.fetch(cursor, "search", sql, params)
+
+        return list(self._hydrate_joined(cursor, rows, loading, deferred).values())
+
+    def search_ids(
+        self, cursor: sqlite3.Cursor, *, page: Optional[Page] = None, **kwargs: FilterTypes
+    ) -> List[int]:
+        """
+        Gets the IDs of the records which match the given filters.
+
+        The filters, ordering and paging are the same as for `search`, but
+        only the IDs are selected; no records are loaded.
+        """
+
+        return self._search_ids(
+            cursor, "search_ids", self.where(self.foreigners, kwargs), page
+        )
+
+    def _search_ids(
+        self,
+        cursor: sqlite3.Cursor,
+        method: str,
+        where: Tuple[str, Mapping[str, Any]],
+        page: Optional[Page],
+    ) -> List[int]:
+        """The IDs of the rows matching a WHERE clause, in the order of the page if one is given"""
+
+        if page is not None:
+            return page_ids(self, cursor, method, page, where)
+
+        condition, params = where
+        sql = self.statement(
+            ("search", condition), lambda: self.filtered_sql(f"[{self.id_field}]", condition)
+        )
+
+        return [x[0] for x in self.fetch(cursor, method, sql, params)]
+
+    def iter_all(
+        self,
+        cursor: sqlite3.Cursor,
+        window: int = STREAM_WINDOW,
+        *,
+        loading: Loading = Loading(),
+    ) -> Iterator[ModelledTable]:
+        """
+        Yields all records on the current table.
+
+        Rows are read `window` at a time, and the foreign objects and sub
+        tables for each window are loaded together, so memory use is bound
+        by the window size rather than the size of the table.
+        """
+
+        sql = self.statement("iter_all", self._select_sql)
+
+        return self._stream(
+            cursor, hooks.Statement(self.label, "iter_all", sql), window, loading
+        )
+
+    def iter_search(
+        self,
+        cursor: sqlite3.Cursor,
+        window: int = STREAM_WINDOW,
+        *,
+        loading: Loading = Loading(),
+        **kwargs: FilterTypes,
+    ) -> Iterator[ModelledTable]:
+        """
+        Yields records for this model which match the given filters.
+
+        The filters are the same as for `search`; rows are read in windows
+        in the same way as `iter_all`.
+        """
+
+        where, params = self.where(self.foreigners, kwargs)
+        sql = self.statement(("iter_search", where), lambda: self._select_sql(where))
+
+        statement = hooks.Statement(self.label, "iter_search", sql, params)
+
+        return self._stream(cursor, statement, window, loading)
+
+    def iter_range(
+        self,
+        cursor: sqlite3.Cursor,
+        span: Tuple[int, int],
+        window: int = STREAM_WINDOW,
+        *,
+        loading: Loading = Loading(),
+    ) -> Iterator[ModelledTable]:
+        """
+        Yields the records with IDs from `low` up to (but not including) `high`,
+        where `span` is `(low, high)`.
+
+        The ID field is the table's rowid, so this reads one contiguous part
+        of the table; rows are read in windows in the same way as `iter_all`.
+        """
+
+        sql = self.statement(
+            "iter_range",
+            lambda: self._select_sql(
+                f"[{self.id_field}] >= :low AND [{self.id_field}] < :high"
+            ),
+        )
+        params = {"low": span[0], "high": span[1]}
+        statement = hooks.Statement(self.label, "iter_range", sql, params)
+
+        return self._stream(cursor, statement, window, loading)
+
+    def id_range(self, cursor: sqlite3.Cursor) -> Optional[Tuple[int, int]]:
+        """The lowest and highest ID in the table, or None if it is empty"""
+
+        sql = self.statement(
+            "id_range",
+            lambda: f"SELECT MIN([{self.id_field}]), MAX([{self.id_field}]) FROM [{self.table}]",
+        )
+
+        low, high = self.execute(cursor, "id_range", sql).fetchone()
+
+        return None if low is None else (low, high)
+
+    def _stream(
+        self,
+        cursor: sqlite3.Cursor,
+        statement: hooks.Statement,
+        window: int,
+        loading: Loading,
+    ) -> Iterator[ModelledTable]:
+        """Runs a select, reading the results in windows and hydrating each in turn.
+
+        The select is run on a separate cursor of the same connection, which
+        leaves the supplied cursor free for loading the foreign objects of
+        each window of rows as they are read."""
+
+        reader = self.execute(
+            cursor.connection.cursor(), statement.method, statement.sql, statement.params
+        )
+
+        # Rows are selected with every column, so nothing is deferred.
+        loading = dataclasses.replace(loading, only=None, defer=False)
+
+        try:
+            while True:
+                rows = reader.fetchmany(window)
+
+                if not rows:
+                    return
+
+                if hooks.INSTALLED:
+                    hooks.rows_fetched(self.label, statement.method, len(rows))
+
+                yield from self._hydrate(cursor, rows, loading, frozenset()).values()
+        finally:
+            reader.close()
+
+
+def _deferrable(alias: str, column: str, deferred: FrozenSet[str]) -> str:
+    """A column of a SELECT, or NULL in its place if it is deferred"""
+
+    return "NULL" if column in deferred else f"{alias}[{column}]"
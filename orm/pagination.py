@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+# vim: fileencoding=utf-8 expandtab ts=4 nospell
+
+# SPDX-FileCopyrightText: 2020-2021 Benedict Harcourt <ben.harcourt@harcourtprogramming.co.uk>
+#
+# SPDX-License-Identifier: BSD-2-Clause
+
+"""
+Ordering and keyset pagination of search results.
+
+A page is the records after the last one of the previous page, in the
+order of the search, so that each page is found with a range of an index
+rather than by skipping over all the rows before it.
+"""
+
+from __future__ import annotations
+
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+    Union,
+)
+
+import dataclasses
+import sqlite3
+
+from orm.abc import TableBase
+
+
+# Fields to order by, each prefixed with "-" to sort in descending order.
+OrderBy = Union[str, Sequence[str], None]
+
+# The columns of an ordering, and whether each is descending.
+Ordering = Tuple[Tuple[str, bool], ...]
+
+Record = TypeVar("Record")
+
+
+@dataclasses.dataclass(frozen=True)
+class Page:
+    """
+    The order, and which part, of the results of a search to return.
+
+    `order_by` is a field name or list of field names (foreign objects
+    order by their ID); prefix a name with "-" to sort it in descending
+    order. `limit` is the largest number of records to return.
+
+    `after` is a record, usually the last of the previous page; only the
+    records which come after it in the order are returned.
+
+        page = orm.Page("-score", 50)
+        first = Post.model(cursor).search(user=user, page=page)
+        second = Post.model(cursor).search(user=user, page=page.following(first[-1]))
+    """
+
+    order_by: OrderBy = None
+    limit: Optional[int] = None
+    after: Any = None
+
+    def following(self, record: Any) -> Page:
+        """The page of the records after the given one, in the same order"""
+
+        return dataclasses.replace(self, after=record)
+
+
+def ordering(model: TableBase[Any], order_by: OrderBy) -> Ordering:
+    """
+    The columns of a model to order by, and whether each is descending.
+
+    Fields are named as for `search` (foreign objects by their field),
+    with a "-" prefix for descending order. The ID is always added as the
+    last column (unless given), so that the order is total and the records
+    have a definite place to page after.
+    """
+
+    columns = []
+
+    for name in [order_by] if isinstance(order_by, str) else order_by or []:
+        column = model.column(name[1:] if name.startswith("-") else name)
+        columns.append((column, name.startswith("-")))
+
+    # The ID follows the direction of the first column, so that the
+    # keyset is a row-value comparison when there is only one column.
+    if all(column != model.id_field for column, _ in columns):
+        columns.append((model.id_field, columns[0][1] if columns else False))
+
+    return tuple(columns)
+
+
+def page_ids(
+    model: TableBase[Any],
+    cursor: sqlite3.Cursor,
+    method: str,
+    page: Page,
+    where: Tuple[str, Mapping[str, Any]] = ("", {}),
+) -> List[int]:
+    """
+    Selects the IDs of (up to `page.limit`) rows of a model which match an
+    SQL condition and its parameters, in the order of the page (see
+    `ordering`).
+
+    With `page.after`, only rows which come after that record in the order
+    are selected. This keyset pagination uses the index of the ordering
+    columns, where there is one, rather than reading and skipping the
+    earlier rows as OFFSET does. The ordering columns must not be nullable
+    to use `after`.
+    """
+
+    condition, params = where
+    order = ordering(model, page.order_by)
+    after, limit = page.after is not None, page.limit is not None
+    params = dict(params)
+
+    if after:
+        params.update(_after_params(model, order, page.after))
+
+    if limit:
+        params["__limit"] = page.limit
+
+    sql = model.statement(
+        ("page", condition, order, after, limit),
+        lambda: _page_sql(model, condition, order, after, limit),
+    )
+
+    return [x[0] for x in model.fetch(cursor, method, sql, params)]
+
+
+def _after_params(model: TableBase[Any], order: Ordering, after: Any) -> Dict[str, Any]:
+    """The values of the ordering columns for a record, to select the rows after it"""
+
+    if not isinstance(after, model.record):
+        raise Exception("Wrong type")
+
+    fields = {column: field for field, (column, _) in model.foreigners.items()}
+    params: Dict[str, Any] = {}
+
+    for i, (column, _) in enumerate(order):
+        if "NOT NULL" not in model.table_fields[column]:
+            raise ValueError(
+                f"Can not page after nullable field {fields.get(column, column)}"
+            )
+
+        value = getattr(after, fields.get(column, column))
+
+        if column in fields:
+            value = getattr(value, model.foreigners[fields[column]][1].id_field)
+
+        params[f"__after{i}"] = value
+
+    return params
+
+
+def _page_sql(
+    model: TableBase[Any], condition: str, order: Ordering, after: bool, limit: bool
+) -> str:
+    """SELECT statement for one page of IDs; see `page_ids`"""
+
+    clauses = [f"({condition})"] if condition else []
+
+    if after:
+        clauses.append(keyset(order))
+
+    sql = f"SELECT [{model.id_field}] FROM [{model.table}]"
+    sql += f" WHERE {' AND '.join(clauses)}" if clauses else ""
+    sql += " ORDER BY " + ", ".join(
+        f"[{column}] DESC" if descending else f"[{column}]" for column, descending in order
+    )
+
+    return sql + " LIMIT :__limit" if limit else sql
+
+
+def keyset(order: Ordering) -> str:
+    """
+    Condition for the rows after the one with the `:__after{i}` values, in an order.
+
+    When every column is sorted the same way, this is a single row-value
+    comparison, which SQLite can answer with a range of an index.
+    """
+
+    if len({descending for _, descending in order}) == 1:
+        operator = "<" if order[0][1] else ">"
+        columns = ", ".join(f"[{column}]" for column, _ in order)
+        values = ", ".join(f":__after{i}" for i in range(len(order)))
+
+        return f"({columns}) {operator} ({values})"
+
+    clause = ""
+
+    for i, (column, descending) in reversed(list(enumerate(order))):
+        beyond = f"[{column}] {'<' if descending else '>'} :__after{i}"
+        clause = (
+            f"({beyond} OR ([{column}] = :__after{i} AND {clause}))" if clause else beyond
+        )
+
+    return clause
+
+
+def in_order(records: Mapping[int, Record], ids: Iterable[int]) -> List[Record]:
+    """The records with the given IDs, in the order of the IDs"""
+
+    return [records[unique_id] for unique_id in ids if unique_id in records]
+
+
+def pages(
+    fetch: Callable[..., List[Record]], page: Page, **kwargs: Any
+) -> Iterator[List[Record]]:
+    """
+    Yields the pages of results of a paged function, such as `search`.
+
+    `fetch` is called with `page=` the given page, and then each following
+    page (after the last record of the one before), along with `kwargs`,
+    until a page is not full.
+
+        for posts in orm.pages(Post.model(cursor).search, orm.Page("-score", 50), user=user):
+            ...
+    """
+
+    while True:
+        records = fetch(page=page, **kwargs)
+
+        if records:
+            yield records
+
+        if page.limit is None or len(records) < page.limit:
+            return
+
+        page = page.following(records[-1])
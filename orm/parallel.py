@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# vim: fileencoding=utf-8 expandtab ts=4 nospell
+
+# SPDX-FileCopyrightText: 2020-2021 Benedict Harcourt <ben.harcourt@harcourtprogramming.co.uk>
+#
+# SPDX-License-Identifier: BSD-2-Clause
+
+"""
+Process parallel scans of whole tables.
+
+Converting rows into records is CPU bound, so reading a large table uses
+only one core. A parallel scan splits the table into ranges of IDs (which
+are the table's rowids), and reads each range in a worker process with a
+read-only connection of its own.
+
+The table classes, and any reduce function, must be importable by name
+so that they can be sent to the worker processes.
+"""
+
+from __future__ import annotations
+
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Type,
+    TypeVar,
+)
+
+import collections
+import concurrent.futures
+import os
+import pathlib
+import sqlite3
+
+from .abc import ModelledTable
+from .model import STREAM_WINDOW
+from .table import _get_model
+
+
+Result = TypeVar("Result")
+Range = Tuple[int, int]
+
+# Read-only connections held by this (worker) process, by database.
+_CONNECTIONS: Dict[str, sqlite3.Connection] = {}
+
+
+def _connect(database: str) -> sqlite3.Connection:
+    """Opens a read-only connection to a database"""
+
+    uri = pathlib.Path(database).absolute().as_uri() + "?mode=ro"
+
+    return sqlite3.connect(uri, uri=True)
+
+
+def _cursor(database: str) -> sqlite3.Cursor:
+    """Gets a cursor on this (worker) process' connection to a database"""
+
+    if database not in _CONNECTIONS:
+        _CONNECTIONS[database] = _connect(database)
+
+    return _CONNECTIONS[database].cursor()
+
+
+def _read(
+    table: Type[ModelledTable], database: str, span: Range, window: int
+) -> List[ModelledTable]:
+    """Worker: reads all records in one range of a table"""
+
+    return list(_get_model(table).iter_range(_cursor(database), span, window))
+
+
+def _reduce(
+    table: Type[ModelledTable],
+    database: str,
+    span: Range,
+    window: int,
+    function: Callable[[Iterator[ModelledTable]], Result],
+) -> Result:
+    """Worker: passes the records in one range of a table to a function"""
+
+    return function(_get_model(table).iter_range(_cursor(database), span, window))
+
+
+def partition(table: Type[Any], database: str, partitions: int) -> List[Range]:
+    """
+    Splits a table into (up to) the given number of ranges of IDs.
+
+    The ranges are of equal width, so are evenly sized if the IDs are
+    mostly contiguous (as they are for tables which are rarely deleted from).
+    """
+
+    # The connection is not kept, so that forked workers do not inherit it.
+    connection = _connect(database)
+
+    try:
+        bounds = _get_model(table).id_range(connection.cursor())
+    finally:
+        connection.close()
+
+    if not bounds:
+        return []
+
+    low, high = bounds[0], bounds[1] + 1
+    step = -(-(high - low) // partitions)
+
+    return [(start, min(start + step, high)) for start in range(low, high, step)]
+
+
+class ParallelScan:
+    """
+    Reads a table from an SQLite database file with a pool of worker processes.
+
+        with ParallelScan("app.db", workers=8) as scan:
+            for user in scan.records(User):
+                ...
+
+            totals = scan.reduce(Order, sum_totals)
+
+    Tables are split into `partitions` ranges (by default, four per worker),
+    each of which is read in `window` sized pieces. The database should be
+    in WAL mode if it is written to during a scan.
+    """
+
+    database: str
+    workers: int
+    partitions: int
+    window: int
+
+    def __init__(
+        self,
+        database: str,
+        workers: Optional[int] = None,
+        partitions: Optional[int] = None,
+        window: int = STREAM_WINDOW,
+    ) -> None:
+        self.database = database
+        self.workers = workers or os.cpu_count() or 1
+        self.partitions = partitions or self.workers * 4
+        self.window = window
+
+        self._executor = concurrent.futures.ProcessPoolExecutor(self.workers)
+
+    def __enter__(self) -> ParallelScan:
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def records(self, table: Type[ModelledTable]) -> Iterator[ModelledTable]:
+        """
+        Yields every record in the table, in ID order.
+
+        At most two ranges per worker are read ahead of the caller, so the
+        memory used is bound by the partition size; use more partitions
+        for larger tables.
+        """
+
+        pending: Deque[concurrent.futures.Future[List[ModelledTable]]] = collections.deque()
+
+        for span in partition(table, self.database, self.partitions):
+            pending.append(
+                self._executor.submit(_read, table, self.database, span, self.window)
+            )
+
+            if len(pending) >= self.workers * 2:
+                yield from pending.popleft().result()
+
+        while pending:
+            yield from pending.popleft().result()
+
+    def reduce(
+        self,
+        table: Type[ModelledTable],
+        function: Callable[[Iterator[ModelledTable]], Result],
+    ) -> List[Result]:
+        """
+        Calls a function in the workers with an iterator over each range
+        of the table, returning the results in ID order.
+
+        Only the results are sent back from the workers, so this is much
+        faster than `records` when the function summarises its records.
+        """
+
+        futures = [
+            self._executor.submit(_reduce, table, self.database, span, self.window, function)
+            for span in partition(table, self.database, self.partitions)
+        ]
+
+        return [future.result() for future in futures]
+
+    def close(self) -> None:
+        """Stops the worker processes"""
+
+        self._executor.shutdown()
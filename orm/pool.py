@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+# vim: fileencoding=utf-8 expandtab ts=4 nospell
+
+# SPDX-FileCopyrightText: 2020-2021 Benedict Harcourt <ben.harcourt@harcourtprogramming.co.uk>
+#
+# SPDX-License-Identifier: BSD-2-Clause
+
+"""
+Thread safe pool of SQLite connections.
+
+Python's sqlite3 connections can not be shared between threads, so a
+ConnectionPool lends each thread a connection of its own for the duration
+of a call or unit of work, and takes it back afterwards.
+
+PooledModelWrapper binds a Table's model to a pool, in the same way that
+ModelWrapper binds it to a cursor.
+"""
+
+from __future__ import annotations
+
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    BinaryIO,
+    Callable,
+    Dict,
+    Generic,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+)
+
+import contextlib
+import functools
+import queue
+import sqlite3
+import threading
+
+from orm.abc import FilterTypes, ModelledTable
+from orm.blob import CHUNK_SIZE, Payload, Source
+from orm.loading import Loading
+from orm.model import STREAM_WINDOW
+from orm.pagination import Page
+
+if TYPE_CHECKING:
+    from orm.model import TableModel
+
+
+SetupHook = Callable[[sqlite3.Connection], None]
+
+
+def wal_mode(connection: sqlite3.Connection) -> None:
+    """Setup hook which puts the database into write-ahead logging mode"""
+
+    connection.execute("PRAGMA journal_mode = WAL")
+
+
+def open_connection(
+    database: str, setup: Sequence[SetupHook], kwargs: Dict[str, Any]
+) -> sqlite3.Connection:
+    """Opens a connection which can be used from any thread, and runs the setup hooks on it"""
+
+    connection: sqlite3.Connection = sqlite3.connect(
+        database, check_same_thread=False, **kwargs
+    )
+
+    for hook in setup:
+        hook(connection)
+
+    return connection
+
+
+class ConnectionPool:
+    """
+    Thread safe pool of up to `size` connections to one SQLite database.
+
+    Connections are opened when first needed, and each of the `setup` hooks
+    is called on them once. A thread borrows a connection with `cursor()`
+    or `unit_of_work()`; nested borrows in the same thread share the same
+    connection. If all connections are in use, a borrow waits up to `wait`
+    seconds (forever if None) before raising TimeoutError.
+
+        pool = ConnectionPool("app.db", size=8, setup=[wal_mode])
+
+        users = User.pooled(pool)
+        users.get(1)  # Borrows a connection for this call only
+
+        with pool.unit_of_work():
+            users.store(alice)  # Both calls use one connection,
+            users.store(bob)    # and are committed together
+
+    Any other arguments are passed on to `sqlite3.connect`.
+    Note that each connection to ":memory:" is a separate database.
+    """
+
+    size: int
+    wait: Optional[float]
+
+    def __init__(
+        self,
+        database: str,
+        size: int = 5,
+        setup: Sequence[SetupHook] = (),
+        wait: Optional[float] = None,
+        **kwargs: Any,
+    ) -> None:
+        if size < 1:
+            raise ValueError("A connection pool needs at least one connection")
+
+        self.size = size
+        self.wait = wait
+
+        self._connect = functools.partial(open_connection, database, setup, kwargs)
+        self._idle: queue.LifoQueue[sqlite3.Connection] = queue.LifoQueue()
+        self._opened: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+
+        # The cursor (if any) which each thread has borrowed, and how many
+        # borrows of it are currently nested.
+        self._local = threading.local()
+
+    def _acquire(self) -> sqlite3.Connection:
+        """Takes an idle connection, opening one if the pool is not yet full"""
+
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if len(self._opened) < self.size:
+                connection = self._connect()
+                self._opened.append(connection)
+                return connection
+
+        try:
+            return self._idle.get(timeout=self.wait)
+        except queue.Empty:
+            raise TimeoutError(f"No connection became free in {self.wait} seconds") from None
+
+    @contextlib.contextmanager
+    def cursor(self) -> Iterator[sqlite3.Cursor]:
+        """
+        Borrows a connection for the current thread, yielding a cursor on it.
+
+        When the outermost borrow in a thread ends, any open transaction is
+        committed (or rolled back if an exception was raised), and the
+        connection is returned to the pool.
+        """
+
+        local = self._local
+        cursor: sqlite3.Cursor = getattr(local, "cursor", None) or self._acquire().cursor()
+
+        local.cursor = cursor
+        local.depth = getattr(local, "depth", 0) + 1
+
+        try:
+            yield cursor
+        except BaseException:
+            if local.depth == 1:
+                cursor.connection.rollback()
+            raise
+        else:
+            if local.depth == 1:
+                cursor.connection.commit()
+        finally:
+            local.depth -= 1
+
+            if not local.depth:
+                local.cursor = None
+                self._idle.put(cursor.connection)
+
+    @contextlib.contextmanager
+    def unit_of_work(self) -> Iterator[sqlite3.Cursor]:
+        """
+        Borrows a connection for the current thread inside a transaction.
+
+        All pooled model calls made in the current thread within the block
+        use this connection, and their changes are committed together.
+        """
+
+        with self.cursor() as cursor:
+            if not cursor.connection.in_transaction:
+                cursor.execute("BEGIN")
+
+            yield cursor
+
+    def close(self) -> None:
+        """Closes all connections, waiting for any that are in use"""
+
+        with self._lock:
+            opened, self._opened = self._opened, []
+
+        for _ in opened:
+            self._idle.get().close()
+
+
+class PooledModelWrapper(Generic[ModelledTable]):
+    """
+    Binding class between a Table, it's Model, and a ConnectionPool.
+
+    Each call borrows a connection from the pool for the current thread,
+    unless the thread is already in a `pool.unit_of_work()`, in which case
+    that unit's connection is used. The pooled model for "Foo" is
+
+        Foo.pooled(pool)
+
+    Lazy loading and deferred fields are not available, as the proxies (and
+    records) would outlive the connection they were loaded with, so every
+    field is loaded. The streaming functions hold their connection until
+    the iterator is finished or closed.
+    For the same reason, `bytes` fields can be copied and stored, but not
+    opened as a BlobStream.
+    """
+
+    model: TableModel[ModelledTable]
+    pool: ConnectionPool
+    loading: Loading
+
+    def __init__(
+        self,
+        model: TableModel[ModelledTable],
+        pool: ConnectionPool,
+        loading: Loading = Loading(),
+    ):
+        self.model = model
+        self.pool = pool
+        self.loading = loading
+
+    def _loading(self) -> Loading:
+        """The loading options for a call, which can not be lazy or defer fields"""
+
+        return self.model.eager_loading(self.loading, "a connection pool")
+
+    def all(self, *, page: Optional[Page] = None) -> List[ModelledTable]:
+        """Returns all records on the current table; see ModelWrapper.all"""
+
+        with self.pool.cursor() as cursor:
+            return self.model.all(cursor, loading=self._loading(), page=page)
+
+    def get(self, unique_id: int) -> Optional[ModelledTable]:
+        """Gets a record by ID, or None if no record with that ID exists"""
+
+        with self.pool.cursor() as cursor:
+            return self.model.get(cursor, unique_id, loading=self._loading())
+
+    def get_many(self, *ids: int) -> Dict[int, ModelledTable]:
+        """Gets all records that exist with ID in the supplied list"""
+
+        with self.pool.cursor() as cursor:
+            return self.model.get_many(cursor, *ids, loading=self._loading())
+
+    def search(
+        self, *, page: Optional[Page] = None, **kwargs: FilterTypes
+    ) -> List[ModelledTable]:
+        """Gets records which match the given filters; see ModelWrapper.search"""
+
+        with self.pool.cursor() as cursor:
+            return self.model.search(cursor, loading=self._loading(), page=page, **kwargs)
+
+    def search_ids(self, *, page: Optional[Page] = None, **kwargs: FilterTypes) -> List[int]:
+        """Gets the IDs of the records which match the given filters"""
+
+        with self.pool.cursor() as cursor:
+            return self.model.search_ids(cursor, page=page, **kwargs)
+
+    def iter_all(self, window: int = STREAM_WINDOW) -> Iterator[ModelledTable]:
+        """Yields all records on the current table; see ModelWrapper.iter_all"""
+
+        loading = self._loading()
+
+        return self._stream(
+            lambda cursor: self.model.iter_all(cursor, window, loading=loading)
+        )
+
+    def iter_search(
+        self, window: int = STREAM_WINDOW, **kwargs: FilterTypes
+    ) -> Iterator[ModelledTable]:
+        """Yields records which match the given filters; see ModelWrapper.iter_search"""
+
+        loading = self._loading()
+
+        return self._stream(
+            lambda cursor: self.model.iter_search(cursor, window, loading=loading, **kwargs)
+        )
+
+    def _stream(
+        self, items: Callable[[sqlite3.Cursor], Iterator[ModelledTable]]
+    ) -> Iterator[ModelledTable]:
+        """Yields the items of an iterator, holding a pooled cursor until it is finished"""
+
+        with self.pool.cursor() as cursor:
+            yield from items(cursor)
+
+    def count(self, **kwargs: FilterTypes) -> int:
+        """The number of records which match the given filters; see TableModel.count"""
+
+        with self.pool.cursor() as cursor:
+            return self.model.count(cursor, **kwargs)
+
+    def exists(self, **kwargs: FilterTypes) -> bool:
+        """Whether any record matches the given filters"""
+
+        with self.pool.cursor() as cursor:
+            return self.model.exists(cursor, **kwargs)
+
+    def aggregate(self, function: str, field: str, **kwargs: FilterTypes) -> Any:
+        """Applies an SQL aggregate function to a field; see TableModel.aggregate"""
+
+        with self.pool.cursor() as cursor:
+            return self.model.aggregate(cursor, function, field, **kwargs)
+
+    def sum(self, field: str, **kwargs: FilterTypes) -> Any:
+        """The sum of a field over the matching records (0 if there are none)"""
+
+        with self.pool.cursor() as cursor:
+            return self.model.sum(cursor, field, **kwargs)
+
+    def min(self, field: str, **kwargs: FilterTypes) -> Any:
+        """The lowest value of a field in the matching records (or None)"""
+
+        with self.pool.cursor() as cursor:
+            return self.model.min(cursor, field, **kwargs)
+
+    def max(self, field: str, **kwargs: FilterTypes) -> Any:
+        """The highest value of a field in the matching records (or None)"""
+
+        with self.pool.cursor() as cursor:
+            return self.model.max(cursor, field, **kwargs)
+
+    def count_by(self, field: str, **kwargs: FilterTypes) -> Dict[Any, int]:
+        """The number of matching records for each value of a field"""
+
+        with self.pool.cursor() as cursor:
+            return self.model.count_by(cursor, field, **kwargs)
+
+    def store(self, record: ModelledTable) -> bool:
+        """Writes a record to the database; see ModelWrapper.store"""
+
+        with self.pool.cursor() as cursor:
+            return self.model.store(cursor, record, identity=self.loading.identity)
+
+    def store_many(self, records: Iterable[ModelledTable]) -> int:
+        """Writes a number of records to the database; see ModelWrapper.store_many"""
+
+        with self.pool.cursor() as cursor:
+            return self.model.store_many(cursor, records, identity=self.loading.identity)
+
+    def copy_blob(
+        self, unique_id: int, field: str, target: BinaryIO, size: int = CHUNK_SIZE
+    ) -> int:
+        """Writes a `bytes` field of a row to a file object; see ModelWrapper.copy_blob"""
+
+        with self.pool.cursor() as cursor, self.model.blob(cursor, unique_id, field) as blob:
+            return blob.copy_to(target, size)
+
+    def store_blob(self, unique_id: int, field: str, source: Source, size: int) -> int:
+        """Replaces a `bytes` field of a row; see ModelWrapper.store_blob"""
+
+        with self.pool.cursor() as cursor:
+            return self.model.store_blob(cursor, unique_id, field, Payload(source, size))
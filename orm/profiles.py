@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# vim: fileencoding=utf-8 expandtab ts=4 nospell
+
+# SPDX-FileCopyrightText: 2020-2021 Benedict Harcourt <ben.harcourt@harcourtprogramming.co.uk>
+#
+# SPDX-License-Identifier: BSD-2-Clause
+
+"""
+Named sets of connection settings (pragmas) for common workloads.
+
+How fast SQLite is depends mostly on its journal, sync, cache and memory
+map settings. Rather than each program choosing these, a profile can be
+applied to a connection when it is opened, or for the duration of a block.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, Iterator, Union
+
+import contextlib
+import sqlite3
+
+from .pool import SetupHook
+
+
+Pragmas = Dict[str, Union[int, str]]
+
+# Pragmas applied by each profile, in order.
+# Sizes are in bytes for mmap_size, and KiB (when negative) for cache_size.
+PROFILES: Dict[str, Pragmas] = {
+    # Many small transactions from several connections: readers do not
+    # block the writer, and commits do not wait for the disk.
+    "oltp": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "foreign_keys": 1,
+        "cache_size": -16384,
+        "temp_store": "MEMORY",
+        "mmap_size": 268435456,
+    },
+    # Large imports, where a crash means starting the import again:
+    # nothing waits for the disk, and a larger cache holds index pages.
+    "bulk-load": {
+        "journal_mode": "WAL",
+        "synchronous": "OFF",
+        "foreign_keys": 0,
+        "cache_size": -262144,
+        "temp_store": "MEMORY",
+        "mmap_size": 0,
+    },
+    # Connections which only read: the database is memory mapped, and
+    # writes are refused.
+    "read-only-serving": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -65536,
+        "temp_store": "MEMORY",
+        "mmap_size": 1073741824,
+        "query_only": 1,
+    },
+}
+
+
+def _pragmas(profile: str) -> Pragmas:
+    """Gets the pragmas for a profile by name"""
+
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown connection profile {profile}")
+
+    return PROFILES[profile]
+
+
+def apply(connection: sqlite3.Connection, profile: str) -> None:
+    """
+    Applies a profile to a connection.
+
+    Note that neither the journal mode nor foreign key checking can be
+    changed inside a transaction.
+    """
+
+    for pragma, value in _pragmas(profile).items():
+        connection.execute(f"PRAGMA {pragma} = {value}")
+
+
+def hook(profile: str) -> SetupHook:
+    """
+    Creates a setup hook which applies a profile, for connection pools.
+
+        pool = ConnectionPool("app.db", setup=[profiles.hook("oltp")])
+    """
+
+    _pragmas(profile)
+
+    return lambda connection: apply(connection, profile)
+
+
+def connect(database: str, profile: str = "oltp", **kwargs: Any) -> sqlite3.Connection:
+    """
+    Opens a connection to a database, and applies a profile to it.
+
+    Any other arguments are passed on to `sqlite3.connect`.
+    """
+
+    connection: sqlite3.Connection = sqlite3.connect(database, **kwargs)
+
+    try:
+        apply(connection, profile)
+    except BaseException:
+        connection.close()
+        raise
+
+    return connection
+
+
+@contextlib.contextmanager
+def scoped(connection: sqlite3.Connection, profile: str) -> Iterator[sqlite3.Connection]:
+    """
+    Applies a profile to a connection for the duration of a block, then
+    restores the previous settings.
+
+        with profiles.scoped(conn, "bulk-load"):
+            Reading.model(conn.cursor()).store_many(readings)
+            conn.commit()
+
+    Work done in the block should be committed inside it, so that the
+    relaxed settings apply to the commit.
+    """
+
+    pragmas = _pragmas(profile)
+    previous = {
+        pragma: connection.execute(f"PRAGMA {pragma}").fetchone()[0] for pragma in pragmas
+    }
+
+    apply(connection, profile)
+
+    try:
+        yield connection
+    finally:
+        for pragma, value in previous.items():
+            connection.execute(f"PRAGMA {pragma} = {value}")
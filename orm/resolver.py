@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+# vim: fileencoding=utf-8 expandtab ts=4 nospell
+
+# SPDX-FileCopyrightText: 2020-2021 Benedict Harcourt <ben.harcourt@harcourtprogramming.co.uk>
+#
+# SPDX-License-Identifier: BSD-2-Clause
+
+"""
+Breadth first loading of the foreign objects of records.
+
+The Resolver is used by TableModel to turn selected rows into records,
+along with all of the foreign objects they refer to.
+"""
+
+from __future__ import annotations
+
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    FrozenSet,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
+
+import collections
+import sqlite3
+import time
+
+from orm import hooks
+from orm.deferred import DeferredBatch
+from orm.lazy import LazyBatch
+from orm.loading import LAZY_LOADING, Loading
+
+if TYPE_CHECKING:
+    from orm.model import TableModel
+
+
+class Resolver:
+    """
+    Loads the foreign objects for a set of records, breadth first.
+
+    Rows are turned into records with their foreign fields left empty, and
+    the IDs they reference queued against the foreign model. Each round of
+    `resolve` loads all the queued IDs of one model in a single query, so
+    IDs from every level of the graph are merged. IDs are only ever queued
+    once, which makes cycles safe, and NULL foreign keys are skipped.
+
+    Once nothing is left to load, the foreign fields are filled in.
+
+    With the lazy strategy, foreign fields are instead filled with LazyRecord
+    proxies, batched by model, unless the record is already known. Proxies
+    for rows which are loaded later on by the same query are bound to them
+    directly.
+
+    With compact loading, all records (including foreign objects) are compact.
+
+    Foreign objects are selected without the fields their table defers
+    (see `TableModel.deferred`), unless the loading options defer nothing.
+    The records with deferred fields from each query form a DeferredBatch.
+    """
+
+    cursor: sqlite3.Cursor
+    loading: Loading
+    batches: Dict[TableModel[Any], LazyBatch]
+    loaded: Dict[TableModel[Any], Dict[int, Any]]
+    seen: Dict[TableModel[Any], Set[int]]
+    pending: Dict[TableModel[Any], Set[int]]
+    links: List[Tuple[Any, str, TableModel[Any], int]]
+
+    def __init__(self, cursor: sqlite3.Cursor, loading: Loading) -> None:
+        self.cursor = cursor
+        self.loading = loading
+        self.batches = {}
+        self.loaded = collections.defaultdict(dict)
+        self.seen = collections.defaultdict(set)
+        self.pending = collections.defaultdict(set)
+        self.links = []
+
+    def deferred(self, model: TableModel[Any]) -> FrozenSet[str]:
+        """The fields deferred when loading foreign objects of a model"""
+
+        return model.deferred(self.loading)
+
+    def add_rows(
+        self,
+        model: TableModel[Any],
+        rows: List[Any],
+        deferred: Optional[FrozenSet[str]] = None,
+    ) -> Dict[int, Any]:
+        """
+        Converts rows of the given model to records, queuing their foreign keys.
+
+        The rows were selected without the `deferred` fields (by default,
+        those for foreign objects of the model).
+        """
+
+        if deferred is None:
+            deferred = self.deferred(model)
+
+        known = self.loaded[model]
+        output: Dict[int, Any] = {}
+        packed = []
+        position = model.id_position
+
+        for row in rows:
+            unique_id = row[position]
+
+            if unique_id in known:
+                output[unique_id] = known[unique_id]
+            else:
+                packed.append(row)
+
+        ids = [row[position] for row in packed]
+
+        # Rows which refer to others in the same batch must not queue them,
+        # and rows which were queued already need not be selected.
+        self.seen[model].update(ids)
+
+        if model in self.pending:
+            self.pending[model].difference_update(ids)
+
+            if not self.pending[model]:
+                del self.pending[model]
+
+        children = self.add_submodels(model, ids)
+        timed = bool(hooks.INSTALLED)
+        start = time.perf_counter() if timed else 0.0
+
+        output.update(self.hydrate(model, packed, children, deferred))
+
+        if timed:
+            hooks.records_hydrated(model.label, len(packed), time.perf_counter() - start)
+
+        return output
+
+    def hydrate(
+        self,
+        model: TableModel[Any],
+        rows: List[Any],
+        children: List[Mapping[int, Any]],
+        deferred: FrozenSet[str],
+    ) -> Dict[int, Any]:
+        """Constructs the records for new rows, given their sub table values"""
+
+        records: Dict[int, Any] = {}
+        position = model.id_position
+        hydrate = model.hydrator_for(bool(self.loading.compact), deferred)
+        batch = DeferredBatch(model, self.cursor, deferred) if deferred else None
+
+        for row in rows:
+            unique_id = row[position]
+            values: List[Any] = []
+            links = self.add_foreigners(model, row, values)
+            values.extend([child[unique_id] for child in children])
+            hydrated = hydrate(row, values)
+            record = self.add_record(model, unique_id, hydrated, links)
+
+            # Records from the identity map already have their fields.
+            if batch is not None and record is hydrated:
+                batch.add(unique_id, record)
+
+            records[unique_id] = self.loaded[model][unique_id] = record
+
+        return records
+
+    def add_record(
+        self,
+        model: TableModel[Any],
+        unique_id: int,
+        record: Any,
+        links: List[Tuple[str, TableModel[Any], int]],
+    ) -> Any:
+        """Adds a new record, returning the record from the identity map if there is one"""
+
+        if self.loading.identity is not None:
+            existing = self.loading.identity.add(model, unique_id, record)
+
+            if existing is not record:
+                # The record from the map is already resolved.
+                return existing
+
+        self.links.extend((record, *link) for link in links)
+
+        return record
+
+    def add_submodels(
+        self, model: TableModel[Any], ids: List[int]
+    ) -> List[Mapping[int, Any]]:
+        """Selects the sub table values for a set of records, for each sub table"""
+
+        if not ids:
+            return []
+
+        return [sub_model.select(self.cursor, *ids) for sub_model in model.submodels.values()]
+
+    def add_foreigners(
+        self, model: TableModel[Any], row: Sequence[Any], values: List[Any]
+    ) -> List[Tuple[str, TableModel[Any], int]]:
+        """
+        Adds the foreign objects of a row to `values`, queuing the IDs they
+        refer to, and returns the links to fill in once those are loaded.
+
+        The foreign objects are None until then; with the lazy strategy,
+        they are proxies instead.
+        """
+
+        links = []
+        lazy = self.loading.strategy == LAZY_LOADING
+
+        for our_key, position, foreign in model.foreign_positions:
+            foreign_id = row[position]
+
+            if foreign_id is not None and lazy:
+                values.append(self.proxy(foreign, foreign_id))
+                continue
+
+            values.append(None)
+
+            if foreign_id is not None:
+                links.append((our_key, foreign, foreign_id))
+                self.want(foreign, foreign_id)
+
+        return links
+
+    def proxy(self, model: TableModel[Any], unique_id: int) -> Any:
+        """Gets the record with the given ID if it is known, or a proxy for it"""
+
+        record = self.loaded[model].get(unique_id)
+
+        if record is None and self.loading.identity is not None:
+            record = self.loading.identity.get(model, unique_id)
+
+        if record is not None:
+            return record
+
+        if model not in self.batches:
+            self.batches[model] = LazyBatch(model, self.cursor, self.loading)
+
+        return self.batches[model].proxy(unique_id)
+
+    def want(self, model: TableModel[Any], unique_id: int) -> None:
+        """Queues a record to be loaded, unless it is known already"""
+
+        if unique_id in self.seen[model]:
+            return
+
+        self.seen[model].add(unique_id)
+
+        if self.loading.identity is not None:
+            record = self.loading.identity.get(model, unique_id)
+
+            if record is not None:
+                self.loaded[model][unique_id] = record
+                return
+
+        self.pending[model].add(unique_id)
+
+    def resolve(self) -> None:
+        """Loads all queued records, and fills in the foreign fields"""
+
+        while self.pending:
+            model, ids = self.pending.popitem()
+            deferred = self.deferred(model)
+            self.add_rows(model, model.select_rows(self.cursor, ids, deferred), deferred)
+
+        for record, our_key, model, foreign_id in self.links:
+            setattr(record, our_key, self.loaded[model].get(foreign_id))
+
+        for model, batch in self.batches.items():
+            batch.bind(self.loaded[model])
+
+        self.links.clear()
+        self.batches.clear()
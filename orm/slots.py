@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# vim: fileencoding=utf-8 expandtab ts=4 nospell
+
+# SPDX-FileCopyrightText: 2020-2021 Benedict Harcourt <ben.harcourt@harcourtprogramming.co.uk>
+#
+# SPDX-License-Identifier: BSD-2-Clause
+
+"""
+Compact record classes, which store their fields in `__slots__`.
+
+Every instance of a normal class carries space for an instance dict, even
+when it is never used. A subclass with `__slots__` does not help, as the
+dict comes from the base class; so the compact class is instead a copy of
+the table class (with all the methods of the class and its bases) which
+has only slots.
+
+Compact records report the table class as their `__class__`, in the same
+way as lazy proxies, so `isinstance` checks, dataclass equality, `repr`,
+`store` and foreign key values all treat them as records of the table.
+`type()` does show the difference.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, Generic, Tuple, Type, get_type_hints
+
+
+# Attributes of the table class (and its bases) which are not copied.
+_EXCLUDED = {
+    "__dict__",
+    "__weakref__",
+    "__slots__",
+    "__orig_bases__",
+    "__parameters__",
+    "__init_subclass__",
+    "__class_getitem__",
+}
+
+# The compact class for each table class.
+_CLASSES: Dict[Type[Any], Type[Any]] = {}
+
+
+def record_class(table: Type[Any]) -> Type[Any]:
+    """Gets the compact record class for a table class"""
+
+    if table not in _CLASSES:
+        _CLASSES[table] = _make_class(table)
+
+    return _CLASSES[table]
+
+
+def _make_class(table: Type[Any]) -> Type[Any]:
+    """Creates the compact record class for a table class"""
+
+    fields = tuple(get_type_hints(table))
+    namespace: Dict[str, Any] = {}
+
+    for base in reversed(table.__mro__[:-1]):
+        # The hooks of Generic (including __new__, before Python 3.9) only
+        # work on its subclasses.
+        if base is not Generic:
+            namespace.update(vars(base))
+
+    for name in (*_EXCLUDED, *fields):
+        namespace.pop(name, None)
+
+    # Class level defaults would conflict with the slots; the constructor
+    # of the table class sets all fields, so they are not needed.
+    namespace["__slots__"] = (*fields, "__weakref__")
+    namespace["__class__"] = property(lambda _: table)
+    namespace["__reduce__"] = _reduce
+    namespace["__module__"] = table.__module__
+    namespace["__qualname__"] = table.__qualname__
+
+    return type(table.__name__, (), namespace)
+
+
+def _reduce(record: Any) -> Tuple[Any, ...]:
+    """Pickles a compact record as its table class and field values"""
+
+    fields = type(record).__slots__[:-1]
+
+    return _restore, (record.__class__, tuple(getattr(record, field) for field in fields))
+
+
+def _restore(table: Type[Any], values: Tuple[Any, ...]) -> Any:
+    """Unpickles a compact record"""
+
+    compact = record_class(table)
+    record = object.__new__(compact)
+
+    for field, value in zip(compact.__slots__, values):
+        object.__setattr__(record, field, value)
+
+    return record
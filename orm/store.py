@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# vim: fileencoding=utf-8 expandtab ts=4 nospell
+
+# SPDX-FileCopyrightText: 2020-2021 Benedict Harcourt <ben.harcourt@harcourtprogramming.co.uk>
+#
+# SPDX-License-Identifier: BSD-2-Clause
+
+"""
+Writing the records of a Table, one at a time or in bulk.
+"""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Tuple
+
+import itertools
+import sqlite3
+
+from orm.abc import ModelledTable, TableBase
+
+if TYPE_CHECKING:
+    from orm.identity import IdentityMap
+
+
+# The lowest value of SQLITE_MAX_VARIABLE_NUMBER in supported SQLite versions.
+_MAX_VARIABLES = 999
+
+
+class StoreMixin(TableBase[ModelledTable]):
+    """The write half of a TableModel: `store` and `store_many`"""
+
+    def _store_sql(self, with_id: bool) -> str:
+        """INSERT OR REPLACE statement, with or without the ID column"""
+
+        fields = [x for x in self.columns if with_id or x != self.id_field]
+
+        return (
+            f"INSERT OR REPLACE INTO [{self.table}] ([{'], ['.join(fields)}])"
+            f" VALUES (:{', :'.join(fields)})"
+        )
+
+    def _extract(self, record: ModelledTable) -> Dict[str, Any]:
+        """Reads the column values out of a record"""
+
+        return self.extractor(record)
+
+    def store(
+        self,
+        cursor: sqlite3.Cursor,
+        record: ModelledTable,
+        *,
+        identity: Optional[IdentityMap] = None,
+    ) -> bool:
+        """
+        Writes a record to the database.
+
+        In all cases, this is done as an INSERT OR REPLACE statement.
+        If the ID field is not set, this may cause the ID of a record to change,
+        where it is matched via a unique key.
+
+        The ID field will be updated with the inserted row's ID, and the
+        record will replace any other for that ID in the identity map.
+        """
+
+        if not isinstance(record, self.record):
+            raise Exception("Wrong type")
+
+        data = self._extract(record)
+        with_id = data[self.id_field] is not None
+        sql = self.statement(("store", with_id), lambda: self._store_sql(with_id))
+
+        self.execute(cursor, "store", sql, data)
+
+        setattr(record, self.id_field, cursor.lastrowid)
+
+        if identity is not None:
+            identity.put(self, getattr(record, self.id_field), record)
+
+        return True
+
+    def store_many(
+        self,
+        cursor: sqlite3.Cursor,
+        records: Iterable[ModelledTable],
+        *,
+        identity: Optional[IdentityMap] = None,
+    ) -> int:
+        """
+        Writes a number of records to the database.
+
+        This has the same effect as calling `store` for each record, in
+        order, but each run of records with an ID is written with a single
+        `executemany`, and each run without an ID is inserted with multi-row
+        statements.
+
+        The ID fields of new records are updated with their inserted row's ID.
+
+        Returns the number of records written.
+        """
+
+        stored: List[Tuple[ModelledTable, Dict[str, Any]]] = []
+
+        for record in records:
+            if not isinstance(record, self.record):
+                raise Exception("Wrong type")
+
+            stored.append((record, self._extract(record)))
+
+        # Runs of new and existing records are written in turn, so that
+        # conflicts on unique keys are resolved in the same order as `store`.
+        for created, run in itertools.groupby(
+            stored, lambda item: item[1][self.id_field] is None
+        ):
+            if created:
+                self._insert_returning(cursor, list(run))
+            else:
+                sql = self.statement(("store", True), lambda: self._store_sql(True))
+
+                self.executemany(cursor, "store_many", sql, [data for _, data in run])
+
+        if identity is not None:
+            for record, _ in stored:
+                identity.put(self, getattr(record, self.id_field), record)
+
+        return len(stored)
+
+    def _insert_returning(
+        self, cursor: sqlite3.Cursor, created: List[Tuple[ModelledTable, Dict[str, Any]]]
+    ) -> None:
+        """Inserts new records with multi-row VALUES, reading back their IDs.
+
+        The number of rows per statement is always a power of two, so that
+        only a few statements are compiled for each model."""
+
+        if sqlite3.sqlite_version_info < (3, 35, 0):
+            # RETURNING is not available, so fall back to one row at a time.
+            for record, _ in created:
+                self.store(cursor, record)
+
+            return
+
+        fields = [x for x in self.columns if x != self.id_field]
+        limit = 1 << (max(_MAX_VARIABLES // max(len(fields), 1), 1).bit_length() - 1)
+        offset = 0
+
+        while offset < len(created):
+            count = min(limit, 1 << ((len(created) - offset).bit_length() - 1))
+            end = offset + count
+            batch = created[offset:end]
+            offset = end
+
+            sql = self.statement(("store_many", count), lambda: self._returning_sql(count))
+            params = [data[field] for _, data in batch for field in fields]
+
+            ids = self.fetch(cursor, "store_many", sql, params)
+
+            # The rows are given consecutive IDs in the order of the batch,
+            # but RETURNING lists them in no particular order.
+            for (record, _), (row_id,) in zip(batch, sorted(ids)):
+                setattr(record, self.id_field, row_id)
+
+    def _returning_sql(self, count: int) -> str:
+        """
+        Multi-row INSERT OR REPLACE statement for new records.
+
+        Each row is numbered, and given the ID that many past the highest
+        in the table; the numbered rows are read before any are inserted.
+        """
+
+        fields = [x for x in self.columns if x != self.id_field]
+        rows = ", ".join(
+            "(" + ", ".join([str(i + 1)] + ["?"] * len(fields)) + ")" for i in range(count)
+        )
+        columns = ", ".join(f"[{field}]" for field in [self.id_field] + fields)
+        values = ", ".join(
+            ["[__base].[id] + [__rows].[column1]"]
+            + [f"[__rows].[column{i + 2}]" for i in range(len(fields))]
+        )
+
+        return (
+            f"INSERT OR REPLACE INTO [{self.table}] ({columns}) SELECT {values}"
+            f" FROM (SELECT coalesce(max([{self.id_field}]), 0) AS [id] FROM [{self.table}])"
+            f" AS [__base], (VALUES {rows}) AS [__rows]"
+            f" RETURNING [{self.id_field}]"
+        )
@@ -15,10 +15,14 @@ from __future__ import annotations
 
 from typing import (
     get_type_hints,
+    TYPE_CHECKING,
     Any,
+    BinaryIO,
     Callable,
     Dict,
     Generic,
+    Iterable,
+    Iterator,
     List,
     Mapping,
     Optional,
@@ -29,28 +33,35 @@ from typing import (
     Union,
 )
 
+import dataclasses
 import inspect
-import logging
 import re
 import sqlite3
 import typing_inspect  # type: ignore
 
+from orm.blob import CHUNK_SIZE, BlobStream, Payload, Source
 from orm.exceptions import MissingIdField
 from orm.abc import (
+    split_operator,
+    EQUALITY,
     BaseModel,
     MutableFilters as Filters,
     FilterTypes,
-    ForeignerMap,
+    ModelledTable,
     PrimitiveTypes,
 )
+from orm.loading import Loading
+from orm.model import STREAM_WINDOW, TableModel, _COMPACT, _DEFERRED, _INDEXES, _UNIQUES
+from orm.pagination import Page
+from orm.pool import ConnectionPool, PooledModelWrapper
+
+if TYPE_CHECKING:
+    from orm.identity import IdentityMap
 
 
-ModelledTable = TypeVar("ModelledTable", bound="Table[Any]")
 SecondTable = TypeVar("SecondTable", bound="Table[Any]")
 NoneType: Type[None] = type(None)
 
-_LOGGER = logging.getLogger("tiny-orm")
-
 _TYPE_MAP = {
     str: "TEXT",
     bytes: "BLOB",
@@ -59,9 +70,26 @@ _TYPE_MAP = {
     bool: "SMALLINT",
 }
 
-_UNIQUES = "__orm_uniques__"
 _SUBTABLES = "__orm_subtable__"
 
+# Keyword arguments which are taken alongside filters, and so can not be
+# used as field names (see _make_model).
+RESERVED_FIELDS = frozenset(
+    (
+        "cursor",
+        "window",
+        "loading",
+        "only",
+        "defer",
+        "page",
+        "fetch",
+        "field",
+        "function",
+        "left",
+        "right",
+    )
+)
+
 _MODELS: Dict[Type[ModelledTable], TableModel[ModelledTable]] = {}  # type: ignore
 
 
@@ -100,6 +128,9 @@ def _make_model(cls: Type[ModelledTable]) -> TableModel[ModelledTable]:
         if _field in [id_field]:
             continue
 
+        if _field in RESERVED_FIELDS or split_operator(_field)[1]:
+            raise Exception(f"Field `{_field}` in `{table}` has a reserved name")
+
         _process_type(model, cls, _field, _type)
 
     return model
@@ -129,17 +160,19 @@ def _process_type(
     if not _is_valid_type(_type):
         raise Exception(f"Field `{_field}` in `{model.table}` is not a valid type")
 
+    column = _field
+
     if _type not in _TYPE_MAP:
         if _type == cls:
             sub_model = model
         else:
             sub_model = _get_model(_type)
-            _field = sub_model.id_field
+            column = sub_model.id_field
 
-        model.foreigners[_field] = (sub_model.id_field, sub_model)
+        model.foreigners[_field] = (column, sub_model)
         _type = int
 
-    model.table_fields[_field] = _TYPE_MAP[_type] + (" NOT NULL" if required else "")
+    model.table_fields[column] = _TYPE_MAP[_type] + (" NOT NULL" if required else "")
 
 
 def _decompose_type(_type: Type[Any]) -> Tuple[Type[Any], bool]:
@@ -218,13 +251,43 @@ class Table(Generic[ModelledTable]):
         """
 
     @classmethod
-    def model(cls, cursor: sqlite3.Cursor) -> ModelWrapper[ModelledTable]:
-        """Get the model instance, using the supplied cursor"""
+    def model(
+        cls,
+        cursor: sqlite3.Cursor,
+        identity: Optional[IdentityMap] = None,
+        strategy: Optional[str] = None,
+        compact: Optional[bool] = None,
+    ) -> ModelWrapper[ModelledTable]:
+        """Get the model instance, using the supplied cursor.
+
+        If an IdentityMap is supplied, records (including foreign objects)
+        are taken from it where possible, and added to it once loaded.
+
+        The strategy for loading foreign objects defaults to that of the
+        model; see `TableModel.strategy`. Whether records are compact
+        defaults to whether the table is; see `orm.compact`."""
+
+        return ModelWrapper(_get_model(cls), cursor, Loading(identity, strategy, compact))
+
+    @classmethod
+    def pooled(
+        cls,
+        pool: ConnectionPool,
+        identity: Optional[IdentityMap] = None,
+        strategy: Optional[str] = None,
+        compact: Optional[bool] = None,
+    ) -> PooledModelWrapper[ModelledTable]:
+        """Get the model instance, borrowing connections from the supplied pool.
+
+        An IdentityMap is not thread safe, so should only be passed in when
+        the wrapper is used by a single thread."""
+
+        loading = Loading(identity, strategy, compact)
 
-        return ModelWrapper(_get_model(cls), cursor)
+        return PooledModelWrapper(_get_model(cls), pool, loading)
 
     @classmethod
-    def create_table(cls, cursor: sqlite3.Cursor) -> None:
+    def create_table(cls, cursor: sqlite3.Cursor, auto_index: bool = True) -> None:
         """
         Ensures that this table is created in the SQLite database backing
         the supplied cursor.
@@ -232,10 +295,14 @@ class Table(Generic[ModelledTable]):
         It is recommended that you call this function as soon as you open the
         database, unless your program design guarantees the table will exist.
 
+        Along with any indexes added with `orm.index`, foreign key columns
+        and sub-table connector columns are indexed, unless `auto_index`
+        is False.
+
         Note that py-tiny-orm does not support altering existing tables.
         """
 
-        _get_model(cls).create_table(cursor)
+        _get_model(cls).create_table(cursor, auto_index)
 
 
 def unique(*fields: str) -> Callable[[Type[ModelledTable]], Type[ModelledTable]]:
@@ -252,8 +319,9 @@ def unique(*fields: str) -> Callable[[Type[ModelledTable]], Type[ModelledTable]]
         if not all(field in model.table_fields for field in fields):
             raise Exception(f"{cls.__name__} does not have all fields specified in key")
 
-        uniques: List[Set[str]] = getattr(cls, _UNIQUES, [])
-        uniques.append(set(fields))
+        # Kept in the order given (without repeats), so the schema is stable.
+        uniques: List[Tuple[str, ...]] = getattr(cls, _UNIQUES, [])
+        uniques.append(tuple(dict.fromkeys(fields)))
         setattr(cls, _UNIQUES, uniques)
 
         return cls
@@ -261,150 +329,187 @@ def unique(*fields: str) -> Callable[[Type[ModelledTable]], Type[ModelledTable]]
     return _unique
 
 
-class TableModel(Generic[ModelledTable], BaseModel):
-    """The generated model for a given Table."""
-
-    record: Type[ModelledTable]
+def index(
+    *fields: str, where: Optional[str] = None
+) -> Callable[[Type[ModelledTable]], Type[ModelledTable]]:
+    """
+    Adds an index to a Table.
 
-    created: bool
-    table: str
-    id_field: str
+    Fields may be regular fields or foreign objects, and are indexed in the
+    order given. If `where` is given, a partial index is created containing
+    only the rows matching that SQL expression. The fields are checked when
+    the table is created, so that self-referencing tables can be indexed.
 
-    table_fields: Dict[str, str]
-    foreigners: ForeignerMap
-    submodels: Dict[str, SubTable[Any]]
+        @orm.index("user", "posted")
+        @orm.index("posted", where="[deleted] = 0")
+        class Comment(Table["Comment"]):
+            ...
+    """
 
-    def __init__(self, record: Type[ModelledTable], table: str, id_field: str):
-        self.record = record
-        self.table = table
-        self.id_field = id_field
-        self.created = False
+    def _index(cls: Type[ModelledTable]) -> Type[ModelledTable]:
+        """Adds an index to a Table"""
 
-        self.table_fields = {}
-        self.foreigners = {}
-        self.submodels = {}
+        if not issubclass(cls, Table):
+            raise Exception(f"{cls.__name__} is not a sub class of Table")
 
-    def create_table(self, cursor: sqlite3.Cursor) -> None:
-        """Creates the table(s) in SQLite"""
+        indexes: List[Tuple[Tuple[str, ...], Optional[str]]] = getattr(cls, _INDEXES, [])
+        indexes.append((fields, where))
+        setattr(cls, _INDEXES, indexes)
 
-        if self.created:
-            return
+        return cls
 
-        # Preset this to true to work with Foreign key loops.
-        self.created = True
+    return _index
 
-        for _, model in self.foreigners.values():
-            model.create_table(cursor)
 
-        compiled_sql = self._create_table_sql()
+def compact_table(cls: Type[ModelledTable]) -> Type[ModelledTable]:
+    """
+    Loads the records of a Table as compact records by default.
 
-        _LOGGER.debug(compiled_sql)
+    Compact records store their fields in `__slots__` rather than an instance
+    dict (see orm.slots), using much less memory for large working sets.
+    They can not be given attributes other than their fields.
 
-        cursor.execute(compiled_sql)
+        @orm.compact
+        @dataclasses.dataclass
+        class Reading(orm.Table["Reading"]):
+            ...
 
-        for smodel in self.submodels.values():
-            smodel.model.create_table(cursor)
+    Any query can also choose either kind of record with `compact=`.
 
-    def _create_table_sql(self) -> str:
-        """CREATE TABLE Statement for this table"""
+    This is exported as `orm.compact`; it has a longer name here so that
+    it is not hidden by the `compact=` arguments of this module.
+    """
 
-        sql: List[str] = [f"CREATE TABLE IF NOT EXISTS `{self.table}` ("]
+    if not issubclass(cls, Table):
+        raise Exception(f"{cls.__name__} is not a sub class of Table")
 
-        for _field, _type in self.table_fields.items():
-            sql.append(f"[{_field}] {_type}, ")
+    setattr(cls, _COMPACT, True)
 
-        for _fields in getattr(self.record, _UNIQUES, []):
-            sql.append(f"UNIQUE ([{'], ['.join(_fields)}]), ")
+    return cls
 
-        for _field, (f_key, _model) in self.foreigners.items():
-            sql.append(f"FOREIGN KEY ([{_field}]) REFERENCES [{_model.table}] ([{f_key}]), ")
 
-        return "\n".join(sql).strip(", ") + "\n);"
+def defer_fields(*fields: str) -> Callable[[Type[ModelledTable]], Type[ModelledTable]]:
+    """
+    Marks fields of a Table as deferred by default.
 
-    def all(self, cursor: sqlite3.Cursor) -> List[ModelledTable]:
-        """
-        Returns all records on the current table.
+    Deferred fields are not selected when records are loaded; the first
+    time one is read, the deferred fields of every record loaded by the
+    same query are selected together (see orm.deferred). This suits wide
+    columns, such as text bodies or blobs, which are rarely needed.
 
-        Note: records will be loaded into memory before being returned,
-        in order to optimise the number of queries to realted tables.
-        """
+        @orm.defer("body")
+        @dataclasses.dataclass
+        class Post(orm.Table["Post"]):
+            post_id: int
+            title: str
+            body: str
 
-        sql = f"SELECT {self.id_field} FROM [{self.table}]"
+    Any query can defer other fields with `defer=`, or load the fields
+    with `defer=False`. The fields are checked when records are loaded.
 
-        _LOGGER.debug(sql)
+    This is exported as `orm.defer`; it has a longer name here so that
+    it is not hidden by the `defer=` arguments of this module.
+    """
 
-        cursor.execute(sql)
+    def _defer(cls: Type[ModelledTable]) -> Type[ModelledTable]:
+        """Marks fields of a Table as deferred by default"""
 
-        ids = [x[0] for x in cursor.fetchall()]
+        if not issubclass(cls, Table):
+            raise Exception(f"{cls.__name__} is not a sub class of Table")
 
-        return list(self.get_many(cursor, *ids).values())
+        setattr(cls, _DEFERRED, frozenset(getattr(cls, _DEFERRED, ())) | set(fields))
 
-    def get(self, cursor: sqlite3.Cursor, unique_id: int) -> Optional[ModelledTable]:
-        """Gets a record by ID, or None if no record with that ID exists"""
+        return cls
 
-        return self.get_many(cursor, unique_id).get(unique_id, None)
+    return _defer
 
-    def get_many(self, cursor: sqlite3.Cursor, *ids: int) -> Dict[int, ModelledTable]:
-        """
-        Gets all records that exist with ID in the supplied list.
 
-        Entries in the dict are not generated for records which do not exist.
-        """
-
-        if not ids:
-            return {}
-
-        fields: List[str] = list(self.table_fields.keys())
-        fields.append(self.id_field)
+class ModelWrapper(Generic[ModelledTable]):
+    """
+    Binding class between a Table, it's Model, and an SQL-Lite cursor.
 
-        sql = (
-            f"SELECT [{'], ['.join(fields)}] FROM [{self.table}] "
-            f"WHERE [{self.id_field}] IN ({', '.join(['?'] * len(ids))})"
-        )
+    The Model for table "Foo" can be retrieved with
 
-        _LOGGER.debug(sql)
-        _LOGGER.debug(ids)
+        Foo.model(cursor)
+    """
 
-        cursor.execute(sql, tuple(ids))
+    model: TableModel[ModelledTable]
+    cursor: sqlite3.Cursor
+    loading: Loading
 
-        rows = cursor.fetchall()
+    def __init__(
+        self,
+        model: TableModel[ModelledTable],
+        cursor: sqlite3.Cursor,
+        loading: Loading = Loading(),
+    ):
+        self.model = model
+        self.cursor = cursor
+        self.loading = loading
 
-        if not rows:
-            return {}
+    def _loading(
+        self, only: Optional[Iterable[str]], defer: Union[Iterable[str], bool, None]
+    ) -> Loading:
+        """The loading options of this wrapper, with the fields to defer for a call"""
 
-        packed = [dict(zip(fields, row)) for row in rows]
+        if only is None and defer is None:
+            return self.loading
 
-        del rows
+        return dataclasses.replace(self.loading, only=only, defer=defer)
 
-        packed = self._add_joins(cursor, packed)
+    def all(
+        self,
+        *,
+        only: Optional[Iterable[str]] = None,
+        defer: Union[Iterable[str], bool, None] = None,
+        page: Optional[Page] = None,
+    ) -> List[ModelledTable]:
+        """
+        Returns all records on the current table.
 
-        output: Dict[int, ModelledTable] = {}
+        Note: records will be loaded into memory before being returned,
+        in order to optimise the number of queries to realted tables.
 
-        for row in packed:
-            output[row[self.id_field]] = self.record(**row)
+        Fields in `defer` (or not in `only`) are loaded when first read;
+        see TableModel.deferred. A `page` returns one page of the records,
+        in order; see orm.Page.
+        """
 
-        return output
+        return self.model.all(self.cursor, loading=self._loading(only, defer), page=page)
 
-    def _add_joins(
-        self, cursor: sqlite3.Cursor, packed: List[Dict[str, Any]]
-    ) -> List[Dict[str, Any]]:
-        for our_key, (their_key, model) in self.foreigners.items():
-            their_ids: Set[int] = {row[our_key] for row in packed}
-            frens = model.get_many(cursor, *their_ids)
+    def get(
+        self,
+        unique_id: int,
+        *,
+        only: Optional[Iterable[str]] = None,
+        defer: Union[Iterable[str], bool, None] = None,
+    ) -> Optional[ModelledTable]:
+        """Gets a record by ID, or None if no record with that ID exists"""
 
-            for row in packed:
-                row[our_key] = frens[row[their_key]]
-                del row[their_key]
+        return self.model.get(self.cursor, unique_id, loading=self._loading(only, defer))
 
-        for our_key, sub_model in self.submodels.items():
-            children = sub_model.select(cursor, *[row[self.id_field] for row in packed])
+    def get_many(
+        self,
+        *ids: int,
+        only: Optional[Iterable[str]] = None,
+        defer: Union[Iterable[str], bool, None] = None,
+    ) -> Dict[int, ModelledTable]:
+        """
+        Gets all records that exist with ID in the supplied list.
 
-            for row in packed:
-                row[our_key] = children[row[self.id_field]]
+        Entries in the dict are not generated for records which do not exist.
+        """
 
-        return packed
+        return self.model.get_many(self.cursor, *ids, loading=self._loading(only, defer))
 
-    def search(self, cursor: sqlite3.Cursor, **kwargs: FilterTypes) -> List[ModelledTable]:
+    def search(
+        self,
+        *,
+        only: Optional[Iterable[str]] = None,
+        defer: Union[Iterable[str], bool, None] = None,
+        page: Optional[Page] = None,
+        **kwargs: FilterTypes,
+    ) -> List[ModelledTable]:
         """
         Gets records for this model which match the given filters.
 
@@ -428,154 +533,141 @@ class TableModel(Generic[ModelledTable], BaseModel):
             Bar.model(cursor).search(foo=Foo(1))
 
             # Search by local ID
-            # NOTE: This is valid, but using Model.get() is faster.
+            # NOTE: This is value, but using Model.get() is faster.
             Bar.model(cursor).search(bar_id=123)
-        """
-
-        for name, model in self.foreigners.values():
-            if name in kwargs and isinstance(kwargs[name], model.record):
-                kwargs[model.id_field] = getattr(kwargs[name], model.id_field)
-                del kwargs[name]
 
-        sql, params = self.where(self.foreigners, kwargs)
-        sql = f"SELECT {self.id_field} FROM [{self.table}] WHERE " + sql
+            # The first page of 50 by name, and then the next page
+            page = orm.Page("-name", 50)
+            first = Bar.model(cursor).search(foo=foo, page=page)
+            Bar.model(cursor).search(foo=foo, page=page.following(first[-1]))
+        """
 
-        _LOGGER.debug(sql)
-        _LOGGER.debug(params)
+        return self.model.search(
+            self.cursor, loading=self._loading(only, defer), page=page, **kwargs
+        )
 
-        cursor.execute(sql, params)
+    def search_ids(self, *, page: Optional[Page] = None, **kwargs: FilterTypes) -> List[int]:
+        """
+        Gets the IDs of the records which match the given filters, without
+        loading the records; see TableModel.search_ids.
+        """
 
-        ids = [x[0] for x in cursor.fetchall()]
+        return self.model.search_ids(self.cursor, page=page, **kwargs)
 
-        return list(self.get_many(cursor, *ids).values())
+    def iter_all(self, window: int = STREAM_WINDOW) -> Iterator[ModelledTable]:
+        """
+        Yields all records on the current table.
 
-    def store(self, cursor: sqlite3.Cursor, record: ModelledTable) -> bool:
+        Rows are read `window` at a time, and the foreign objects and sub
+        tables for each window are loaded together, so memory use is bound
+        by the window size rather than the size of the table.
         """
-        Writes a record to the database.
 
-        In all cases, this is done as an INSERT OR REPLACE statement.
-        If the ID field is not set, this may cause the ID of a record to change,
-        where it is matched via a unique key.
+        return self.model.iter_all(self.cursor, window, loading=self.loading)
 
-        The ID field will be updated with the inserted row's ID.
+    def iter_search(
+        self, window: int = STREAM_WINDOW, **kwargs: FilterTypes
+    ) -> Iterator[ModelledTable]:
         """
+        Yields records for this model which match the given filters.
 
-        if not isinstance(record, self.record):
-            raise Exception("Wrong type")
+        The filters are the same as for `search`; rows are read in windows
+        in the same way as `iter_all`.
+        """
 
-        fields = list(self.table_fields.keys())
-        data: Dict[str, Any] = {}
+        return self.model.iter_search(self.cursor, window, loading=self.loading, **kwargs)
 
-        for field in fields:
-            data[field] = getattr(record, field)
+    def count(self, **kwargs: FilterTypes) -> int:
+        """The number of records which match the given filters; see TableModel.count"""
 
-        for _field, (_attr, _model) in self.foreigners.items():
-            data[_field] = data[_attr][_field]
-            del data[_attr]
+        return self.model.count(self.cursor, **kwargs)
 
-        if data[self.id_field] is None:
-            fields.remove(self.id_field)
-            del data[self.id_field]
-        else:
-            fields.append(self.id_field)
+    def exists(self, **kwargs: FilterTypes) -> bool:
+        """Whether any record matches the given filters"""
 
-        sql = (
-            f"INSERT OR REPLACE INTO [{self.table}] ([{'], ['.join(fields)}])"
-            f" VALUES (:{', :'.join(fields)})"
-        )
+        return self.model.exists(self.cursor, **kwargs)
 
-        _LOGGER.debug(sql)
-        _LOGGER.debug(data)
+    def aggregate(self, function: str, field: str, **kwargs: FilterTypes) -> Any:
+        """Applies an SQL aggregate function to a field; see TableModel.aggregate"""
 
-        cursor.execute(sql, data)
+        return self.model.aggregate(self.cursor, function, field, **kwargs)
 
-        setattr(record, self.id_field, cursor.lastrowid)
+    def sum(self, field: str, **kwargs: FilterTypes) -> Any:
+        """The sum of a field over the matching records (0 if there are none)"""
 
-        return True
+        return self.model.sum(self.cursor, field, **kwargs)
 
+    def min(self, field: str, **kwargs: FilterTypes) -> Any:
+        """The lowest value of a field in the matching records (or None)"""
 
-class ModelWrapper(Generic[ModelledTable]):
-    """
-    Binding class between a Table, it's Model, and an SQL-Lite cursor.
+        return self.model.min(self.cursor, field, **kwargs)
 
-    The Model for table "Foo" can be retrieved with
+    def max(self, field: str, **kwargs: FilterTypes) -> Any:
+        """The highest value of a field in the matching records (or None)"""
 
-        Foo.model(cursor)
-    """
+        return self.model.max(self.cursor, field, **kwargs)
 
-    model: TableModel[ModelledTable]
-    cursor: sqlite3.Cursor
+    def count_by(self, field: str, **kwargs: FilterTypes) -> Dict[Any, int]:
+        """The number of matching records for each value of a field"""
 
-    def __init__(self, model: TableModel[ModelledTable], cursor: sqlite3.Cursor):
-        self.model = model
-        self.cursor = cursor
+        return self.model.count_by(self.cursor, field, **kwargs)
 
-    def all(self) -> List[ModelledTable]:
-        """
-        Returns all records on the current table.
-
-        Note: records will be loaded into memory before being returned,
-        in order to optimise the number of queries to realted tables.
+    def store(self, record: ModelledTable) -> bool:
         """
+        Writes a record to the database.
 
-        return self.model.all(self.cursor)
-
-    def get(self, unique_id: int) -> Optional[ModelledTable]:
-        """Gets a record by ID, or None if no record with that ID exists"""
-
-        return self.model.get(self.cursor, unique_id)
-
-    def get_many(self, *ids: int) -> Dict[int, ModelledTable]:
-        """
-        Gets all records that exist with ID in the supplied list.
+        In all cases, this is done as an INSERT OR REPLACE statement.
+        If the ID field is not set, this may cause the ID of a record to change,
+        where it is matched via a unique key.
 
-        Entries in the dict are not generated for records which do not exist.
+        The ID field will be updated with the inserted row's ID.
         """
 
-        return self.model.get_many(self.cursor, *ids)
+        return self.model.store(self.cursor, record, identity=self.loading.identity)
 
-    def search(self, **kwargs: FilterTypes) -> List[ModelledTable]:
+    def store_many(self, records: Iterable[ModelledTable]) -> int:
         """
-        Gets records for this model which match the given filters.
+        Writes a number of records to the database.
 
-        You can filter using any field in the table, or by a foreign object.
+        This has the same effect as calling `store` for each record, in
+        order, but each run of records with an ID is written with a single
+        `executemany`, and each run without an ID is inserted with multi-row
+        statements.
 
-            class Foo(Table["Foo"]):
-                foo_id: int
+        The ID fields of new records are updated with their inserted row's ID.
 
-            class Bar(Table["Bar"]
-                bar_id: int
-                foo: Foo
-                name: str
+        Returns the number of records written.
+        """
 
-            # Search by standard field
-            Bar.model(cursor).search(name="Hello")
+        return self.model.store_many(self.cursor, records, identity=self.loading.identity)
 
-            # Search by foreign ID
-            Bar.model(cursor).search(foo_id=1)
-
-            # Search by foreign object
-            Bar.model(cursor).search(foo=Foo(1))
+    def blob(self, unique_id: int, field: str, *, readonly: bool = True) -> BlobStream:
+        """
+        Opens a `bytes` field of a row for incremental reads (and, if not
+        `readonly`, writes), without loading the record; see orm.blob.
 
-            # Search by local ID
-            # NOTE: This is value, but using Model.get() is faster.
-            Bar.model(cursor).search(bar_id=123)
+            with Attachment.model(cursor).blob(1, "data") as blob:
+                for chunk in blob.chunks():
+                    ...
         """
 
-        return self.model.search(self.cursor, **kwargs)
+        return self.model.blob(self.cursor, unique_id, field, readonly=readonly)
 
-    def store(self, record: ModelledTable) -> bool:
-        """
-        Writes a record to the database.
+    def copy_blob(
+        self, unique_id: int, field: str, target: BinaryIO, size: int = CHUNK_SIZE
+    ) -> int:
+        """Writes a `bytes` field of a row to a file object, `size` bytes at a time"""
 
-        In all cases, this is done as an INSERT OR REPLACE statement.
-        If the ID field is not set, this may cause the ID of a record to change,
-        where it is matched via a unique key.
+        with self.model.blob(self.cursor, unique_id, field) as blob:
+            return blob.copy_to(target, size)
 
-        The ID field will be updated with the inserted row's ID.
+    def store_blob(self, unique_id: int, field: str, source: Source, size: int) -> int:
+        """
+        Replaces a `bytes` field of an existing row with `size` bytes read
+        from a file object (or an iterable of chunks), a chunk at a time.
         """
 
-        return self.model.store(self.cursor, record)
+        return self.model.store_blob(self.cursor, unique_id, field, Payload(source, size))
 
 
 def subtable(
@@ -583,7 +675,7 @@ def subtable(
     table: Type[ModelledTable],
     subfield: Optional[str] = None,
     pivot: Optional[str] = None,
-    selectors: Optional[Dict[str, PrimitiveTypes]] = None,
+    selectors: Optional[Dict[str, FilterTypes]] = None,
 ) -> Callable[[Type[SecondTable]], Type[SecondTable]]:
     """Registers a field as a subtable to a Table"""
 
@@ -627,8 +719,10 @@ class SubTable(Generic[ModelledTable], BaseModel):
         source: Type[ModelledTable],
         field: str,
         pivot: Optional[str],
-        selectors: Dict[str, PrimitiveTypes],
+        selectors: Dict[str, FilterTypes],
     ) -> None:
+        super().__init__()
+
         # This is the model that the actual data for the sub tables is storeed in.
         self.model = _get_model(source)
 
@@ -650,6 +744,12 @@ class SubTable(Generic[ModelledTable], BaseModel):
         # the foreign key relation to the parent)
         self.validate()
 
+    @property
+    def label(self) -> str:
+        """The name of this model, as used in diagnostics"""
+
+        return self.model.table
+
     def validate(self) -> None:
         """Check if this subtable has a valid configuration.
 
@@ -675,7 +775,7 @@ class SubTable(Generic[ModelledTable], BaseModel):
                     f"Connector field {self.connector} not present in {self.model.table}"
                 )
 
-        for field in self.selectors:
+        for field, _ in map(split_operator, self.selectors):
             if field not in self.model.table_fields:
                 raise ValueError(f"Selector field {field} not present in {self.model.table}")
 
@@ -698,8 +798,22 @@ class SubTable(Generic[ModelledTable], BaseModel):
 
         self.connector = parent.id_field
         self.model.foreigners[parent.id_field] = (parent.id_field, parent)
+        self.model.connectors.append((self.connector, *self.selector_columns()))
+        self.model.reset()
         self.validate()
 
+    def selector_columns(self) -> List[str]:
+        """
+        The columns of the selectors, to index after the connector. Columns
+        compared for equality come first, so that an index can be used for
+        the other comparisons as well.
+        """
+
+        selectors = [split_operator(key) for key in self.selectors]
+        selectors.sort(key=lambda selector: selector[1] not in ("", *EQUALITY))
+
+        return list(dict.fromkeys(field for field, _ in selectors))
+
     def get_expected_type(self) -> Type[Any]:
         """Determines the expected type of the sub-field in the parent
         ype definition, based off the parameters to this helper class.
@@ -741,19 +855,15 @@ class SubTable(Generic[ModelledTable], BaseModel):
         where[self.connector] = connector_value
 
         sql, params = self.where({}, where)
-        sql = (
-            f"SELECT [{self.connector}], [{self.field}] FROM [{self.model.table}] WHERE "
-            + sql
+        sql = self.statement(
+            ("column", sql),
+            lambda: f"SELECT [{self.connector}], [{self.field}] "
+            f"FROM [{self.model.table}] WHERE {sql}",
         )
 
-        _LOGGER.debug(sql)
-        _LOGGER.debug(params)
-
-        cursor.execute(sql, params)
+        result: Dict[int, List[Any]] = {connected: [] for connected in connector_value}
 
-        result: Dict[int, List[Any]] = dict(zip(connector_value, [[]] * len(connector_value)))
-
-        for connected, value in cursor.fetchall():
+        for connected, value in self.fetch(cursor, "select_column", sql, params):
             result[connected].append(value)
 
         return result
@@ -772,22 +882,17 @@ class SubTable(Generic[ModelledTable], BaseModel):
         where[self.connector] = connector_value
 
         sql, params = self.where({}, where)
-        sql = (
-            f"SELECT [{self.connector}], [{self.pivot}], [{self.field}] "
-            + "FROM [{self.model.table}] WHERE "
-            + sql
+        sql = self.statement(
+            ("pivot", sql),
+            lambda: f"SELECT [{self.connector}], [{self.pivot}], [{self.field}] "
+            f"FROM [{self.model.table}] WHERE {sql}",
         )
 
-        _LOGGER.debug(sql)
-        _LOGGER.debug(params)
-
-        cursor.execute(sql, params)
-
-        result: Dict[int, Dict[PrimitiveTypes, PrimitiveTypes]] = dict(
-            zip(connector_value, [{}] * len(connector_value))
-        )
+        result: Dict[int, Dict[PrimitiveTypes, PrimitiveTypes]] = {
+            connected: {} for connected in connector_value
+        }
 
-        for connected, key, value in cursor.fetchall():
+        for connected, key, value in self.fetch(cursor, "select_pivot", sql, params):
             result[connected][key] = value
 
         return result
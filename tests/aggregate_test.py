@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# vim: fileencoding=utf-8 expandtab ts=4 nospell
+
+# SPDX-FileCopyrightText: 2020-2021 Benedict Harcourt <ben.harcourt@harcourtprogramming.co.uk>
+#
+# SPDX-License-Identifier: BSD-2-Clause
+
+"""Tests for ORM: counts and aggregates"""
+
+from __future__ import annotations
+
+from typing import Any, Optional, Tuple
+
+import dataclasses
+
+import orm
+
+from orm import hooks
+from tests.database import DatabaseTest
+from tests.models import Note, Person, Reader
+
+
+@dataclasses.dataclass
+class Score(orm.Table["Score"]):
+    """Example table with numbers to aggregate"""
+
+    person: Person
+    game: str
+    points: int
+    score_id: Optional[int] = None
+
+
+class AggregateTest(DatabaseTest):
+    """Tests for count, exists and the aggregate functions"""
+
+    tables: Tuple[Any, ...] = (Reader, Score)
+
+    def setUp(self) -> None:
+        super().setUp()
+
+        self.people = [Person(name) for name in ("alice", "bob", "carol")]
+        Person.model(self.cursor).store_many(self.people)
+
+        alice, bob, _ = self.people
+        self.scores = [
+            Score(alice, "chess", 3),
+            Score(alice, "go", 5),
+            Score(bob, "chess", 7),
+            Score(bob, "chess", 1),
+        ]
+        Score.model(self.cursor).store_many(self.scores)
+
+        self.notes = [Note(alice, f"note {i}") for i in range(3)]
+        Note.model(self.cursor).store_many(self.notes)
+
+        for note in self.notes:
+            Reader.model(self.cursor).store(alice, note)
+
+        Reader.model(self.cursor).store(bob, self.notes[0])
+
+    def test_count(self) -> None:
+        """Counts use the same filters as search, including none at all"""
+
+        model = Score.model(self.cursor)
+
+        self.assertEqual(4, model.count())
+        self.assertEqual(3, model.count(game="chess"))
+        self.assertEqual(2, model.count(person=self.people[1], game="chess"))
+        self.assertEqual(0, model.count(person=self.people[2]))
+        self.assertEqual(
+            len(model.search(game=["go", "chess"])), model.count(game=["go", "chess"])
+        )
+
+    def test_exists(self) -> None:
+        """exists is True only when a record matches"""
+
+        model = Score.model(self.cursor)
+
+        self.assertTrue(model.exists())
+        self.assertTrue(model.exists(game="go"))
+        self.assertFalse(model.exists(person=self.people[2]))
+
+    def test_aggregates(self) -> None:
+        """sum, min and max are computed over the matching records"""
+
+        model = Score.model(self.cursor)
+
+        self.assertEqual(16, model.sum("points"))
+        self.assertEqual(11, model.sum("points", game="chess"))
+        self.assertEqual(0, model.sum("points", game="missing"))
+        self.assertEqual(1, model.min("points"))
+        self.assertEqual(5, model.max("points", person=self.people[0]))
+        self.assertIsNone(model.max("points", game="missing"))
+        self.assertEqual(4.0, model.aggregate("avg", "points", person=self.people[0]))
+
+        with self.assertRaises(ValueError):
+            model.aggregate("median", "points")
+
+        with self.assertRaises(ValueError):
+            model.sum("missing")
+
+    def test_count_by(self) -> None:
+        """Grouped counts are keyed by the value, or the ID of foreign objects"""
+
+        model = Score.model(self.cursor)
+
+        self.assertEqual({"chess": 3, "go": 1}, model.count_by("game"))
+        self.assertEqual({1: 1, 2: 2}, model.count_by("person", game="chess"))
+        self.assertEqual({}, model.count_by("game", points=100))
+
+    def test_join_counts(self) -> None:
+        """Join tables count the records on the other side, optionally filtered"""
+
+        readers = Reader.model(self.cursor)
+        alice, bob, carol = self.people
+
+        self.assertEqual(3, readers.count_left(alice))
+        self.assertEqual(1, readers.count_left(bob))
+        self.assertEqual(0, readers.count_left(carol))
+        self.assertEqual(1, readers.count_left(alice, text="note 2"))
+        self.assertEqual(2, readers.count_right(self.notes[0]))
+        self.assertEqual(1, readers.count_right(self.notes[0], name="bob"))
+
+        with self.assertRaises(Exception):
+            readers.count_left(self.notes[0])  # type: ignore
+
+    def test_no_records_loaded(self) -> None:
+        """Counts and aggregates run a single statement, and read no records"""
+
+        metrics = hooks.Metrics()
+        hooks.install(metrics)
+        self.addCleanup(hooks.uninstall, metrics)
+
+        model = Score.model(self.cursor)
+        model.count(game="chess")
+        model.max("points")
+        Reader.model(self.cursor).count_left(self.people[0], text="note 1")
+
+        self.assertEqual(
+            {("Score", "count"), ("Score", "aggregate"), ("Reader", "count_left")},
+            set(metrics.methods),
+        )
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+# vim: fileencoding=utf-8 expandtab ts=4 nospell
+
+# SPDX-FileCopyrightText: 2020-2021 Benedict Harcourt <ben.harcourt@harcourtprogramming.co.uk>
+#
+# SPDX-License-Identifier: BSD-2-Clause
+
+"""Tests for ORM: the asyncio interface"""
+
+# pylint: disable=protected-access
+
+from __future__ import annotations
+
+from typing import Any, Callable, Coroutine, Iterator, List
+
+import asyncio
+import functools
+import os
+import sqlite3
+import tempfile
+import time
+import unittest
+
+import orm
+import orm.table
+
+from orm.aio import AsyncDatabase
+from tests.models import Note, Person, Reader
+
+
+def run_async(test: Callable[[Any], Coroutine[Any, Any, None]]) -> Callable[[Any], None]:
+    """Runs a coroutine test in an event loop of its own"""
+
+    @functools.wraps(test)
+    def _run(self: Any) -> None:
+        asyncio.run(test(self))
+
+    return _run
+
+
+class AsyncDatabaseTest(unittest.TestCase):
+    """Tests for the AsyncDatabase and its models"""
+
+    def setUp(self) -> None:
+        handle, self.path = tempfile.mkstemp(suffix=".db")
+        os.close(handle)
+
+        for table in (Person, Note):
+            orm.table._get_model(table).created = False
+
+        self.database = AsyncDatabase(self.path, threads=2, setup=[orm.wal_mode])
+
+        self.people = self.database.model(Person)
+        self.notes = self.database.model(Note)
+
+        self.alice = Person("alice")
+        asyncio.run(self.populate())
+
+    async def populate(self) -> None:
+        """Creates the tables, and stores the first person"""
+
+        await self.database.run(Reader.create_table)
+        await self.people.store(self.alice)
+
+    def tearDown(self) -> None:
+        self.database.close()
+        os.unlink(self.path)
+
+    @run_async
+    async def test_store_and_get(self) -> None:
+        """Records can be written and read back"""
+
+        note = Note(self.alice, "hello")
+
+        self.assertTrue(await self.notes.store(note))
+        self.assertEqual(note, await self.notes.get(note.note_id))  # type: ignore
+        self.assertEqual([note], await self.notes.search(person=self.alice))
+
+    @run_async
+    async def test_streaming(self) -> None:
+        """Records can be streamed, and a stream can be left early"""
+
+        await self.notes.store_many(Note(self.alice, str(i)) for i in range(10))
+
+        texts = [note.text async for note in self.notes.iter_all(window=3)]
+        self.assertEqual([str(i) for i in range(10)], texts)
+
+        # Leave two streams early, which would use both threads if they
+        # were not released.
+        for _ in range(2):
+            async for note in self.notes.iter_search(window=2, person=self.alice):
+                self.assertEqual("0", note.text)
+                break
+
+        self.assertEqual(10, len(await self.notes.all()))
+
+    @run_async
+    async def test_queries_during_stream(self) -> None:
+        """Streams do not hold a database thread, so other work can run meanwhile"""
+
+        database = AsyncDatabase(self.path, threads=1)
+        self.addCleanup(database.close)
+
+        await self.notes.store_many(Note(self.alice, str(i)) for i in range(3))
+
+        async for note in database.model(Note).iter_all(window=1):
+            person = await asyncio.wait_for(database.model(Person).get(1), 5)
+            self.assertEqual(self.alice, person)
+            self.assertEqual(self.alice, note.person)
+
+    @run_async
+    async def test_stream_errors(self) -> None:
+        """Errors reading a stream are raised to the loop"""
+
+        def fail(_: sqlite3.Cursor) -> Iterator[int]:
+            yield 1
+            raise RuntimeError()
+
+        with self.assertRaises(RuntimeError):
+            _ = [x async for x in self.database.stream(fail, 1)]
+
+    @run_async
+    async def test_slow_work_does_not_block(self) -> None:
+        """Other coroutines, and other queries, run during a slow query"""
+
+        def slow(cursor: sqlite3.Cursor) -> None:
+            cursor.execute("SELECT 1")
+            time.sleep(0.3)
+
+        events: List[str] = []
+        work = asyncio.ensure_future(self.database.run(slow))
+
+        await asyncio.sleep(0.05)
+        events.append("loop")
+        self.assertIsNotNone(await self.people.get(1))
+        events.append("query")
+
+        await work
+        events.append("slow")
+
+        self.assertEqual(["loop", "query", "slow"], events)
+
+    @run_async
+    async def test_failed_work_rolls_back(self) -> None:
+        """A unit of work which raises has no effect"""
+
+        def fail(cursor: sqlite3.Cursor) -> None:
+            Person.model(cursor).store(Person("bob"))
+            raise RuntimeError()
+
+        with self.assertRaises(RuntimeError):
+            await self.database.run(fail)
+
+        self.assertEqual([self.alice], await self.people.all())
+
+    @run_async
+    async def test_join_model(self) -> None:
+        """Join models have awaitable functions"""
+
+        readers = self.database.join(Reader)
+        note = Note(self.alice, "hello")
+        await self.notes.store(note)
+
+        self.assertTrue(await readers.store(self.alice, note))
+        self.assertEqual([note], await readers.of_left(self.alice))
+        self.assertEqual([self.alice], await readers.from_right(text="hello"))
+
+        await readers.clear_right(note)
+        self.assertEqual([], await readers.ids_for_left(self.alice))
+
+    @run_async
+    async def test_lazy_loading(self) -> None:
+        """Lazy loading is refused, as proxies would be loaded on the event loop"""
+
+        model = self.database.model(Note, strategy="lazy")
+
+        with self.assertRaises(ValueError):
+            await model.all()
+
+        with self.assertRaises(ValueError):
+            model.iter_all()
+
+        with self.assertRaises(ValueError):
+            model.iter_search(person=self.alice)
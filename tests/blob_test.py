@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# vim: fileencoding=utf-8 expandtab ts=4 nospell
+
+# SPDX-FileCopyrightText: 2020-2021 Benedict Harcourt <ben.harcourt@harcourtprogramming.co.uk>
+#
+# SPDX-License-Identifier: BSD-2-Clause
+
+"""Tests for ORM: incremental BLOB reads and writes"""
+
+from __future__ import annotations
+
+from typing import Any, Optional, Tuple
+
+import dataclasses
+import io
+import sqlite3
+import unittest
+
+import orm
+
+from orm.blob import CHUNK_SIZE
+from tests.database import DatabaseTest
+
+
+@orm.defer("data")
+@dataclasses.dataclass
+class Attachment(orm.Table["Attachment"]):
+    """Example table with a large bytes field"""
+
+    name: str
+    data: bytes
+    attachment_id: Optional[int] = None
+
+
+PAYLOAD = bytes(range(256)) * (CHUNK_SIZE // 64)
+
+
+@unittest.skipUnless(hasattr(sqlite3.Connection, "blobopen"), "needs Python 3.11")
+class BlobTest(DatabaseTest):
+    """Tests for streaming bytes fields"""
+
+    tables: Tuple[Any, ...] = (Attachment,)
+
+    def setUp(self) -> None:
+        super().setUp()
+
+        self.model = Attachment.model(self.cursor)
+        self.model.store(Attachment("big", PAYLOAD))
+
+    def test_chunks(self) -> None:
+        """Reads are split into chunks of the requested size"""
+
+        with self.model.blob(1, "data") as blob:
+            chunks = list(blob.chunks(CHUNK_SIZE))
+
+        self.assertEqual(len(PAYLOAD), sum(len(chunk) for chunk in chunks))
+        self.assertEqual(4, len(chunks))
+        self.assertEqual(PAYLOAD, b"".join(chunks))
+
+    def test_read_into(self) -> None:
+        """Reads can fill a caller's buffer, from any offset"""
+
+        buffer = bytearray(1000)
+
+        with self.model.blob(1, "data") as blob:
+            self.assertEqual(1000, blob.read_into(buffer, 10))
+            self.assertEqual(PAYLOAD[10:1010], buffer)
+            self.assertEqual(5, blob.read_into(buffer, len(PAYLOAD) - 5))
+
+    def test_copy(self) -> None:
+        """Fields can be copied into file objects"""
+
+        target = io.BytesIO()
+
+        self.assertEqual(len(PAYLOAD), self.model.copy_blob(1, "data", target))
+        self.assertEqual(PAYLOAD, target.getvalue())
+
+    def test_store(self) -> None:
+        """Fields can be replaced from file objects or chunks, of a new size"""
+
+        self.assertEqual(
+            200_000, self.model.store_blob(1, "data", io.BytesIO(b"a" * 200_000), 200_000)
+        )
+        self.assertEqual(b"a" * 200_000, self.model.get(1, defer=False).data)  # type: ignore
+
+        self.model.store_blob(1, "data", [b"ab", b"cd"], 4)
+        self.assertEqual(b"abcd", self.model.get(1, defer=False).data)  # type: ignore
+
+    def test_store_wrong_size(self) -> None:
+        """Sources which do not supply the given size are an error"""
+
+        with self.assertRaises(ValueError):
+            self.model.store_blob(1, "data", [b"ab"], 4)
+
+        with self.assertRaises(ValueError):
+            self.model.store_blob(1, "data", io.BytesIO(b"abcdef"), 4)
+
+    def test_write(self) -> None:
+        """Opened fields can be written in place, but not resized"""
+
+        with self.model.blob(1, "data", readonly=False) as blob:
+            blob.write(b"xyz", 1)
+
+            with self.assertRaises(ValueError):
+                blob.write(b"xyz", len(PAYLOAD) - 1)
+
+        record = self.model.get(1, defer=False)
+
+        assert record
+        self.assertEqual(PAYLOAD[:1] + b"xyz" + PAYLOAD[4:], record.data)
+
+    def test_errors(self) -> None:
+        """Only bytes fields of existing rows can be used"""
+
+        with self.assertRaises(ValueError):
+            self.model.blob(1, "name")
+
+        with self.assertRaises(LookupError):
+            self.model.store_blob(2, "data", [b""], 0)
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# vim: fileencoding=utf-8 expandtab ts=4 nospell
+
+# SPDX-FileCopyrightText: 2020-2021 Benedict Harcourt <ben.harcourt@harcourtprogramming.co.uk>
+#
+# SPDX-License-Identifier: BSD-2-Clause
+
+"""Tests for ORM: generated hydrators and extractors"""
+
+# pylint: disable=protected-access
+
+from __future__ import annotations
+
+from typing import Any, List
+
+import unittest
+
+import orm.table
+
+from orm.model import TableModel
+
+from tests.models import Note, Person
+from tests.submodels import MainTable
+
+
+class CodegenTest(unittest.TestCase):
+    """Tests for the generated functions of a model"""
+
+    def test_hydrator(self) -> None:
+        """Rows are read by position, and foreign objects taken from the values"""
+
+        model: TableModel[Note] = orm.table._get_model(Note)
+        alice = Person("alice", 1)
+        row: List[Any] = [None] * len(model.columns)
+
+        for field, value in (("text", "hello"), ("note_id", 3), ("person_id", 1)):
+            row[model.columns.index(field)] = value
+
+        self.assertEqual(Note(alice, "hello", None, 3), model.hydrator(row, [alice, None]))
+
+    def test_hydrator_submodels(self) -> None:
+        """Sub-table values follow the foreign objects"""
+
+        record = orm.table._get_model(MainTable).hydrator((1,), (["a"], {"b": "c"}))
+
+        self.assertEqual((["a"], {"b": "c"}), (record.data, record.datadict))
+
+    def test_extractor(self) -> None:
+        """Foreign objects are written as their IDs; IDs and None as-is"""
+
+        model: TableModel[Note] = orm.table._get_model(Note)
+        alice = Person("alice", 1)
+        parent = Note(alice, "first", None, 2)
+
+        self.assertEqual(
+            {"person_id": 1, "text": "reply", "parent": 2, "note_id": None},
+            model.extractor(Note(alice, "reply", parent)),
+        )
+        self.assertEqual(
+            {"person_id": 5, "text": "hello", "parent": None, "note_id": 3},
+            model.extractor(Note(5, "hello", None, 3)),  # type: ignore
+        )
+
+    def test_reset(self) -> None:
+        """The generated functions are discarded when the model is reset"""
+
+        model: TableModel[Person] = orm.table._get_model(Person)
+        hydrator = model.hydrator
+
+        self.assertIs(hydrator, model.hydrator)
+        model.reset()
+        self.assertIsNot(hydrator, model.hydrator)
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# vim: fileencoding=utf-8 expandtab ts=4 nospell
+
+# SPDX-FileCopyrightText: 2020-2021 Benedict Harcourt <ben.harcourt@harcourtprogramming.co.uk>
+#
+# SPDX-License-Identifier: BSD-2-Clause
+
+"""Tests for ORM: compact (slotted) records"""
+
+from __future__ import annotations
+
+from typing import Optional
+
+import dataclasses
+import pickle
+
+import orm
+
+from orm.lazy import LazyRecord
+from tests.database import NoteTest
+from tests.models import Note
+
+
+@orm.compact
+@dataclasses.dataclass
+class Sample(orm.Table["Sample"]):
+    """Example table which is compact by default"""
+
+    value: int
+    sample_id: Optional[int] = None
+
+
+class CompactTest(NoteTest):
+    """Tests for loading compact records"""
+
+    tables = (Note, Sample)
+
+    def setUp(self) -> None:
+        super().setUp()
+
+        self.first = Note(self.alice, "first")
+        self.reply = Note(self.alice, "reply", self.first)
+        Note.model(self.cursor).store(self.first)
+        Note.model(self.cursor).store(self.reply)
+
+    def test_records(self) -> None:
+        """Compact records have no dict, but behave as records of the table"""
+
+        reply = Note.model(self.cursor, compact=True).get(2)
+
+        self.assertIsInstance(reply, Note)
+        self.assertIsNot(Note, type(reply))
+        self.assertFalse(hasattr(reply, "__dict__"))
+        self.assertEqual(self.reply, reply)
+        self.assertEqual(reply, self.reply)
+        self.assertEqual(repr(self.reply), repr(reply))
+
+        with self.assertRaises(AttributeError):
+            reply.other = 1  # type: ignore
+
+    def test_foreign_objects(self) -> None:
+        """Foreign objects are compact, and filled in as usual"""
+
+        for strategy in ("select", "join", "lazy"):
+            with self.subTest(strategy=strategy):
+                model = Note.model(self.cursor, strategy=strategy, compact=True)
+                reply = model.get(2)
+
+                assert reply and reply.parent
+                person = reply.person
+
+                if isinstance(person, LazyRecord):
+                    person = person.resolve()
+
+                self.assertEqual("first", reply.parent.text)
+                self.assertFalse(hasattr(person, "__dict__"))
+
+    def test_store(self) -> None:
+        """Compact records can be changed and stored"""
+
+        notes = Note.model(self.cursor, compact=True)
+        reply = notes.get(2)
+
+        assert reply
+        reply.text = "changed"
+        notes.store(reply)
+
+        self.assertEqual(["changed"], [note.text for note in notes.search(parent=self.first)])
+
+    def test_table_default(self) -> None:
+        """Tables decorated with orm.compact are compact unless a query says not"""
+
+        samples = Sample.model(self.cursor)
+        samples.store(Sample(1))
+
+        self.assertFalse(hasattr(samples.get(1), "__dict__"))
+        self.assertTrue(hasattr(Sample.model(self.cursor, compact=False).get(1), "__dict__"))
+        self.assertFalse(hasattr(next(samples.iter_all()), "__dict__"))
+
+    def test_identity_map(self) -> None:
+        """Compact records can be held in identity maps"""
+
+        identity = orm.IdentityMap()
+        notes = Note.model(self.cursor, identity, compact=True)
+
+        self.assertIs(notes.get(1), notes.get(1))
+
+    def test_pickle(self) -> None:
+        """Compact records can be pickled, as for parallel scans"""
+
+        reply = Note.model(self.cursor, compact=True).get(2)
+        copy = pickle.loads(pickle.dumps(reply))
+
+        self.assertEqual(reply, copy)
+        self.assertIs(type(reply), type(copy))
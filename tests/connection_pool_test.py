@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# vim: fileencoding=utf-8 expandtab ts=4 nospell
+
+# SPDX-FileCopyrightText: 2020-2021 Benedict Harcourt <ben.harcourt@harcourtprogramming.co.uk>
+#
+# SPDX-License-Identifier: BSD-2-Clause
+
+"""Tests for ORM: sharing a database between threads with a ConnectionPool"""
+
+# pylint: disable=protected-access
+
+from __future__ import annotations
+
+from typing import List
+
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+
+import orm
+import orm.table
+
+from tests.models import Note, Person
+
+
+class ConnectionPoolTest(unittest.TestCase):
+    """Tests for the ConnectionPool and pooled models"""
+
+    def setUp(self) -> None:
+        handle, self.database = tempfile.mkstemp(suffix=".db")
+        os.close(handle)
+
+        self.setups: List[sqlite3.Connection] = []
+        self.pool = orm.ConnectionPool(
+            self.database, size=2, setup=[orm.wal_mode, self.setups.append], wait=0.1
+        )
+
+        for table in (Person, Note):
+            orm.table._get_model(table).created = False
+
+        with self.pool.cursor() as cursor:
+            Note.create_table(cursor)
+
+    def tearDown(self) -> None:
+        self.pool.close()
+        os.unlink(self.database)
+
+    def test_nested_borrows_share_a_connection(self) -> None:
+        """A thread re-uses the connection it has already borrowed"""
+
+        with self.pool.cursor() as outer:
+            with self.pool.cursor() as inner:
+                self.assertIs(outer, inner)
+
+        self.assertEqual(1, len(self.setups))
+        self.assertEqual("wal", self.setups[0].execute("PRAGMA journal_mode").fetchone()[0])
+
+    def test_pool_size_is_limited(self) -> None:
+        """Borrowing from a pool with no free connections times out"""
+
+        held = threading.Barrier(3)
+        release = threading.Event()
+
+        def hold_connection() -> None:
+            with self.pool.cursor():
+                held.wait()
+                release.wait()
+
+        threads = [threading.Thread(target=hold_connection) for _ in range(2)]
+
+        for thread in threads:
+            thread.start()
+
+        held.wait()
+
+        try:
+            with self.assertRaises(TimeoutError):
+                with self.pool.cursor():
+                    pass
+        finally:
+            release.set()
+
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(2, len(self.setups))
+
+    def test_pooled_model_across_threads(self) -> None:
+        """Pooled models can be used from many threads at once"""
+
+        people = Person.pooled(self.pool)
+        errors: List[BaseException] = []
+
+        def work(offset: int) -> None:
+            try:
+                for i in range(10):
+                    people.store(Person(f"p{offset}-{i}"))
+                    people.search(name=f"p{offset}-{i}")
+            except BaseException as error:  # pylint: disable=broad-except
+                errors.append(error)
+
+        threads = [threading.Thread(target=work, args=(i,)) for i in range(4)]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual([], errors)
+        self.assertEqual(40, len(people.all()))
+
+    def test_unit_of_work_rolls_back(self) -> None:
+        """Changes made in a failed unit of work are not kept"""
+
+        people = Person.pooled(self.pool)
+        notes = Note.pooled(self.pool)
+
+        with self.assertRaises(RuntimeError):
+            with self.pool.unit_of_work():
+                alice = Person("alice")
+                people.store(alice)
+                notes.store(Note(alice, "hello"))
+
+                raise RuntimeError()
+
+        with self.pool.unit_of_work():
+            people.store(Person("bob"))
+
+        self.assertEqual(["bob"], [person.name for person in people.all()])
+        self.assertEqual([], notes.all())
+
+    def test_pooled_lazy_loading(self) -> None:
+        """Lazy loading is refused, as proxies would outlive their connection"""
+
+        model = Note.pooled(self.pool, strategy="lazy")
+
+        with self.assertRaises(ValueError):
+            model.all()
+
+        with self.assertRaises(ValueError):
+            model.iter_all()
+
+        with self.assertRaises(ValueError):
+            model.iter_search(text="hello")
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# vim: fileencoding=utf-8 expandtab ts=4 nospell
+
+# SPDX-FileCopyrightText: 2020-2021 Benedict Harcourt <ben.harcourt@harcourtprogramming.co.uk>
+#
+# SPDX-License-Identifier: BSD-2-Clause
+
+"""Base test case for tests against a new SQLite database"""
+
+# pylint: disable=protected-access
+
+from __future__ import annotations
+
+from typing import Any, List, Tuple
+
+import functools
+import sqlite3
+import unittest
+
+import orm.table
+
+from orm.model import TableModel
+
+from tests.models import Note, Person
+
+
+def reset_tables() -> None:
+    """Marks every table as not yet created, as each test has a new database"""
+
+    for model in orm.table._MODELS.values():
+        # Models which failed to build are left as a placeholder
+        if isinstance(model, TableModel):
+            model.created = False
+
+
+class DatabaseTest(unittest.TestCase):
+    """Test case with a new in-memory database, with `tables` created, for each test"""
+
+    tables: Tuple[Any, ...] = ()
+
+    conn: sqlite3.Connection
+    cursor: sqlite3.Cursor
+
+    def setUp(self) -> None:
+        self.conn = sqlite3.connect(":memory:")
+        self.cursor = self.conn.cursor()
+
+        reset_tables()
+
+        for table in self.tables:
+            table.create_table(self.cursor)
+
+    def tearDown(self) -> None:
+        self.conn.close()
+
+    def trace(self) -> List[str]:
+        """Records the SQL statements run from now on, in the list returned"""
+
+        statements: List[str] = []
+
+        # Python 3.7 requires a hashable callback, which list.append is not.
+        self.conn.set_trace_callback(functools.partial(list.append, statements))
+
+        return statements
+
+
+class NoteTest(DatabaseTest):
+    """Test case with the Note table, and a stored person, alice, to write notes as"""
+
+    tables: Tuple[Any, ...] = (Note,)
+
+    alice: Person
+
+    def setUp(self) -> None:
+        super().setUp()
+
+        self.alice = Person("alice")
+        Person.model(self.cursor).store(self.alice)
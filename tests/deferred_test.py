@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+# vim: fileencoding=utf-8 expandtab ts=4 nospell
+
+# SPDX-FileCopyrightText: 2020-2021 Benedict Harcourt <ben.harcourt@harcourtprogramming.co.uk>
+#
+# SPDX-License-Identifier: BSD-2-Clause
+
+"""Tests for ORM: deferred fields"""
+
+from __future__ import annotations
+
+from typing import Any, Optional, Tuple
+
+import dataclasses
+import pickle
+
+import orm
+
+from orm import hooks
+from tests.database import NoteTest
+from tests.models import Person
+
+
+@orm.defer("body")
+@dataclasses.dataclass
+class Article(orm.Table["Article"]):
+    """Example table with a wide field which is deferred by default"""
+
+    author: Person
+    title: str
+    body: str
+    words: int = 0
+    article_id: Optional[int] = None
+
+
+@dataclasses.dataclass
+class Comment(orm.Table["Comment"]):
+    """Example table which references the table with deferred fields"""
+
+    article: Article
+    text: str
+    comment_id: Optional[int] = None
+
+
+@orm.defer("body")
+@dataclasses.dataclass
+class Reply(orm.Table["Reply"]):
+    """Example table which refers to itself, with a deferred field"""
+
+    text: str
+    body: str
+    parent: Optional[Reply] = None
+    reply_id: Optional[int] = None
+
+
+class DeferredTest(NoteTest):
+    """Tests for loading records with deferred fields"""
+
+    tables: Tuple[Any, ...] = (Comment, Reply)
+
+    def setUp(self) -> None:
+        super().setUp()
+
+        self.articles = [
+            Article(self.alice, f"title {i}", f"body {i}", i) for i in range(1, 4)
+        ]
+        Article.model(self.cursor).store_many(self.articles)
+
+        Comment.model(self.cursor).store(Comment(self.articles[0], "nice"))
+
+        self.metrics = hooks.Metrics()
+
+    def statements(self, method: str) -> int:
+        """The number of statements run for a method of Article"""
+
+        metrics = self.metrics.methods.get(("Article", method))
+
+        return metrics.statements if metrics else 0
+
+    def install_metrics(self) -> None:
+        """Starts counting statements"""
+
+        hooks.install(self.metrics)
+        self.addCleanup(hooks.uninstall, self.metrics)
+
+    def test_loaded_on_first_read(self) -> None:
+        """Deferred fields are not selected, and are loaded for the whole batch at once"""
+
+        self.install_metrics()
+        articles = Article.model(self.cursor).all()
+
+        self.assertEqual(0, self.statements("load_deferred"))
+        self.assertNotIn("body", vars(articles[0]))
+        self.assertEqual("body 2", articles[1].body)
+        self.assertEqual(["body 1", "body 2", "body 3"], [x.body for x in articles])
+        self.assertEqual(1, self.statements("load_deferred"))
+        self.assertEqual(self.articles, articles)
+        self.assertIsInstance(articles[0], Article)
+
+    def test_only(self) -> None:
+        """`only` defers every other field, apart from the ID and foreign objects"""
+
+        article = Article.model(self.cursor).get(1, only=["title"])
+
+        assert article
+        self.assertEqual({"author", "title", "article_id"}, set(vars(article)))
+        self.assertEqual(self.alice, article.author)
+        self.assertEqual(1, article.words)
+
+    def test_defer_options(self) -> None:
+        """Queries can defer other fields, or load the table's deferred fields"""
+
+        model = Article.model(self.cursor)
+        loaded = model.search(title="title 1", defer=False)
+        extra = model.get_many(1, 2, defer=["words"])
+
+        self.assertIn("body", vars(loaded[0]))
+        self.assertEqual(Article, type(loaded[0]))
+        self.assertNotIn("words", vars(extra[1]))
+        self.assertNotIn("body", vars(extra[1]))
+        self.assertEqual(2, extra[2].words)
+
+        with self.assertRaises(ValueError):
+            model.get(1, defer=["article_id"])
+
+        with self.assertRaises(ValueError):
+            model.get(1, only=["missing"])
+
+    def test_foreign_objects(self) -> None:
+        """Foreign objects use their table's deferred fields with every strategy"""
+
+        for strategy in ("select", "join", "lazy"):
+            with self.subTest(strategy=strategy):
+                comment = Comment.model(self.cursor, strategy=strategy).get(1)
+
+                assert comment
+                self.assertEqual("body 1", comment.article.body)
+
+                comment = Comment.model(self.cursor, strategy=strategy).get(1, defer=False)
+
+                assert comment
+                self.assertIn("body", vars(comment.article))
+
+    def test_self_reference(self) -> None:
+        """Records which are also foreign objects of the call have its fields deferred"""
+
+        root = Reply("root", "body 1")
+        Reply.model(self.cursor).store(root)
+        Reply.model(self.cursor).store(Reply("reply", "body 2", root))
+
+        for strategy in ("select", "join"):
+            with self.subTest(strategy=strategy):
+                replies = Reply.model(self.cursor, strategy=strategy).all(defer=["text"])
+
+                self.assertIs(replies[0], replies[1].parent)
+                self.assertEqual(
+                    [{"parent", "reply_id"}] * 2, [set(vars(x)) for x in replies]
+                )
+                self.assertEqual(["root", "reply"], [x.text for x in replies])
+
+    def test_store(self) -> None:
+        """Records can be stored whether or not the deferred fields were read"""
+
+        model = Article.model(self.cursor)
+        first, second = model.get_many(1, 2).values()
+
+        first.title = "changed"
+        model.store(first)
+        second.body = "new body"
+        model.store(second)
+
+        stored = model.get_many(1, 2, defer=False)
+
+        self.assertEqual(("changed", "body 1"), (stored[1].title, stored[1].body))
+        self.assertEqual("new body", stored[2].body)
+
+    def test_compact(self) -> None:
+        """Compact records can have deferred fields"""
+
+        article = Article.model(self.cursor, compact=True).get(3)
+
+        assert article
+        self.assertFalse(hasattr(article, "__dict__"))
+        self.assertEqual("body 3", article.body)
+        self.assertEqual(self.articles[2], article)
+
+    def test_deleted(self) -> None:
+        """Reading a deferred field of a deleted row is an error"""
+
+        article = Article.model(self.cursor).get(1)
+        self.cursor.execute("DELETE FROM [Article] WHERE [article_id] = 1")
+
+        with self.assertRaises(LookupError):
+            _ = article.body  # type: ignore
+
+    def test_identity_map(self) -> None:
+        """Records already in the identity map are not replaced"""
+
+        identity = orm.IdentityMap()
+        model = Article.model(self.cursor, identity)
+        loaded = model.get(1, defer=False)
+
+        self.assertIs(loaded, model.get(1))
+        self.assertIs(loaded, model.all()[0])
+
+    def test_pickle(self) -> None:
+        """Records with deferred fields are pickled as normal records"""
+
+        for compact in (False, True):
+            with self.subTest(compact=compact):
+                article = Article.model(self.cursor, compact=compact).get(2)
+                copy = pickle.loads(pickle.dumps(article))
+
+                self.assertEqual(self.articles[1], copy)
+                self.assertEqual(compact, not hasattr(copy, "__dict__"))
+                self.assertNotIn("_orm_batch", getattr(copy, "__dict__", {}))
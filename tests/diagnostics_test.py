@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# vim: fileencoding=utf-8 expandtab ts=4 nospell
+
+# SPDX-FileCopyrightText: 2020-2021 Benedict Harcourt <ben.harcourt@harcourtprogramming.co.uk>
+#
+# SPDX-License-Identifier: BSD-2-Clause
+
+"""Tests for ORM: query plan diagnostics"""
+
+from __future__ import annotations
+
+from orm import diagnostics
+from tests.database import NoteTest
+from tests.models import Note
+
+
+class DiagnosticsTest(NoteTest):
+    """Tests for capturing the plans of generated statements"""
+
+    def test_plans_are_attributed(self) -> None:
+        """Each distinct statement is explained once, under its model and method"""
+
+        notes = Note.model(self.cursor)
+
+        with diagnostics.capture() as plans:
+            notes.store(Note(self.alice, "hello"))
+            notes.search(text="hello")
+            notes.search(text="goodbye")
+            notes.search(person=self.alice)
+
+        self.assertIsNone(diagnostics.active())
+
+        methods = sorted((model, method) for model, method, _ in plans.plans)
+        self.assertEqual(
+            [
+                ("Note", "get_many"),
+                ("Note", "search"),
+                ("Note", "search"),
+                ("Note", "store"),
+                ("Person", "get_many"),
+            ],
+            methods,
+        )
+
+    def test_full_scans_are_flagged(self) -> None:
+        """Searches on unindexed columns are reported, indexed ones are not"""
+
+        notes = Note.model(self.cursor)
+
+        with diagnostics.capture() as plans:
+            notes.search(text="hello")
+            notes.search(person=self.alice)
+            notes.get_many(1, 2, 3)
+
+        problems = plans.problems()
+
+        self.assertEqual(1, len(problems))
+        self.assertEqual("search", problems[0].method)
+        self.assertIn("[text] = :text", problems[0].sql)
+        self.assertTrue(problems[0].scans)
+        self.assertIn("Note.search", plans.report())
+
+    def test_temp_btrees_are_flagged(self) -> None:
+        """Plans which sort or de-duplicate with a temporary B-tree are reported"""
+
+        plan = diagnostics.QueryPlan("Test", "sort", "", ["USE TEMP B-TREE FOR ORDER BY"])
+
+        self.assertTrue(plan.flagged)
+        self.assertEqual([], plan.scans)
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# vim: fileencoding=utf-8 expandtab ts=4 nospell
+
+# SPDX-FileCopyrightText: 2020-2021 Benedict Harcourt <ben.harcourt@harcourtprogramming.co.uk>
+#
+# SPDX-License-Identifier: BSD-2-Clause
+
+"""Tests for ORM: instrumentation hooks"""
+
+from __future__ import annotations
+
+from typing import List, Optional, Tuple
+
+import sqlite3
+
+from orm import hooks
+from tests.database import NoteTest
+from tests.models import Note
+
+
+class Recorder(hooks.Hook):
+    """Hook which keeps the statement_end events it receives"""
+
+    ends: List[Tuple[str, str, Optional[BaseException]]]
+
+    def __init__(self) -> None:
+        self.ends = []
+
+    def statement_end(
+        self, statement: hooks.Statement, elapsed: float, error: Optional[BaseException]
+    ) -> None:
+        self.ends.append((statement.model, statement.method, error))
+
+
+class HooksTest(NoteTest):
+    """Tests for installing hooks, and the provided hooks"""
+
+    def test_metrics(self) -> None:
+        """Statements, rows and hydrated records are counted per method"""
+
+        notes = Note.model(self.cursor)
+        notes.store_many([Note(self.alice, "a"), Note(self.alice, "b")])
+
+        with hooks.installed(hooks.Metrics()) as hook:
+            notes.search(person=self.alice)
+            notes.search(text="a")
+            list(notes.iter_all(window=1))
+
+        assert isinstance(hook, hooks.Metrics)
+
+        search = hook.methods[("Note", "search")]
+        self.assertEqual(2, search.statements)
+        self.assertEqual(3, search.rows)
+        self.assertEqual(2, sum(search.histogram))
+
+        self.assertEqual(2, hook.methods[("Note", "iter_all")].rows)
+        # The people are loaded once per search, and once per window.
+        self.assertEqual(4, hook.methods[("Person", "get_many")].statements)
+        self.assertEqual(5, hook.hydrated["Note"][0])
+        self.assertIn("Note.search", hook.report())
+
+    def test_slow_query_log(self) -> None:
+        """Statements over the threshold are logged as warnings"""
+
+        with hooks.installed(hooks.SlowQueryLog(threshold=0)):
+            with self.assertLogs("tiny-orm.slow", "WARNING") as logs:
+                Note.model(self.cursor).search(text="a")
+
+        self.assertIn("Note.search", logs.output[0])
+
+    def test_uninstalled(self) -> None:
+        """Hooks receive no events once uninstalled"""
+
+        hook = Recorder()
+        notes = Note.model(self.cursor)
+
+        with hooks.installed(hook):
+            notes.all()
+
+        notes.all()
+
+        self.assertEqual([("Note", "all", None)], hook.ends)
+        self.assertNotIn(hook, hooks.INSTALLED)
+
+    def test_errors(self) -> None:
+        """Failed statements are reported with their error"""
+
+        hook = Recorder()
+        self.conn.execute("DROP TABLE [Note]")
+
+        with hooks.installed(hook), self.assertRaises(sqlite3.OperationalError):
+            Note.model(self.cursor).all()
+
+        self.assertIsInstance(hook.ends[0][2], sqlite3.OperationalError)
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# vim: fileencoding=utf-8 expandtab ts=4 nospell
+
+# SPDX-FileCopyrightText: 2020-2021 Benedict Harcourt <ben.harcourt@harcourtprogramming.co.uk>
+#
+# SPDX-License-Identifier: BSD-2-Clause
+
+"""Tests for ORM: the session scoped IdentityMap"""
+
+# pylint: disable=protected-access
+
+from __future__ import annotations
+
+import unittest
+
+import orm
+import orm.model
+import orm.table
+
+from tests.database import DatabaseTest
+from tests.models import Note, Person
+
+
+class IdentityMapTest(unittest.TestCase):
+    """Tests for the IdentityMap cache itself"""
+
+    def test_lru_eviction(self) -> None:
+        """A sized map keeps only the most recently used records"""
+
+        model: orm.model.TableModel[Person] = orm.table._get_model(Person)
+        identity = orm.IdentityMap(2)
+
+        identity.put(model, 1, Person("a", 1))
+        identity.put(model, 2, Person("b", 2))
+        identity.get(model, 1)
+        identity.put(model, 3, Person("c", 3))
+
+        self.assertEqual({1, 3}, set(identity.get_many(model, [1, 2, 3])))
+
+    def test_weak_references(self) -> None:
+        """An unsized map only keeps records which are still in use"""
+
+        model: orm.model.TableModel[Person] = orm.table._get_model(Person)
+        identity = orm.IdentityMap()
+        person = Person("a", 1)
+
+        identity.put(model, 1, person)
+        self.assertIs(person, identity.get(model, 1))
+
+        del person
+        self.assertIsNone(identity.get(model, 1))
+
+    def test_add_keeps_existing(self) -> None:
+        """add() returns the record already in the map"""
+
+        model: orm.model.TableModel[Person] = orm.table._get_model(Person)
+        identity = orm.IdentityMap(10)
+        person = Person("a", 1)
+
+        identity.put(model, 1, person)
+
+        self.assertIs(person, identity.add(model, 1, Person("a", 1)))
+
+
+class IdentityMapModelTest(DatabaseTest):
+    """Tests for models using an IdentityMap"""
+
+    tables = (Note,)
+
+    def setUp(self) -> None:
+        super().setUp()
+
+        people = Person.model(self.cursor)
+        notes = Note.model(self.cursor)
+
+        for i in range(10):
+            person = Person(f"person {i}")
+            people.store(person)
+
+            for j in range(5):
+                notes.store(Note(person, f"note {j}"))
+
+        self.statements = self.trace()
+
+    def test_shared_foreign_objects(self) -> None:
+        """Foreign objects are shared, and not loaded again"""
+
+        identity = orm.IdentityMap()
+        model = Note.model(self.cursor, identity)
+
+        first = model.all()
+        count = len(self.statements)
+        second = model.search(text="note 1")
+
+        self.assertEqual(10, len({id(note.person) for note in first}))
+        self.assertIs(first[5].person, second[1].person)
+        self.assertIs(first[6], second[1])
+        # Only the search itself is run; the notes and people are all known.
+        self.assertEqual(count + 1, len(self.statements))
+
+    def test_store_refreshes(self) -> None:
+        """Stored records replace those in the map"""
+
+        identity = orm.IdentityMap()
+        model = Person.model(self.cursor, identity)
+
+        replacement = Person("new name", 1)
+        model.store(replacement)
+
+        self.assertIs(replacement, model.get(1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# vim: fileencoding=utf-8 expandtab ts=4 nospell
+
+# SPDX-FileCopyrightText: 2020-2021 Benedict Harcourt <ben.harcourt@harcourtprogramming.co.uk>
+#
+# SPDX-License-Identifier: BSD-2-Clause
+
+"""Tests for ORM: JoinModel against an in-memory SQLite database"""
+
+# pylint: disable=protected-access
+
+from __future__ import annotations
+
+import sqlite3
+import unittest
+
+import orm.table
+
+from tests.models import Note, Person, Reader
+
+
+class JoinModelTest(unittest.TestCase):
+    """Tests for reading and writing mappings with a real database"""
+
+    def setUp(self) -> None:
+        self.conn = sqlite3.connect(":memory:")
+        self.cursor = self.conn.cursor()
+
+        for table in (Person, Note):
+            orm.table._get_model(table).created = False
+
+        Reader.create_table(self.cursor)
+
+        self.alice = Person("alice")
+        self.bob = Person("bob")
+        Person.model(self.cursor).store_many([self.alice, self.bob])
+
+        self.notes = [Note(self.alice, str(i)) for i in range(3)]
+        Note.model(self.cursor).store_many(self.notes)
+
+        self.model = Reader.model(self.cursor)
+
+    def tearDown(self) -> None:
+        self.conn.close()
+
+    def plan(self, sql: str) -> str:
+        """The query plan for a statement, as one string"""
+
+        self.cursor.execute(f"EXPLAIN QUERY PLAN {sql}", {"ids": 1})
+
+        return " ".join(row[-1] for row in self.cursor.fetchall())
+
+    def test_store_and_read_both_ways(self) -> None:
+        """Mappings can be read from either side, and cleared"""
+
+        self.assertTrue(self.model.store(self.alice, self.notes[0]))
+        self.assertTrue(self.model.store(self.alice, self.notes[1]))
+        self.assertTrue(self.model.store(self.bob, self.notes[1]))
+
+        self.assertEqual(self.notes[:2], self.model.of_left(self.alice))
+        self.assertEqual([self.alice, self.bob], self.model.of_right(self.notes[1]))
+
+        self.model.clear_right(self.notes[1])
+
+        self.assertEqual([1], self.model.ids_for_left(self.alice))
+        self.assertEqual([], self.model.ids_for_left(self.bob))
+
+    def test_table_layout(self) -> None:
+        """Join tables are stored without a rowid, with a reverse index"""
+
+        self.cursor.execute("SELECT [sql] FROM sqlite_master WHERE [name] = 'Reader'")
+        self.assertIn("WITHOUT ROWID", self.cursor.fetchone()[0])
+
+        left = "SELECT [note_id] FROM [Reader] WHERE [person_id] = :ids"
+        right = "SELECT [person_id] FROM [Reader] WHERE [note_id] = :ids"
+
+        self.assertIn("PRIMARY KEY", self.plan(left))
+        self.assertIn("COVERING INDEX Reader__note_id__person_id", self.plan(right))
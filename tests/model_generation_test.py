@@ -15,6 +15,7 @@ from typing import Any, List, Optional, Tuple, Union
 import unittest
 
 import orm
+import orm.model
 import orm.table
 import orm.exceptions
 
@@ -71,6 +72,52 @@ class Test(unittest.TestCase):
         ):
             orm.table._get_model(MissingId)
 
+    def test_model_generation_reserved_field(self) -> None:
+        """Test Exception from creating a model with a field which filters can not use"""
+
+        class Reserved(orm.Table["Reserved"]):
+            """Table with a field named like a search option"""
+
+            reserved_id: int
+            page: int
+
+        class Suffixed(orm.Table["Suffixed"]):
+            """Table with a field named like a filter operator"""
+
+            suffixed_id: int
+            score__gt: int
+
+        for table in (Reserved, Suffixed):
+            with self.subTest(msg=table.__name__), self.assertRaises(Exception):
+                orm.table._make_model(table)
+
+    def test_unique_key_order(self) -> None:
+        """Unique keys keep their column order, which decides the indexes needed"""
+
+        @orm.unique("user_id", "name")
+        class Leading(orm.Table["Leading"]):
+            """Table whose unique key starts with its foreign key"""
+
+            leading_id: int
+            user: User
+            name: str
+
+        @orm.unique("name", "user_id", "name")
+        class Trailing(orm.Table["Trailing"]):
+            """Table whose unique key ends with its foreign key"""
+
+            trailing_id: int
+            user: User
+            name: str
+
+        leading: orm.model.TableModel[Leading] = orm.table._get_model(Leading)
+        trailing: orm.model.TableModel[Trailing] = orm.table._get_model(Trailing)
+
+        self.assertIn("UNIQUE ([user_id], [name])", leading._create_table_sql())
+        self.assertIn("UNIQUE ([name], [user_id])", trailing._create_table_sql())
+        self.assertEqual([], leading._indexes(True))
+        self.assertEqual([(("user_id",), None)], trailing._indexes(True))
+
     def test_model_generation_simple(self) -> None:
         """Test that a trivial model is created correctly"""
 
@@ -120,8 +167,8 @@ class Test(unittest.TestCase):
     def test_model_reentry(self) -> None:
         """Test that repeated calls to _get_model return the same object"""
 
-        model1: orm.table.TableModel[Simple] = orm.table._get_model(Simple)
-        model2: orm.table.TableModel[Simple] = orm.table._get_model(Simple)
+        model1: orm.model.TableModel[Simple] = orm.table._get_model(Simple)
+        model2: orm.model.TableModel[Simple] = orm.table._get_model(Simple)
 
         self.assertIs(model1, model2)
         self.assertIs(model1, orm.table._MODELS[Simple])
@@ -12,7 +12,10 @@ from __future__ import annotations
 import sqlite3
 import unittest
 
-from orm.table import ModelWrapper, TableModel
+from orm.loading import Loading
+from orm.model import TableModel
+from orm.pagination import Page
+from orm.table import ModelWrapper
 
 from tests.models import Simple
 from tests.mocks import CallableMock, MarkerObject
@@ -27,11 +30,13 @@ class ModelWrapperTest(unittest.TestCase):
         expected = MarkerObject()
         cursor = MarkerObject().cast(sqlite3.Cursor)
 
+        page = Page("name", 10)
+
         mock = CallableMock(self)
-        mock.expect("all", expected, cursor)
+        mock.expect("all", expected, cursor, loading=Loading(), page=page)
 
         model = ModelWrapper(mock.cast(TableModel), cursor)
-        result = model.all()
+        result = model.all(page=page)
 
         self.assertEqual(expected, result)
 
@@ -43,7 +48,7 @@ class ModelWrapperTest(unittest.TestCase):
         entity_id = 1
 
         mock = CallableMock(self)
-        mock.expect("get", expected, cursor, entity_id)
+        mock.expect("get", expected, cursor, entity_id, loading=Loading())
 
         model = ModelWrapper(mock.cast(TableModel), cursor)
         result = model.get(entity_id)
@@ -58,13 +63,27 @@ class ModelWrapperTest(unittest.TestCase):
         entities = [1, 2, 3]
 
         mock = CallableMock(self)
-        mock.expect("get_many", expected, cursor, *entities)
+        mock.expect("get_many", expected, cursor, *entities, loading=Loading())
 
         model = ModelWrapper(mock.cast(TableModel), cursor)
         result = model.get_many(*entities)
 
         self.assertEqual(expected, result)
 
+    def test_call_iter_all(self) -> None:
+        """Tests that the "iter_all" call propogrates to the model"""
+
+        expected = MarkerObject()
+        cursor = MarkerObject().cast(sqlite3.Cursor)
+
+        mock = CallableMock(self)
+        mock.expect("iter_all", expected, cursor, 10, loading=Loading())
+
+        model = ModelWrapper(mock.cast(TableModel), cursor)
+        result = model.iter_all(10)
+
+        self.assertEqual(expected, result)
+
     def test_call_store(self) -> None:
         """Tests that the "store" call propogrates to the model"""
 
@@ -73,7 +92,7 @@ class ModelWrapperTest(unittest.TestCase):
         entity = Simple()
 
         mock = CallableMock(self)
-        mock.expect("store", expected, cursor, entity)
+        mock.expect("store", expected, cursor, entity, identity=None)
 
         model = ModelWrapper(mock.cast(TableModel), cursor)
         result = model.store(entity)
@@ -9,6 +9,8 @@
 
 from typing import Optional
 
+import dataclasses
+
 import orm
 
 
@@ -40,3 +42,30 @@ class User(orm.Table["User"]):
     user_id: int
     username: str
     email: str
+
+
+@orm.unique("name")
+@dataclasses.dataclass
+class Person(orm.Table["Person"]):
+    """Example table: a dataclass used as the target of foreign keys"""
+
+    name: str
+    person_id: Optional[int] = None
+
+
+@orm.index("person", "text", where="[parent] IS NULL")
+@dataclasses.dataclass
+class Note(orm.Table["Note"]):
+    """Example table: a foreign key, and a self-referential foreign key"""
+
+    person: Person
+    text: str
+    parent: Optional["Note"] = None
+    note_id: Optional[int] = None
+
+
+class Reader(orm.JoinTable[Person, Note]):
+    """Example join table: which People have read which Notes"""
+
+    person: Person
+    note: Note
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+# vim: fileencoding=utf-8 expandtab ts=4 nospell
+
+# SPDX-FileCopyrightText: 2020-2021 Benedict Harcourt <ben.harcourt@harcourtprogramming.co.uk>
+#
+# SPDX-License-Identifier: BSD-2-Clause
+
+"""Tests for ORM: comparison, range and pattern operators in filters"""
+
+# pylint: disable=protected-access
+
+from __future__ import annotations
+
+from typing import Any, List, Optional
+
+import dataclasses
+import sqlite3
+import unittest
+
+import orm
+import orm.table
+
+from orm import diagnostics
+from tests.models import Note, Person, Reader
+
+
+@orm.index("score")
+@orm.index("name")
+@dataclasses.dataclass
+class Player(orm.Table["Player"]):
+    """Example table with values to compare"""
+
+    name: str
+    score: int
+    team: Optional[str] = None
+    player_id: Optional[int] = None
+
+
+class Reading(orm.Table["Reading"]):
+    """Sub-table of readings, of which only some are selected"""
+
+    reading_id: int
+    sensor_id: int
+    value: int
+
+
+@orm.subtable("high", Reading, "value", selectors={"value__gte": 10})
+@dataclasses.dataclass
+class Sensor(orm.Table["Sensor"]):
+    """Example table with a filtered sub-table"""
+
+    sensor_id: int
+    high: List[int]
+
+
+class OperatorTest(unittest.TestCase):
+    """Tests for filters with operator suffixes"""
+
+    def setUp(self) -> None:
+        self.conn = sqlite3.connect(":memory:")
+        self.cursor = self.conn.cursor()
+
+        for table in (Person, Note, Player, Sensor, Reading):
+            orm.table._get_model(table).created = False
+
+        Player.create_table(self.cursor)
+
+        self.players = [
+            Player("alice", 10, "red"),
+            Player("bob", 20),
+            Player("carol", 30, "blue"),
+            Player("Cat", 40, "red"),
+        ]
+        Player.model(self.cursor).store_many(self.players)
+
+    def tearDown(self) -> None:
+        self.conn.close()
+
+    def names(self, **kwargs: Any) -> List[str]:
+        """The names of the players which match some filters, in order of ID"""
+
+        players = Player.model(self.cursor).search(**kwargs)
+
+        return [player.name for player in sorted(players, key=lambda x: x.player_id or 0)]
+
+    def test_comparisons(self) -> None:
+        """Fields can be compared with a value, or a range of values"""
+
+        self.assertEqual(["carol", "Cat"], self.names(score__gt=20))
+        self.assertEqual(["bob", "carol", "Cat"], self.names(score__gte=20))
+        self.assertEqual(["alice"], self.names(score__lt=20))
+        self.assertEqual(["alice", "bob"], self.names(score__lte=20))
+        self.assertEqual(["bob", "carol"], self.names(score__between=(15, 30)))
+        self.assertEqual(["bob"], self.names(score__gt=10, score__lt=30, team=None))
+        self.assertEqual(["alice"], self.names(score__eq=10))
+        self.assertEqual(["alice", "Cat"], self.names(score__in=[10, 40]))
+
+        with self.assertRaises(ValueError):
+            self.names(score__gt=None)
+
+        with self.assertRaises(ValueError):
+            self.names(score__between=(1, 2, 3))
+
+    def test_negation(self) -> None:
+        """ne and not_in are the opposite of the plain filters, NULLs included"""
+
+        self.assertEqual(["bob", "carol"], self.names(team__ne="red"))
+        self.assertEqual(["alice", "carol", "Cat"], self.names(team__ne=None))
+        self.assertEqual(["bob"], self.names(team__not_in=["red", "blue"]))
+        self.assertEqual(["carol"], self.names(team__not_in=["red", None]))
+        self.assertEqual(["bob", "carol", "Cat"], self.names(score__not_in=[10]))
+        self.assertEqual(4, len(self.names(score__not_in=[])))
+
+    def test_patterns(self) -> None:
+        """LIKE ignores ASCII case, while GLOB and startswith do not"""
+
+        self.assertEqual(["carol", "Cat"], self.names(name__like="ca%"))
+        self.assertEqual(["carol"], self.names(name__glob="ca*"))
+        self.assertEqual(["Cat"], self.names(name__startswith="Ca"))
+        self.assertEqual(4, len(self.names(name__startswith="")))
+
+        with self.assertRaises(ValueError):
+            self.names(name__startswith=1)
+
+    def test_aggregates(self) -> None:
+        """Counts and aggregates take the same operators"""
+
+        model = Player.model(self.cursor)
+
+        self.assertEqual(2, model.count(score__gte=30))
+        self.assertEqual(20, model.sum("score", name__startswith="b", score__ne=0))
+        self.assertEqual([2, 3], sorted(model.search_ids(score__between=(20, 30))))
+
+    def test_index_used(self) -> None:
+        """Comparisons and prefixes are answered with a range of an index"""
+
+        model = Player.model(self.cursor)
+
+        with diagnostics.capture() as plans:
+            model.search_ids(score__gt=15)
+            model.search_ids(score__between=(15, 30))
+            model.search_ids(name__startswith="ca")
+            model.search_ids(name__glob="ca*")
+
+        self.assertEqual([], plans.problems(), plans.report())
+
+    def test_join_lookups(self) -> None:
+        """from_left and from_right filter with operators too"""
+
+        Reader.create_table(self.cursor)
+
+        people = [Person(name) for name in ("alice", "bob", "carol")]
+        Person.model(self.cursor).store_many(people)
+
+        notes = [Note(people[0], f"note {i}") for i in range(4)]
+        Note.model(self.cursor).store_many(notes)
+
+        readers = Reader.model(self.cursor)
+
+        for person, note in zip(people, notes):
+            readers.store(person, note)
+
+        readers.store(people[2], notes[3])
+
+        texts = [note.text for note in readers.from_left(name__gte="bob")]
+        self.assertEqual(["note 1", "note 2", "note 3"], texts)
+
+        names = [person.name for person in readers.from_right(text__ne="note 0")]
+        self.assertEqual(["bob", "carol"], names)
+
+        names = [person.name for person in readers.from_right(person=people[0])]
+        self.assertEqual(["alice", "bob", "carol"], names)
+
+        with self.assertRaises(AttributeError):
+            readers.from_left(missing__gt=1)
+
+    def test_subtable_selectors(self) -> None:
+        """Sub-table selectors can use operators, and are indexed by column"""
+
+        Sensor.create_table(self.cursor)
+        self.cursor.executemany("INSERT INTO [Sensor] ([sensor_id]) VALUES (?)", [(1,), (2,)])
+        self.cursor.executemany(
+            "INSERT INTO [Reading] ([sensor_id], [value]) VALUES (?, ?)",
+            [(1, 5), (1, 12), (2, 10), (1, 30), (2, 9)],
+        )
+
+        sensors = Sensor.model(self.cursor).get_many(1, 2)
+
+        self.assertEqual([12, 30], sensors[1].high)
+        self.assertEqual([10], sensors[2].high)
+
+        indexes = self.conn.execute("PRAGMA index_list([Reading])").fetchall()
+        self.assertEqual(["Reading__sensor_id__value"], [index[1] for index in indexes])
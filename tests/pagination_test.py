@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# vim: fileencoding=utf-8 expandtab ts=4 nospell
+
+# SPDX-FileCopyrightText: 2020-2021 Benedict Harcourt <ben.harcourt@harcourtprogramming.co.uk>
+#
+# SPDX-License-Identifier: BSD-2-Clause
+
+"""Tests for ORM: ordering and keyset pagination"""
+
+from __future__ import annotations
+
+from typing import Any, List, Optional, Tuple
+
+import dataclasses
+
+import orm
+
+from orm import diagnostics
+from orm.pagination import Page
+from tests.database import DatabaseTest
+from tests.models import Note, Person, Reader
+
+
+@orm.index("score")
+@dataclasses.dataclass
+class Entry(orm.Table["Entry"]):
+    """Example table with repeated values to order by"""
+
+    name: str
+    score: int
+    entry_id: Optional[int] = None
+
+
+class PaginationTest(DatabaseTest):
+    """Tests for ordering and paging with orm.Page"""
+
+    tables: Tuple[Any, ...] = (Reader, Entry)
+
+    def setUp(self) -> None:
+        super().setUp()
+
+        names = ("carol", "alice", "dave", "bob", "alice")
+        self.entries = [Entry(name, len(name)) for name in names]
+        Entry.model(self.cursor).store_many(self.entries)
+
+        self.people = [Person(name) for name in ("carol", "alice")]
+        Person.model(self.cursor).store_many(self.people)
+
+        self.notes = [Note(self.people[i % 2], f"note {i}") for i in range(6)]
+        Note.model(self.cursor).store_many(self.notes)
+
+        for note in self.notes:
+            Reader.model(self.cursor).store(self.people[0], note)
+
+    @staticmethod
+    def names(entries: List[Entry]) -> List[str]:
+        """The names and IDs of some entries, for comparing orders"""
+
+        return [f"{entry.name}{entry.entry_id}" for entry in entries]
+
+    def test_order_and_limit(self) -> None:
+        """Results are ordered (with the ID breaking ties) and limited in SQL"""
+
+        model = Entry.model(self.cursor)
+
+        self.assertEqual(
+            ["alice2", "alice5", "bob4", "carol1", "dave3"],
+            self.names(model.all(page=Page("name"))),
+        )
+        self.assertEqual(["dave3", "carol1"], self.names(model.all(page=Page("-name", 2))))
+        self.assertEqual(
+            ["alice5", "alice2"],
+            self.names(model.search(name="alice", page=Page(["-entry_id"], 5))),
+        )
+
+        with self.assertRaises(ValueError):
+            model.all(page=Page("missing"))
+
+    def test_after(self) -> None:
+        """Pages continue after the given record, in either direction"""
+
+        model = Entry.model(self.cursor)
+
+        for order_by in ("name", "-name", ["score", "-name"], ["-score", "name", "entry_id"]):
+            with self.subTest(order_by=order_by):
+                everything = model.all(page=Page(order_by))
+                page = model.all(page=Page(order_by, 2, everything[1]))
+
+                self.assertEqual(everything[2:4], page)
+
+    def test_pages(self) -> None:
+        """orm.pages iterates over every page of a paged function"""
+
+        model = Note.model(self.cursor)
+        pages = list(orm.pages(model.all, Page("-text", 4)))
+
+        self.assertEqual([4, 2], [len(page) for page in pages])
+        self.assertEqual(
+            [f"note {i}" for i in range(5, -1, -1)],
+            [note.text for page in pages for note in page],
+        )
+        self.assertEqual([], list(orm.pages(model.search, Page(limit=4), text="missing")))
+
+        pages = list(orm.pages(model.search, Page("text", 3), person=self.people[0]))
+        self.assertEqual(
+            [["note 0", "note 2", "note 4"]], [[x.text for x in page] for page in pages]
+        )
+
+    def test_foreign_order(self) -> None:
+        """Foreign objects order by their ID; nullable fields can not be paged after"""
+
+        model = Note.model(self.cursor)
+        page = Page(["person", "note_id"])
+        notes = model.all(page=page)
+
+        self.assertEqual([1, 1, 1, 2, 2, 2], [note.person.person_id for note in notes])
+        self.assertEqual(notes[3:], model.all(page=page.following(notes[2])))
+
+        with self.assertRaises(ValueError):
+            model.all(page=Page("parent", after=notes[0]))
+
+    def test_join_lookups(self) -> None:
+        """Join lookups can be ordered and paged"""
+
+        readers = Reader.model(self.cursor)
+
+        page = Page("-text", 2)
+        notes = readers.of_left(self.people[0], page=page)
+        self.assertEqual(["note 5", "note 4"], [note.text for note in notes])
+
+        notes = readers.of_left(self.people[0], page=page.following(notes[-1]))
+        self.assertEqual(["note 3", "note 2"], [note.text for note in notes])
+
+        notes = readers.from_left(name="carol", page=Page("text", 1, self.notes[0]))
+        self.assertEqual(["note 1"], [note.text for note in notes])
+
+        people = readers.of_right(self.notes[0], page=Page("name", 5))
+        self.assertEqual([self.people[0]], people)
+
+    def test_index_used(self) -> None:
+        """Pages after a record read a range of the index, rather than sorting"""
+
+        model = Entry.model(self.cursor)
+
+        with diagnostics.capture() as plans:
+            model.all(page=Page("entry_id", 2, self.entries[1]))
+            model.all(page=Page("-score", 2, self.entries[1]))
+
+        self.assertEqual([], plans.problems(), plans.report())
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# vim: fileencoding=utf-8 expandtab ts=4 nospell
+
+# SPDX-FileCopyrightText: 2020-2021 Benedict Harcourt <ben.harcourt@harcourtprogramming.co.uk>
+#
+# SPDX-License-Identifier: BSD-2-Clause
+
+"""Tests for ORM: process parallel table scans"""
+
+# pylint: disable=protected-access
+
+from __future__ import annotations
+
+from typing import Iterator
+
+import os
+import sqlite3
+import tempfile
+import unittest
+
+import orm.table
+
+from orm.parallel import ParallelScan, partition
+from tests.models import Note, Person
+
+
+def count_alice(notes: Iterator[Note]) -> int:
+    """Reduce function: counts the notes written by alice"""
+
+    return sum(1 for note in notes if note.person.name == "alice")
+
+
+class ParallelScanTest(unittest.TestCase):
+    """Tests for scanning tables with worker processes"""
+
+    def setUp(self) -> None:
+        handle, self.path = tempfile.mkstemp(suffix=".db")
+        os.close(handle)
+
+        for table in (Person, Note):
+            orm.table._get_model(table).created = False
+
+        with sqlite3.connect(self.path) as conn:
+            cursor = conn.cursor()
+            Note.create_table(cursor)
+
+            alice, bob = Person("alice"), Person("bob")
+            Person.model(cursor).store_many([alice, bob])
+            Note.model(cursor).store_many(
+                Note(bob if i % 3 else alice, str(i)) for i in range(100)
+            )
+
+        conn.close()
+
+    def tearDown(self) -> None:
+        os.unlink(self.path)
+
+    def test_partition(self) -> None:
+        """Tables are split into contiguous ranges of IDs"""
+
+        self.assertEqual([(1, 35), (35, 69), (69, 101)], partition(Note, self.path, 3))
+        self.assertEqual([(1, 2), (2, 3)], partition(Person, self.path, 5))
+
+    def test_records(self) -> None:
+        """Every record is read, in ID order, with its foreign objects"""
+
+        with ParallelScan(self.path, workers=2, partitions=7, window=5) as scan:
+            notes = list(scan.records(Note))
+
+        self.assertEqual([str(i) for i in range(100)], [note.text for note in notes])
+        self.assertEqual("alice", notes[0].person.name)
+
+    def test_reduce(self) -> None:
+        """Reduce functions are called once per range"""
+
+        with ParallelScan(self.path, workers=2, partitions=4) as scan:
+            counts = scan.reduce(Note, count_alice)
+
+        self.assertEqual(4, len(counts))
+        self.assertEqual(34, sum(counts))
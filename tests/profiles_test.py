@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# vim: fileencoding=utf-8 expandtab ts=4 nospell
+
+# SPDX-FileCopyrightText: 2020-2021 Benedict Harcourt <ben.harcourt@harcourtprogramming.co.uk>
+#
+# SPDX-License-Identifier: BSD-2-Clause
+
+"""Tests for ORM: connection profiles"""
+
+from __future__ import annotations
+
+import os
+import sqlite3
+import tempfile
+import unittest
+
+import orm
+
+from orm import profiles
+
+
+class ProfilesTest(unittest.TestCase):
+    """Tests for applying connection profiles"""
+
+    def setUp(self) -> None:
+        handle, self.path = tempfile.mkstemp(suffix=".db")
+        os.close(handle)
+
+    def tearDown(self) -> None:
+        os.unlink(self.path)
+
+    def pragma(self, conn: sqlite3.Connection, name: str) -> object:
+        """Reads the current value of a pragma"""
+
+        return conn.execute(f"PRAGMA {name}").fetchone()[0]
+
+    def test_connect(self) -> None:
+        """Connections are opened with the profile's pragmas"""
+
+        conn = profiles.connect(self.path, "oltp")
+
+        self.assertEqual("wal", self.pragma(conn, "journal_mode"))
+        self.assertEqual(1, self.pragma(conn, "synchronous"))
+        self.assertEqual(1, self.pragma(conn, "foreign_keys"))
+        self.assertEqual(-16384, self.pragma(conn, "cache_size"))
+
+        conn.close()
+
+    def test_read_only_serving(self) -> None:
+        """The read only profile refuses writes"""
+
+        conn = profiles.connect(self.path, "read-only-serving")
+
+        with self.assertRaises(sqlite3.OperationalError):
+            conn.execute("CREATE TABLE foo (bar INTEGER)")
+
+        conn.close()
+
+    def test_scoped(self) -> None:
+        """Scoped profiles are undone at the end of the block"""
+
+        conn = profiles.connect(self.path, "oltp")
+
+        with profiles.scoped(conn, "bulk-load"):
+            self.assertEqual(0, self.pragma(conn, "synchronous"))
+            self.assertEqual(-262144, self.pragma(conn, "cache_size"))
+
+        self.assertEqual(1, self.pragma(conn, "synchronous"))
+        self.assertEqual(-16384, self.pragma(conn, "cache_size"))
+
+        conn.close()
+
+    def test_pool_hook(self) -> None:
+        """Profiles can be applied to pooled connections"""
+
+        pool = orm.ConnectionPool(self.path, setup=[profiles.hook("oltp")])
+
+        with pool.cursor() as cursor:
+            self.assertEqual(1, cursor.execute("PRAGMA foreign_keys").fetchone()[0])
+
+        pool.close()
+
+    def test_unknown_profile(self) -> None:
+        """Only known profiles can be used"""
+
+        with self.assertRaises(ValueError):
+            profiles.hook("fast")
@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+# vim: fileencoding=utf-8 expandtab ts=4 nospell
+
+# SPDX-FileCopyrightText: 2020-2021 Benedict Harcourt <ben.harcourt@harcourtprogramming.co.uk>
+#
+# SPDX-License-Identifier: BSD-2-Clause
+
+"""Tests for ORM: TableModel against an in-memory SQLite database"""
+
+# pylint: disable=protected-access
+
+from __future__ import annotations
+
+import math
+import sqlite3
+import unittest
+
+import orm
+import orm.loading
+
+from orm import hooks
+from orm.lazy import LazyRecord
+
+from tests.database import NoteTest, reset_tables
+from tests.models import Note, Person
+from tests.submodels import MainTable
+
+
+class PeopleTest(NoteTest):
+    """Test case with a second stored person, bob"""
+
+    def setUp(self) -> None:
+        super().setUp()
+
+        self.bob = Person("bob")
+        Person.model(self.cursor).store(self.bob)
+
+
+class TableModelTest(PeopleTest):
+    """Tests for reading and writing records with a real database"""
+
+    def test_store_and_get_foreign(self) -> None:
+        """Foreign objects are written as IDs and read back as records"""
+
+        model = Note.model(self.cursor)
+        root = Note(self.alice, "root")
+        model.store(root)
+
+        reply = Note(self.bob, "reply", root)
+        model.store(reply)
+
+        result = model.get(reply.note_id)  # type: ignore
+
+        self.assertEqual(reply, result)
+        self.assertEqual(self.bob, result.person)  # type: ignore
+        self.assertEqual(root, result.parent)  # type: ignore
+
+    def test_search_by_foreign_object(self) -> None:
+        """Searching by a foreign object filters on its ID column"""
+
+        model = Note.model(self.cursor)
+        model.store(Note(self.alice, "one"))
+        model.store(Note(self.bob, "two"))
+        model.store(Note(self.alice, "three"))
+
+        texts = sorted(note.text for note in model.search(person=self.alice))
+
+        self.assertEqual(["one", "three"], texts)
+
+    def test_iter_all_windows(self) -> None:
+        """Streaming reads every record, resolving foreign keys per window"""
+
+        model = Note.model(self.cursor)
+
+        for i in range(5):
+            model.store(Note(self.alice if i % 2 else self.bob, str(i)))
+
+        notes = list(model.iter_all(window=2))
+
+        self.assertEqual([str(i) for i in range(5)], [note.text for note in notes])
+        self.assertEqual(["bob", "alice"], [note.person.name for note in notes[:2]])
+
+    def test_iter_search(self) -> None:
+        """Streaming search yields only the matching records"""
+
+        model = Note.model(self.cursor)
+
+        for i in range(5):
+            model.store(Note(self.alice if i % 2 else self.bob, str(i)))
+
+        notes = model.iter_search(window=1, person=self.alice)
+
+        self.assertEqual(["1", "3"], [note.text for note in notes])
+
+    def test_search_ids(self) -> None:
+        """search_ids selects only the IDs, with the same filters and paging"""
+
+        model = Note.model(self.cursor)
+
+        for i in range(5):
+            model.store(Note(self.alice if i % 2 else self.bob, str(i)))
+
+        metrics = hooks.Metrics()
+        hooks.install(metrics)
+        self.addCleanup(hooks.uninstall, metrics)
+
+        self.assertEqual([2, 4], model.search_ids(person=self.alice))
+        self.assertEqual([5, 3], model.search_ids(person=self.bob, page=orm.Page("-text", 2)))
+        self.assertEqual([1, 2, 3, 4, 5], model.search_ids())
+        self.assertEqual({("Note", "search_ids")}, set(metrics.methods))
+
+    def test_large_id_lists(self) -> None:
+        """ID lists beyond SQLite's variable limit still work"""
+
+        model = Person.model(self.cursor)
+
+        self.assertEqual(2, len(model.get_many(*range(100000))))
+        self.assertEqual(
+            2, len(model.search(name=[str(x) for x in range(100000)] + ["bob", "alice"]))
+        )
+
+    def test_large_list_affinity(self) -> None:
+        """Large lists compare with the column's affinity, as short lists do"""
+
+        model = Person.model(self.cursor)
+        model.store_many([Person(str(x)) for x in range(200)])
+
+        self.assertEqual(10, len(model.search(name=list(range(10)))))
+        self.assertEqual(100, len(model.search(name=list(range(100)))))
+        self.assertEqual(1, len(model.search(name=[math.inf] * 100 + ["bob"])))
+
+    def test_indexes(self) -> None:
+        """Declared indexes, and foreign key columns, are indexed"""
+
+        self.cursor.execute("SELECT [sql] FROM sqlite_master WHERE [tbl_name] = 'Note'")
+        indexes = sorted(sql for (sql,) in self.cursor.fetchall() if sql and "INDEX" in sql)
+
+        self.assertEqual(3, len(indexes))
+        self.assertIn("ON [Note] ([parent])", indexes[0])
+        self.assertIn("ON [Note] ([person_id])", indexes[1])
+        self.assertIn("ON [Note] ([person_id], [text]) WHERE [parent] IS NULL", indexes[2])
+
+        self.cursor.execute(
+            "EXPLAIN QUERY PLAN " + Note.model(self.cursor).model._select_sql("[parent] = 1")
+        )
+        self.assertIn("USING INDEX", self.cursor.fetchone()[-1])
+
+    def test_subtable_connector_index(self) -> None:
+        """Sub-tables are indexed on the column connecting them to their parent"""
+
+        MainTable.create_table(self.cursor)
+
+        for name in ("SubList", "SubDict"):
+            indexes = self.conn.execute(f"PRAGMA index_list([{name}])").fetchall()
+            self.assertEqual([f"{name}__main_table_id"], [i[1] for i in indexes])
+
+    def test_auto_index_opt_out(self) -> None:
+        """Foreign key columns are only indexed when automatic indexes are on"""
+
+        conn = sqlite3.connect(":memory:")
+        reset_tables()
+
+        Note.create_table(conn.cursor(), auto_index=False)
+
+        indexes = conn.execute("PRAGMA index_list([Note])").fetchall()
+        self.assertEqual(
+            ["Note__person_id__text__" + indexes[0][1][-8:]], [i[1] for i in indexes]
+        )
+
+        conn.close()
+
+    def test_statements_are_cached(self) -> None:
+        """Repeated calls with the same shape reuse the compiled statement"""
+
+        model = Person.model(self.cursor).model
+
+        model.search(self.cursor, name=["alice", "bob"])
+        model.get_many(self.cursor, 1, 2, 3)
+        compiled = dict(model._compiled)
+
+        model.search(self.cursor, name=["carol", "dave"])
+        model.get_many(self.cursor, 4, 5, 6)
+
+        self.assertEqual(compiled, model._compiled)
+
+    def test_in_list_arity_buckets(self) -> None:
+        """Long ID lists are padded to a bucket, and still match correctly"""
+
+        model = Person.model(self.cursor).model
+
+        self.assertEqual(2, len(model.get_many(self.cursor, *range(1, 11))))
+        self.assertEqual(2, len(model.get_many(self.cursor, *range(1, 13))))
+        self.assertIn(("get_many", 16), model._compiled)
+        self.assertNotIn(("get_many", 12), model._compiled)
+
+
+class LoadingTest(PeopleTest):
+    """Tests for loading foreign objects, with each strategy"""
+
+    def test_deep_chain_is_loaded_by_level(self) -> None:
+        """A long chain of self references does not need a query per level"""
+
+        model = Note.model(self.cursor)
+        parent = None
+
+        for i in range(100):
+            parent = Note(self.alice, str(i), parent)
+            model.store(parent)
+
+        statements = self.trace()
+
+        notes = model.all()
+
+        self.assertEqual(3, len(statements))
+        self.assertIs(notes[-1].parent, notes[-2])
+        self.assertIs(notes[0].person, notes[-1].person)
+        self.assertIsNone(notes[0].parent)
+
+    def test_reference_in_batch(self) -> None:
+        """Records referred to by an earlier row of the same batch are not selected again"""
+
+        model = Note.model(self.cursor)
+        parent = Note(self.alice, "parent", None, 2)
+        model.store(parent)
+        model.store(Note(self.alice, "child", parent, 1))
+
+        statements = self.trace()
+
+        notes = model.get_many(1, 2)
+
+        self.assertEqual(1, sum("FROM [Note]" in sql for sql in statements))
+        self.assertIs(notes[2], notes[1].parent)
+
+    def test_reference_cycle(self) -> None:
+        """Records which refer to each other are both loaded, once"""
+
+        model = Note.model(self.cursor)
+        first = Note(self.alice, "first", None, 1)
+        second = Note(self.bob, "second", first, 2)
+        first.parent = second
+
+        model.store_many([first, second])
+
+        result = model.get(1)
+
+        self.assertIsNotNone(result)
+        self.assertEqual("second", result.parent.text)  # type: ignore
+        self.assertIs(result, result.parent.parent)  # type: ignore
+
+    def test_join_loading(self) -> None:
+        """Join loading reads the foreign records in the same statement"""
+
+        model = Note.model(self.cursor, strategy=orm.loading.JOIN_LOADING)
+        root = Note(self.alice, "root")
+        model.store(root)
+
+        for i in range(5):
+            model.store(Note(self.bob if i % 2 else self.alice, str(i), root))
+
+        statements = self.trace()
+
+        notes = model.search(parent=root)
+
+        self.assertEqual(1, len(statements))
+        self.assertEqual([str(i) for i in range(5)], [note.text for note in notes])
+        self.assertEqual(2, len({id(note.person) for note in notes}))
+        self.assertEqual(1, len({id(note.parent) for note in notes}))
+        self.assertEqual(root, notes[0].parent)
+        self.assertEqual(root, model.get(1))
+
+    def test_lazy_loading(self) -> None:
+        """Lazy proxies load their whole batch on first use"""
+
+        model = Note.model(self.cursor, strategy=orm.loading.LAZY_LOADING)
+
+        for i in range(4):
+            model.store(Note(self.bob if i % 2 else self.alice, str(i)))
+
+        statements = self.trace()
+
+        notes = model.all()
+        before = len(statements)
+
+        self.assertIsInstance(notes[0].person, LazyRecord)
+        self.assertEqual(self.alice.person_id, notes[0].person.person_id)
+        self.assertEqual(before, len(statements))
+
+        self.assertEqual("alice", notes[0].person.name)
+        self.assertEqual("bob", notes[1].person.name)
+        self.assertEqual(before + 1, len(statements))
+
+        self.assertIsInstance(notes[0].person, Person)
+        self.assertEqual(self.alice, notes[0].person)
+        self.assertIs(notes[0].person, notes[2].person)
+
+    def test_lazy_proxies_as_values(self) -> None:
+        """Unloaded proxies can be stored and searched for by ID"""
+
+        model = Note.model(self.cursor, strategy=orm.loading.LAZY_LOADING)
+        model.store(Note(self.alice, "first"))
+
+        proxy = model.all()[0].person
+
+        statements = self.trace()
+
+        model.store(Note(proxy, "second"))
+        found = model.search(person=proxy)
+
+        self.assertEqual(["first", "second"], [note.text for note in found])
+        self.assertEqual([], [sql for sql in statements if "FROM [Person]" in sql])
+
+    def test_lazy_missing_record(self) -> None:
+        """Proxies for records which do not exist raise LookupError"""
+
+        model = Note.model(self.cursor, strategy=orm.loading.LAZY_LOADING)
+        model.store(Note(self.alice, "orphan"))
+
+        self.cursor.execute("PRAGMA foreign_keys = OFF")
+        self.cursor.execute("DELETE FROM person")
+
+        with self.assertRaises(LookupError):
+            getattr(model.all()[0].person, "name")
+
+    def test_unknown_strategy(self) -> None:
+        """Only known loading strategies can be used"""
+
+        with self.assertRaises(ValueError):
+            Note.model(self.cursor, strategy="eager").all()
+
+
+class StoreManyTest(PeopleTest):
+    """Tests for writing records in bulk"""
+
+    def test_store_many(self) -> None:
+        """Bulk stores fill in new IDs, and replace existing records"""
+
+        model = Person.model(self.cursor)
+        people = [Person(f"person {i}") for i in range(300)]
+
+        self.bob.name = "robert"
+
+        self.assertEqual(301, model.store_many(people + [self.bob]))
+        self.assertEqual(list(range(3, 303)), [person.person_id for person in people])
+        self.assertEqual(people[-1], model.get(302))
+        self.assertEqual("robert", model.get(2).name)  # type: ignore
+
+    def test_store_many_conflicts(self) -> None:
+        """Unique keys conflict in the order of the records, as with store"""
+
+        model = Person.model(self.cursor)
+        rows = "SELECT [person_id], [name] FROM [Person] WHERE [name] = 'x'"
+
+        self.bob.name = "x"
+        model.store_many([Person("x"), self.bob])
+        self.assertEqual([(2, "x")], self.cursor.execute(rows).fetchall())
+
+        new = Person("x")
+        model.store_many([self.bob, new])
+        self.assertEqual([(new.person_id, "x")], self.cursor.execute(rows).fetchall())
+        self.assertIsNone(model.get(2))
+
+
+if __name__ == "__main__":
+    unittest.main()
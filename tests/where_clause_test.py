@@ -9,6 +9,10 @@
 
 from __future__ import annotations
 
+from typing import List
+
+import json
+import math
 import sqlite3
 import unittest
 import orm.abc
@@ -99,6 +103,113 @@ class Test(unittest.TestCase):
 
         self.assertEqual("[cat] IS NULL", clause)
 
+    def test_empty_list(self) -> None:
+        """An empty list matches nothing, rather than NULL"""
+
+        clauses: orm.abc.MutableFilters = {"cat": []}
+
+        clause = orm.abc.BaseModel.where_clause("cat", clauses)
+
+        self.assertEqual("([cat] IN ())", clause)
+
+    def test_large_list(self) -> None:
+        """Lists longer than LARGE_SET are bound as one JSON parameter"""
+
+        values = list(range(orm.abc.LARGE_SET + 1))
+        clauses: orm.abc.MutableFilters = {"cat": values + [None]}
+
+        clause = orm.abc.BaseModel.where_clause("cat", clauses)
+
+        self.assertEqual(
+            "([cat] IN (SELECT +value FROM json_each(:cat__0)) OR [cat] IS NULL)", clause
+        )
+        self.assertEqual(values, json.loads(clauses["cat__0"]))  # type: ignore
+
+    def test_large_list_of_blobs(self) -> None:
+        """BLOBs are packed into one parameter, beyond SQLite's variable limit"""
+
+        blobs = [x.to_bytes(3, "big") for x in range(40000)]
+        values: List[orm.abc.PrimitiveTypes] = [*blobs, b"", 2, "x", math.inf]
+        clauses: orm.abc.MutableFilters = {"cat": values}
+
+        clause = orm.abc.BaseModel.where_clause("cat", clauses)
+
+        self.assertNotIn("cat__2", clauses)
+        self.assertEqual(b"".join(blobs), clauses["cat__0"])
+
+        connection = sqlite3.connect(":memory:")
+        connection.execute("CREATE TABLE [t] ([cat])")
+        connection.executemany(
+            "INSERT INTO [t] VALUES (?)",
+            [(b"\x00\x9c\x3f",), (b"\x9c\x3f",), (b"",), (2,), ("x",), (math.inf,), ("y",)],
+        )
+        rows = connection.execute(f"SELECT [cat] FROM [t] WHERE {clause}", clauses)
+
+        self.assertEqual(
+            [b"\x00\x9c\x3f", b"", 2, "x", math.inf], [x for (x,) in rows.fetchall()]
+        )
+
+    def test_large_list_of_infinities(self) -> None:
+        """Non-finite floats are bound in JSON as SQLite would bind them"""
+
+        values = [float(x) for x in range(99)] + [math.inf, -math.inf, math.nan]
+        clauses: orm.abc.MutableFilters = {"cat": values}
+
+        orm.abc.BaseModel.where_clause("cat", clauses)
+
+        self.assertEqual([*values[:-1], None], json.loads(clauses["cat__0"]))  # type: ignore
+
+    def test_comparison_operators(self) -> None:
+        """Operator suffixes compile to comparisons, with their own parameters"""
+
+        for field, sql in (
+            ("cat__gt", "[cat] > :cat__gt"),
+            ("cat__lte", "[cat] <= :cat__lte"),
+            ("cat__like", "[cat] LIKE :cat__like"),
+            ("cat__ne", "[cat] IS NOT :cat__ne"),
+            ("cat__eq", "[cat] = :cat__eq"),
+        ):
+            with self.subTest(field=field):
+                clauses: orm.abc.MutableFilters = {field: 1}
+
+                self.assertEqual(sql, orm.abc.BaseModel.where_clause(field, clauses))
+                self.assertEqual(1, clauses[field])
+
+    def test_range_operators(self) -> None:
+        """between and startswith bind both ends of the range"""
+
+        clauses: orm.abc.MutableFilters = {"cat__between": (1, 5), "dog__startswith": "ab"}
+
+        sql, params = orm.abc.BaseModel().where({}, clauses)
+
+        self.assertEqual(
+            "[cat] BETWEEN :cat__between__0 AND :cat__between__1 AND "
+            "[dog] >= :dog__startswith__0 AND [dog] < :dog__startswith__1",
+            sql,
+        )
+        self.assertEqual((1, 5), (params["cat__between__0"], params["cat__between__1"]))
+        self.assertEqual("ac", params["dog__startswith__1"])
+        self.assertEqual(None, orm.abc.prefix_end(chr(0x10FFFF)))
+        self.assertEqual("b\ue000", orm.abc.prefix_end("b\ud7ff"))
+
+    def test_not_in(self) -> None:
+        """not_in is the negation of a list filter"""
+
+        clauses: orm.abc.MutableFilters = {"cat__not_in": [1, 2, None]}
+
+        clause = orm.abc.BaseModel.where_clause("cat__not_in", clauses)
+
+        self.assertEqual(
+            "([cat] NOT IN (:cat__not_in__0, :cat__not_in__1) AND [cat] IS NOT NULL)", clause
+        )
+
+    def test_field_with_underscores(self) -> None:
+        """Only known operators are split from the field name"""
+
+        self.assertEqual(("cat__dog", ""), orm.abc.split_operator("cat__dog"))
+        self.assertEqual(("cat__dog", "gt"), orm.abc.split_operator("cat__dog__gt"))
+        self.assertEqual(("gt", ""), orm.abc.split_operator("gt"))
+
     def test_basic_where_generation(self) -> None:
         """[description]"""
 